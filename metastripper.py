@@ -1,40 +1,32 @@
 import os
 import sys
+import time
+import queue
 import logging
-import shutil
-import zipfile
+import threading
+from multiprocessing import freeze_support
 from datetime import datetime
 import tempfile
-from tkinter import Tk, ttk, filedialog, messagebox, BooleanVar, IntVar, Text, END, VERTICAL
-from PIL import Image
-try:
-    import imageio
-    IMAGEIO_AVAILABLE = True
-except ImportError:
-    IMAGEIO_AVAILABLE = False
-try:
-    import ffmpeg
-    FFMPEG_AVAILABLE = True
-except ImportError:
-    FFMPEG_AVAILABLE = False
-from PyPDF2 import PdfReader, PdfWriter
-from pptx import Presentation
-from docx import Document
-from openpyxl import load_workbook
-from odf import text, teletype
-from odf.opendocument import load as load_odf
-import mutagen
-from hachoir.parser import createParser
-from hachoir.metadata import extractMetadata
-import rarfile
-import py7zr
+from tkinter import Tk, ttk, filedialog, messagebox, BooleanVar, IntVar, StringVar, Text, END, VERTICAL, TclError
+from metastripper_core import CleanOptions, clean_paths, iter_files
+from metastripper_core.cache import default_cache_dir
+from metastripper_core.engine import default_workers
+from metastripper_core.journal import JobJournal, job_id_for
+from metastripper_core.metrics import EventLog
+
+POLL_INTERVAL_MS = 100
+MAX_EVENTS_PER_POLL = 2000
+MAX_LOG_LINES = 5000
 
 class MetaStripper:
     def __init__(self, root):
         self.root = root
         self.root.title("MetaStripper - Remove File Metadata")
         self.root.geometry("700x450")
-        self.cleanup_temp()
+        # The worker thread only talks to Tk through this queue; poll_events drains it.
+        self.events = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.worker = None
         self.setup_logging()
         self.setup_ui()
 
@@ -82,36 +74,52 @@ class MetaStripper:
         ttk.Checkbutton(options_frame, text="Keep copyright info", variable=self.keep_copyright).pack(anchor='w')
         self.keep_date = BooleanVar()
         ttk.Checkbutton(options_frame, text="Keep creation date", variable=self.keep_date).pack(anchor='w')
+        self.strip_review_data = BooleanVar()
+        ttk.Checkbutton(options_frame, text="Remove comment authors and revision IDs",
+                        variable=self.strip_review_data).pack(anchor='w')
         self.recursive = BooleanVar()
         ttk.Checkbutton(options_frame, text="Process folders recursively", variable=self.recursive).pack(anchor='w')
+        self.use_cache = BooleanVar()
+        ttk.Checkbutton(options_frame, text="Skip files unchanged since last run",
+                        variable=self.use_cache).pack(anchor='w')
         self.backup = BooleanVar()
         ttk.Checkbutton(options_frame, text="Create backup before cleaning", variable=self.backup).pack(anchor='w')
         self.size_limit = IntVar(value=0)
         ttk.Label(options_frame, text="Max file size (MB):").pack(anchor='w')
         ttk.Entry(options_frame, textvariable=self.size_limit, width=10).pack(anchor='w')
+        self.workers = IntVar(value=default_workers())
+        ttk.Label(options_frame, text="Worker processes:").pack(anchor='w')
+        ttk.Entry(options_frame, textvariable=self.workers, width=10).pack(anchor='w')
 
         # Progress
         self.progress = ttk.Progressbar(main_frame, orient='horizontal', length=100, mode='determinate')
-        self.progress.grid(row=4, column=0, columnspan=3, sticky=('w', 'e'), pady=10)
+        self.progress.grid(row=4, column=0, columnspan=3, sticky=('w', 'e'), pady=(10, 0))
+        self.status_var = StringVar(value="Idle")
+        ttk.Label(main_frame, textvariable=self.status_var).grid(row=5, column=0, columnspan=3, sticky='w',
+                                                                pady=(0, 10))
 
         # Log
-        ttk.Label(main_frame, text="Activity Log:").grid(row=5, column=0, sticky='w')
+        ttk.Label(main_frame, text="Activity Log:").grid(row=6, column=0, sticky='w')
         self.log_text = Text(main_frame, height=10, width=70)
-        self.log_text.grid(row=6, column=0, columnspan=3, sticky=('w', 'e'))
+        self.log_text.grid(row=7, column=0, columnspan=3, sticky=('w', 'e'))
         scrollbar = ttk.Scrollbar(main_frame, orient=VERTICAL, command=self.log_text.yview)
-        scrollbar.grid(row=6, column=3, sticky=('n', 's'))
+        scrollbar.grid(row=7, column=3, sticky=('n', 's'))
         self.log_text['yscrollcommand'] = scrollbar.set
 
         # Action buttons
         button_frame = ttk.Frame(main_frame)
-        button_frame.grid(row=7, column=0, columnspan=3, pady=10)
-        ttk.Button(button_frame, text="Clean Files", command=self.clean_files).pack(side='left', padx=5)
+        button_frame.grid(row=8, column=0, columnspan=3, pady=10)
+        self.clean_button = ttk.Button(button_frame, text="Clean Files", command=self.clean_files)
+        self.clean_button.pack(side='left', padx=5)
+        self.cancel_button = ttk.Button(button_frame, text="Cancel", command=self.cancel, state='disabled')
+        self.cancel_button.pack(side='left', padx=5)
         ttk.Button(button_frame, text="Clear Log", command=self.clear_log).pack(side='left', padx=5)
         ttk.Button(button_frame, text="Exit", command=self.root.quit).pack(side='right', padx=5)
 
         main_frame.columnconfigure(1, weight=1)
-        main_frame.rowconfigure(6, weight=1)
+        main_frame.rowconfigure(7, weight=1)
         self.toggle_output()
+        self.root.after(POLL_INTERVAL_MS, self.poll_events)
 
     def toggle_output(self):
         self.output_entry.config(state='disabled' if self.same_as_input_var.get() else 'normal')
@@ -127,8 +135,8 @@ class MetaStripper:
                 title="Select files to clean",
                 filetypes=[
                     ("All files", "*.*"),
-                    ("Images", "*.jpg *.jpeg *.png *.tiff *.bmp *.webp *.gif *.svg *.heic *.cr2 *.nef"),
-                    ("Documents", "*.docx *.xlsx *.pdf *.txt *.csv *.odt *.rtf"),
+                    ("Images", "*.jpg *.jpeg *.png *.tiff *.tif *.bmp *.webp *.gif *.svg *.heic *.cr2 *.nef"),
+                    ("Documents", "*.docx *.xlsx *.pdf *.txt *.csv *.odt *.ods *.odg *.rtf"),
                     ("Media", "*.mp3 *.mp4 *.avi *.wav *.flac *.mkv *.mov"),
                     ("Presentations", "*.pptx *.odp"),
                     ("Archives", "*.zip *.rar *.7z")
@@ -144,10 +152,9 @@ class MetaStripper:
             self.output_entry.insert(0, folder)
 
     def log(self, message, level='info'):
+        """Thread-safe: the line is queued and written to the Text widget by poll_events."""
         timestamp = datetime.now().strftime("%H:%M:%S")
-        self.log_text.insert(END, f"[{timestamp}] {message}\n")
-        self.log_text.see(END)
-        self.root.update_idletasks()
+        self.events.put(('log', f"[{timestamp}] {message}\n"))
         if level == 'info':
             self.logger.info(message)
         elif level == 'warning':
@@ -158,307 +165,199 @@ class MetaStripper:
     def clear_log(self):
         self.log_text.delete(1.0, END)
 
-    def get_output_path(self, original_path):
-        output_dir = os.path.dirname(original_path) if self.same_as_input_var.get() else self.output_entry.get()
-        if not output_dir:
-            output_dir = os.path.dirname(original_path)
-        filename = os.path.basename(original_path)
-        name, ext = os.path.splitext(filename)
-        new_filename = f"{name}_cleaned{ext}"
-        return os.path.join(output_dir, new_filename)
-
-    def cleanup_temp(self):
-        temp_dir = tempfile.gettempdir()
-        for f in os.listdir(temp_dir):
-            if f.startswith('metastripper_'):
-                try:
-                    os.remove(os.path.join(temp_dir, f))
-                except:
-                    pass
-
-    def is_valid_zip(self, filepath):
+    def poll_events(self):
+        """Drain queued worker events, batching log inserts and progress updates into one redraw."""
+        lines = []
+        finished = None
+        try:
+            for _ in range(MAX_EVENTS_PER_POLL):
+                event = self.events.get_nowait()
+                kind = event[0]
+                if kind == 'log':
+                    lines.append(event[1])
+                elif kind == 'total':
+                    self.progress.stop()
+                    self.progress.config(mode='determinate', maximum=max(event[1], 1))
+                    self.total = event[1]
+                elif kind == 'result':
+                    self.processed += 1
+                elif kind == 'done':
+                    finished = event[1]
+        except queue.Empty:
+            pass
+
+        if lines:
+            self.log_text.insert(END, ''.join(lines))
+            excess = int(self.log_text.index('end-1c').split('.')[0]) - MAX_LOG_LINES
+            if excess > 0:
+                self.log_text.delete('1.0', f'{excess + 1}.0')
+            self.log_text.see(END)
+        if self.worker is not None:
+            self.update_progress()
+        if finished is not None:
+            self.finish(finished)
+        self.root.after(POLL_INTERVAL_MS, self.poll_events)
+
+    def update_progress(self):
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        rate = self.processed / elapsed
+        if self.total is None:
+            status = f"{self.processed} files"
+        else:
+            self.progress["value"] = self.processed
+            status = f"{self.processed}/{self.total} files"
+        status += f", {rate:.1f} files/s"
+        if self.total and rate > 0 and self.processed < self.total:
+            remaining = int((self.total - self.processed) / rate)
+            status += f", ETA {remaining // 3600:d}:{remaining // 60 % 60:02d}:{remaining % 60:02d}"
+        self.status_var.set(status)
+
+    def cancel(self):
+        if self.worker is not None:
+            self.cancel_event.set()
+            self.cancel_button.config(state='disabled')
+            self.log("Cancelling: waiting for files in progress...", level='warning')
+
+    def read_number(self, variable, label, minimum):
+        """Return the whole number in ``variable``, or None after telling the user why it is not valid."""
         try:
-            with zipfile.ZipFile(filepath, 'r') as zf:
-                zf.testzip()
-            return True
-        except zipfile.BadZipFile:
-            return False
+            value = variable.get()
+        except TclError:
+            value = None
+        if value is None or value < minimum:
+            messagebox.showerror("Error", f"{label} must be a whole number of at least {minimum}")
+            return None
+        return value
 
     def clean_files(self):
+        if self.worker is not None:
+            return
         input_path = self.file_entry.get()
         if not input_path:
             messagebox.showwarning("Warning", "Please select at least one file or folder")
             return
+        size_limit = self.read_number(self.size_limit, "Max file size", 0)
+        if size_limit is None:
+            return
+        workers = self.read_number(self.workers, "Worker processes", 1)
+        if workers is None:
+            return
 
-        files = []
-        if self.recursive.get():
+        options = CleanOptions(
+            remove_all=self.remove_all.get(),
+            keep_copyright=self.keep_copyright.get(),
+            keep_date=self.keep_date.get(),
+            strip_review_data=self.strip_review_data.get(),
+            backup=self.backup.get(),
+            size_limit=size_limit,
+            output_dir='' if self.same_as_input_var.get() else self.output_entry.get(),
+            cache_dir=default_cache_dir() if self.use_cache.get() else '',
+        )
+
+        recursive = self.recursive.get()
+        if recursive:
             if not os.path.isdir(input_path):
                 messagebox.showwarning("Warning", "Selected path is not a folder")
                 return
-            for root, _, filenames in os.walk(input_path):
-                files.extend(os.path.join(root, f) for f in filenames)
+            paths = [input_path]
         else:
-            files = [f.strip() for f in input_path.split(";") if f.strip()]
-
-        if not files:
-            messagebox.showwarning("Warning", "No files to process")
-            return
-
-        total_files = len(files)
-        self.progress["maximum"] = total_files
-        self.progress["value"] = 0
-
-        try:
-            for i, filepath in enumerate(files):
-                if not os.path.exists(filepath):
-                    self.log(f"File not found: {filepath}", level='warning')
-                    continue
-
-                if self.size_limit.get() > 0:
-                    size_mb = os.path.getsize(filepath) / (1024 * 1024)
-                    if size_mb > self.size_limit.get():
-                        self.log(f"Skipping {filepath}: Size {size_mb:.2f} MB exceeds limit", level='warning')
-                        continue
-
-                try:
-                    self.log(f"Processing: {os.path.basename(filepath)}")
-                    output_path = self.get_output_path(filepath)
-                    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-
-                    if self.backup.get():
-                        backup_path = f"{filepath}.bak"
-                        shutil.copy2(filepath, backup_path)
-                        self.log(f"Created backup: {backup_path}")
-
-                    ext = os.path.splitext(filepath)[1].lower()
-                    if ext in ('.jpg', '.jpeg', '.png', '.tiff', '.bmp', '.webp', '.gif', '.heic', '.cr2', '.nef'):
-                        self.clean_image(filepath, output_path)
-                    elif ext == '.pdf':
-                        self.clean_pdf(filepath, output_path)
-                    elif ext == '.docx':
-                        self.clean_docx(filepath, output_path)
-                    elif ext == '.pptx':
-                        self.clean_pptx(filepath, output_path)
-                    elif ext in ('.xlsx', '.xls'):
-                        self.clean_excel(filepath, output_path)
-                    elif ext in ('.odt', '.odp'):
-                        self.clean_odf(filepath, output_path)
-                    elif ext == '.rtf':
-                        self.clean_rtf(filepath, output_path)
-                    elif ext in ('.txt', '.csv', '.html'):
-                        self.clean_text(filepath, output_path)
-                    elif ext in ('.mp3', '.wav', '.flac'):
-                        self.clean_audio(filepath, output_path)
-                    elif ext in ('.mp4', '.avi', '.mkv', '.mov'):
-                        self.clean_video(filepath, output_path)
-                    elif ext in ('.zip', '.rar', '.7z'):
-                        self.clean_archive(filepath, output_path)
-                    else:
-                        self.clean_generic(filepath, output_path)
-
-                    self.log(f"Successfully cleaned: {os.path.basename(filepath)}")
-                    self.log(f"Saved to: {output_path}")
-
-                except Exception as e:
-                    self.log(f"Error processing {os.path.basename(filepath)}: {str(e)}", level='error')
-
-                self.progress["value"] = i + 1
-                self.root.update_idletasks()
-
-            messagebox.showinfo("Complete", "Metadata cleaning process finished!")
-        finally:
-            self.cleanup_temp()
-
-    def clean_image(self, input_path, output_path):
-        try:
-            ext = os.path.splitext(input_path)[1].lower()
-            if ext in ('.heic', '.cr2', '.nef'):
-                if not IMAGEIO_AVAILABLE:
-                    self.log(f"imageio not installed, copying {input_path} without cleaning", level='warning')
-                    shutil.copy2(input_path, output_path)
-                    return
-                img = imageio.imread(input_path)
-                imageio.imwrite(output_path, img)
-            elif ext == '.svg':
-                shutil.copy2(input_path, output_path)
-            else:
-                img = Image.open(input_path)
-                data = list(img.getdata())
-                mode = img.mode
-                size = img.size
-
-                new_img = Image.new(mode, size)
-                new_img.putdata(data)
-                if img.palette:
-                    new_img.putpalette(img.getpalette())
-                if img.info.get('transparency'):
-                    new_img.info['transparency'] = img.info['transparency']
-
-                save_params = {
-                    '.png': {'format': 'PNG', 'compress_level': 9},
-                    '.jpg': {'format': 'JPEG', 'quality': 95, 'optimize': True},
-                    '.jpeg': {'format': 'JPEG', 'quality': 95, 'optimize': True},
-                    '.gif': {'format': 'GIF'},
-                    '.tiff': {'format': 'TIFF'},
-                    '.bmp': {'format': 'BMP'},
-                    '.webp': {'format': 'WEBP', 'quality': 95}
-                }
-                new_img.save(output_path, **save_params.get(ext, {}))
-                img.close()
-        except Exception as e:
-            raise Exception(f"Image cleaning failed: {str(e)}")
-
-    def clean_pdf(self, input_path, output_path):
-        try:
-            with open(input_path, 'rb') as infile:
-                reader = PdfReader(infile)
-                if reader.is_encrypted:
-                    self.log(f"Encrypted PDF detected: {input_path}, copying without cleaning", level='warning')
-                    shutil.copy2(input_path, output_path)
-                    return
-                writer = PdfWriter()
-                for page in reader.pages:
-                    writer.add_page(page)
-                writer.add_metadata({})
-                with open(output_path, "wb") as outfile:
-                    writer.write(outfile)
-        except Exception as e:
-            raise Exception(f"PDF cleaning failed: {str(e)}")
-
-    def clean_docx(self, input_path, output_path):
-        try:
-            doc = Document(input_path)
-            cp = doc.core_properties
-            cp.author = cp.title = cp.subject = cp.keywords = cp.comments = cp.last_modified_by = ""
-            cp.revision = 1
-            cp.category = cp.content_status = cp.identifier = cp.language = cp.version = ""
-
-            if not self.keep_date.get():
-                cp.created = cp.modified = cp.last_printed = datetime(2000, 1, 1)
-            else:
-                cp.modified = datetime.now()
-
-            temp_path = os.path.join(tempfile.gettempdir(), f'metastripper_{os.path.basename(output_path)}')
-            doc.save(temp_path)
-            shutil.move(temp_path, output_path)
-        except Exception as e:
-            raise Exception(f"DOCX cleaning failed: {str(e)}")
-
-    def clean_pptx(self, input_path, output_path):
-        try:
-            temp_path = os.path.join(tempfile.gettempdir(), f'metastripper_{os.path.basename(input_path)}')
-            shutil.copy2(input_path, temp_path)
-            prs = Presentation(temp_path)
-            prs.core_properties.author = prs.core_properties.title = prs.core_properties.subject = ""
-            prs.core_properties.keywords = prs.core_properties.comments = ""
-
-            if not self.keep_copyright.get():
-                prs.core_properties.category = prs.core_properties.content_status = ""
-            if not self.keep_date.get():
-                prs.core_properties.created = prs.core_properties.modified = datetime(2000, 1, 1)
-            else:
-                prs.core_properties.modified = datetime.now()
-
-            temp_output = os.path.join(tempfile.gettempdir(), f'metastripper_{os.path.basename(output_path)}')
-            prs.save(temp_output)
-            shutil.move(temp_output, output_path)
-            os.remove(temp_path)
-        except Exception as e:
-            raise Exception(f"PPTX cleaning failed: {str(e)}")
-
-    def clean_excel(self, input_path, output_path):
-        try:
-            if not self.is_valid_zip(input_path):
-                self.log(f"Invalid or corrupted Excel file: {input_path}, copying without cleaning", level='warning')
-                shutil.copy2(input_path, output_path)
+            paths = [f.strip() for f in input_path.split(";") if f.strip()]
+            if not paths:
+                messagebox.showwarning("Warning", "No files to process")
                 return
-            wb = load_workbook(input_path)
-            props = wb.properties
-            props.creator = props.title = props.subject = props.keywords = props.description = ""
-            props.lastModifiedBy = props.category = props.version = ""
-
-            if not self.keep_date.get():
-                props.created = props.modified = datetime(2000, 1, 1)
-            wb.save(output_path)
-        except Exception as e:
-            raise Exception(f"Excel cleaning failed: {str(e)}")
-
-    def clean_odf(self, input_path, output_path):
-        try:
-            doc = load_odf(input_path)
-            meta = doc.getElementsByType(text.Meta)
-            for m in meta:
-                doc.removeChild(m)
-            doc.save(output_path)
-        except Exception as e:
-            raise Exception(f"ODF cleaning failed: {str(e)}")
-
-    def clean_rtf(self, input_path, output_path):
-        try:
-            shutil.copy2(input_path, output_path)
-        except Exception as e:
-            raise Exception(f"RTF cleaning failed: {str(e)}")
 
-    def clean_text(self, input_path, output_path):
-        try:
-            shutil.copy2(input_path, output_path)
-        except Exception as e:
-            raise Exception(f"Text file handling failed: {str(e)}")
-
-    def clean_audio(self, input_path, output_path):
-        try:
-            audio = mutagen.File(input_path)
-            if audio:
-                audio.delete()
-                audio.save()
-            shutil.copy2(input_path, output_path)
-        except Exception as e:
-            raise Exception(f"Audio cleaning failed: {str(e)}")
-
-    def clean_video(self, input_path, output_path):
-        try:
-            if FFMPEG_AVAILABLE:
-                # Check for local ffmpeg.exe when running as executable
-                ffmpeg_path = 'ffmpeg'  # Default system ffmpeg
-                if getattr(sys, 'frozen', False):  # Running as PyInstaller executable
-                    base_path = os.path.dirname(sys.executable)
-                    local_ffmpeg = os.path.join(base_path, 'ffmpeg.exe' if sys.platform == 'win32' else 'ffmpeg')
-                    if os.path.exists(local_ffmpeg):
-                        ffmpeg_path = local_ffmpeg
-                stream = ffmpeg.input(input_path)
-                stream = ffmpeg.output(stream, output_path, c='copy', map_metadata=-1)
-                ffmpeg.run(stream, cmd=ffmpeg_path)
-            else:
-                self.log(f"ffmpeg-python not installed, copying {input_path} without cleaning", level='warning')
-                shutil.copy2(input_path, output_path)
-        except Exception as e:
-            self.log(f"Video cleaning failed, copying: {str(e)}", level='warning')
-            shutil.copy2(input_path, output_path)
-
-    def clean_archive(self, input_path, output_path):
-        try:
-            shutil.copy2(input_path, output_path)
-        except Exception as e:
-            raise Exception(f"Archive cleaning failed: {str(e)}")
-
-    def clean_generic(self, input_path, output_path):
+        # Walked lazily, so the total stays unknown (indeterminate bar) for folders.
+        self.progress.config(mode='indeterminate' if recursive else 'determinate', maximum=100)
+        self.progress["value"] = 0
+        if recursive:
+            self.progress.start()
+        self.processed = 0
+        self.total = None
+        self.started = time.monotonic()
+        self.cancel_event.clear()
+        self.clean_button.config(state='disabled')
+        self.cancel_button.config(state='normal')
+        self.worker = threading.Thread(target=self.run_batch, args=(paths, recursive, options, workers),
+                                       daemon=True)
+        self.worker.start()
+
+    def run_batch(self, paths, recursive, options, workers):
+        """Worker thread: clean everything and report through self.events. Never touches Tk.
+
+        The batch is journaled under an ID derived from its paths and options,
+        so running the same selection again after a crash or cancel resumes it.
+        """
+        processed = failed = 0
+        app_dir = default_cache_dir()
+        events = journal = None
         try:
-            parser = createParser(input_path)
-            if not parser:
-                self.log(f"No parser available for {os.path.basename(input_path)} - simple copy")
-                shutil.copy2(input_path, output_path)
-                return
-            with parser:
-                metadata = extractMetadata(parser)
-                if metadata:
-                    with open(input_path, "rb") as src, open(output_path, "wb") as dest:
-                        shutil.copyfileobj(src, dest)
-                else:
-                    shutil.copy2(input_path, output_path)
+            try:
+                os.makedirs(app_dir, exist_ok=True)
+                events = EventLog(os.path.join(app_dir, 'events.jsonl'))
+            except OSError as e:
+                self.log(f"Cannot write the event log: {str(e)}", level='warning')
+            try:
+                journal = JobJournal(os.path.join(app_dir, 'jobs'),
+                                     job_id_for(paths, recursive, options), options)
+            except (OSError, ValueError) as e:
+                self.log(f"Cannot journal this batch, it will not be resumable: {str(e)}", level='warning')
+            if journal and journal.resumed:
+                self.log(f"Resuming interrupted job {journal.job_id}")
+            files = iter_files(paths, recursive=recursive, size_limit=options.size_limit,
+                               skip_dirs=[options.output_dir], log=self.log)
+            if not recursive:
+                files = list(files)
+                self.events.put(('total', len(files)))
+            for result in clean_paths(files, options, workers=workers, cancel=self.cancel_event, journal=journal):
+                processed += 1
+                for level, message in result.messages:
+                    self.log(message, level=level)
+                if events:
+                    events.observe(result)
+                name = os.path.basename(result.input_path)
+                if result.status == 'cleaned':
+                    self.log(f"Successfully cleaned: {name}")
+                    self.log(f"Saved to: {result.output_path}")
+                elif result.status == 'copied':
+                    self.log(f"Copied without changes: {name}", level='warning')
+                    self.log(f"Saved to: {result.output_path}")
+                elif result.status == 'failed':
+                    failed += 1
+                    self.log(f"Error processing {name}: {result.error}", level='error')
+                self.events.put(('result',))
+            if journal and not failed and not self.cancel_event.is_set():
+                journal.discard()
+                journal = None
         except Exception as e:
-            raise Exception(f"Generic cleaning failed: {str(e)}")
+            self.log(f"Batch failed: {str(e)}", level='error')
+        finally:
+            if events:
+                events.close()
+            if journal:
+                journal.close()
+                self.log(f"Progress saved as job {journal.job_id}; clean the same selection again to resume")
+            self.events.put(('done', processed))
+
+    def finish(self, processed):
+        self.worker.join()
+        self.worker = None
+        self.progress.stop()
+        self.update_progress()
+        self.clean_button.config(state='normal')
+        self.cancel_button.config(state='disabled')
+        if self.cancel_event.is_set():
+            self.status_var.set(self.status_var.get() + " (cancelled)")
+            messagebox.showinfo("Cancelled", f"Cleaning cancelled after {processed} file(s).")
+        elif processed:
+            messagebox.showinfo("Complete", "Metadata cleaning process finished!")
+        else:
+            messagebox.showwarning("Warning", "No files to process")
 
 if __name__ == "__main__":
+    freeze_support()
+    if len(sys.argv) > 1:
+        from metastripper_core.cli import main
+        sys.exit(main())
     root = Tk()
     app = MetaStripper(root)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,9 @@
+"""Headless MetaStripper engine, shared by the Tk GUI and the command line."""
+from .engine import CleanOptions, CleanResult, clean_file, clean_paths, get_output_path
+from .handlers import HANDLERS, get_handler
+from .walker import iter_files
+
+__all__ = [
+    'CleanOptions', 'CleanResult', 'clean_file', 'clean_paths', 'get_output_path',
+    'HANDLERS', 'get_handler', 'iter_files',
+]
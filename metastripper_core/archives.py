@@ -0,0 +1,244 @@
+"""Metadata removal for ZIP, 7z and RAR archives.
+
+Archives are read member by member. Members with a known format are
+extracted to a private temp file, sent through the matching cleaner and
+written back in their original order, one at a time; everything else is
+passed through (raw, for ZIP). Parallelism stays at the file level, across
+worker processes: member threads would compete with those processes for the
+same cores, and their time would escape the per-file stage timings. Nested archives are cleaned recursively up
+to ``MAX_DEPTH``. Member timestamps, comments and extra fields are normalized.
+RAR cannot be written, so cleaned RAR archives are repacked as ZIP; a cleaned
+nested RAR member is renamed to match (``.rar`` to ``.zip``).
+"""
+import os
+import shutil
+import tempfile
+import zipfile
+
+import py7zr
+import rarfile
+from py7zr.io import Py7zIO, WriterFactory
+
+from .handlers import HANDLERS, OUTPUT_EXTENSIONS, PASSTHROUGH_HANDLERS, copy_unchanged, temp_path_for
+from .metrics import nested
+from .ziputil import NORMALIZED_DATE, copy_raw
+
+ARCHIVE_EXTENSIONS = ('.zip', '.rar', '.7z')
+MAX_DEPTH = 3
+COPY_BUFSIZE = 1024 * 1024
+
+
+class EncryptedArchiveError(ValueError):
+    pass
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _member_handler(name, depth):
+    """Return the cleaner for an archive member, or ``None`` to pass it through."""
+    ext = os.path.splitext(name)[1].lower()
+    if ext in ARCHIVE_EXTENSIONS:
+        if depth + 1 >= MAX_DEPTH:
+            return None
+
+        def nested(input_path, output_path, options, log):
+            strip_archive(input_path, output_path, options, log, depth + 1)
+        return nested
+    handler = HANDLERS.get(ext)
+    if handler in PASSTHROUGH_HANDLERS:
+        return None
+    return handler
+
+
+def _cleaned_name(name):
+    """Name of a cleaned member whose container changed, e.g. a nested RAR repacked as ZIP."""
+    root, ext = os.path.splitext(name)
+    return root + OUTPUT_EXTENSIONS.get(ext.lower(), ext)
+
+
+def _clean_extracted(name, temp_in, handler, options, log):
+    """Clean an extracted member. Returns the cleaned temp path, or ``None`` to keep the original."""
+    temp_out = temp_path_for(os.path.basename(name), os.path.dirname(temp_in))
+    try:
+        with nested():
+            handler(temp_in, temp_out, options, log)
+        return temp_out
+    except Exception as e:
+        log(f"Could not clean archive member {name}, keeping it as-is: {str(e)}", level='warning')
+        _remove_quietly(temp_out)
+        return None
+
+
+def _clean_member(name, extract_to, handler, options, log, temp_dir):
+    """Extract one member to a temp file in ``temp_dir`` and clean it."""
+    temp_in = temp_path_for(os.path.basename(name), temp_dir)
+    try:
+        extract_to(temp_in)
+        return _clean_extracted(name, temp_in, handler, options, log)
+    except Exception as e:
+        log(f"Could not extract archive member {name}, keeping it as-is: {str(e)}", level='warning')
+        return None
+    finally:
+        _remove_quietly(temp_in)
+
+
+def _write_file(zout, info, path):
+    info.file_size = os.path.getsize(path)
+    with open(path, 'rb') as src, zout.open(info, 'w') as dst:
+        shutil.copyfileobj(src, dst, COPY_BUFSIZE)
+
+
+def _new_info(name, date_time, keep_date):
+    info = zipfile.ZipInfo(name, date_time if keep_date else NORMALIZED_DATE)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.create_system = 3
+    info.external_attr = (0o40755 << 16 | 0x10) if name.endswith('/') else (0o644 << 16)
+    return info
+
+
+def _extractor(archive, info):
+    def extract_to(path):
+        with archive.open(info) as src, open(path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, COPY_BUFSIZE)
+    return extract_to
+
+
+def _repack_zip(archive, raw_src, output_path, options, log, depth):
+    """Write a normalized ZIP from a ``ZipFile`` or ``RarFile``; ``raw_src`` enables raw copies."""
+    keep_date = options.keep_date
+    temp_dir = os.path.dirname(os.path.abspath(output_path))
+    with zipfile.ZipFile(output_path, 'w') as zout:
+        for info in archive.infolist():
+            handler = None if info.is_dir() else _member_handler(info.filename, depth)
+            cleaned = None
+            if handler is not None:
+                cleaned = _clean_member(info.filename, _extractor(archive, info), handler, options, log, temp_dir)
+            if cleaned:
+                try:
+                    _write_file(zout, _new_info(_cleaned_name(info.filename), info.date_time, keep_date), cleaned)
+                finally:
+                    _remove_quietly(cleaned)
+            elif raw_src is not None:
+                copy_raw(archive, raw_src, info, zout, normalize=True, keep_date=keep_date)
+            elif info.is_dir():
+                zout.writestr(_new_info(info.filename.rstrip('/') + '/', info.date_time, keep_date), b'')
+            else:
+                dest = _new_info(info.filename, info.date_time, keep_date)
+                dest.file_size = info.file_size
+                with archive.open(info) as src, zout.open(dest, 'w') as dst:
+                    shutil.copyfileobj(src, dst, COPY_BUFSIZE)
+
+
+class _TempFileIO(Py7zIO):
+    """py7zr output target that spools one member to a temp file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'w+b')
+
+    def write(self, s):
+        return self._file.write(s)
+
+    def read(self, size=None):
+        return self._file.read(size)
+
+    def seek(self, offset, whence=0):
+        return self._file.seek(offset, whence)
+
+    def flush(self):
+        self._file.flush()
+
+    def size(self):
+        return os.fstat(self._file.fileno()).st_size
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+class _StreamingFactory(WriterFactory):
+    """Hands each finished 7z member to ``on_member`` as soon as py7zr starts on the next one.
+
+    Members are spooled to temp files in ``temp_dir``.
+    """
+
+    def __init__(self, on_member, temp_dir):
+        self.on_member = on_member
+        self.temp_dir = temp_dir
+        self.current = None
+
+    def create(self, filename):
+        self.finish()
+        self.current = (filename, _TempFileIO(temp_path_for(os.path.basename(filename), self.temp_dir)))
+        return self.current[1]
+
+    def finish(self):
+        if self.current:
+            filename, product = self.current
+            self.current = None
+            product.close()
+            self.on_member(filename, product.path)
+
+
+def _clean_7z(input_path, output_path, options, log, depth):
+    temp_dir = os.path.dirname(os.path.abspath(output_path))
+    # Reading from a file object keeps py7zr from extracting folders on parallel threads,
+    # so members reach the factory one after the other.
+    with open(input_path, 'rb') as src, py7zr.SevenZipFile(src, 'r') as zin:
+        if zin.needs_password():
+            raise EncryptedArchiveError("encrypted 7z archive")
+        directories = [info.filename for info in zin.list() if info.is_directory]
+        with py7zr.SevenZipFile(output_path, 'w') as zout:
+            # The factory only sees files, so folders (empty ones included) are written up front.
+            if directories:
+                with tempfile.TemporaryDirectory(dir=temp_dir) as empty:
+                    for name in directories:
+                        zout.write(empty, name)
+
+            def on_member(name, extracted):
+                handler = _member_handler(name, depth)
+                cleaned = _clean_extracted(name, extracted, handler, options, log) if handler else None
+                try:
+                    with open(cleaned or extracted, 'rb') as f:
+                        zout.writef(f, _cleaned_name(name) if cleaned else name)
+                finally:
+                    _remove_quietly(extracted)
+                    if cleaned:
+                        _remove_quietly(cleaned)
+
+            factory = _StreamingFactory(on_member, temp_dir)
+            zin.extractall(factory=factory)
+            factory.finish()
+
+
+def strip_archive(input_path, output_path, options, log, depth=0):
+    """Clean every member of the archive at ``input_path`` into a new archive at ``output_path``."""
+    ext = os.path.splitext(input_path)[1].lower()
+    if ext == '.7z':
+        _clean_7z(input_path, output_path, options, log, depth)
+    elif ext == '.rar':
+        with rarfile.RarFile(input_path) as archive:
+            if archive.needs_password():
+                raise EncryptedArchiveError("encrypted RAR archive")
+            _repack_zip(archive, None, output_path, options, log, depth)
+    else:
+        # Raw copies get their own handle, so extracting a member never moves the ZipFile's file position.
+        with zipfile.ZipFile(input_path) as archive, open(input_path, 'rb') as raw_src:
+            if any(info.flag_bits & 0x01 for info in archive.infolist()):
+                raise EncryptedArchiveError("encrypted ZIP archive")
+            _repack_zip(archive, raw_src, output_path, options, log, depth)
+
+
+def clean_archive(input_path, output_path, options, log):
+    try:
+        strip_archive(input_path, output_path, options, log)
+    except EncryptedArchiveError:
+        log(f"Encrypted archive detected: {input_path}, copying without cleaning", level='warning')
+        copy_unchanged(input_path, output_path)
+    except Exception as e:
+        raise Exception(f"Archive cleaning failed: {str(e)}")
@@ -0,0 +1,409 @@
+"""Audio tag removal.
+
+MP3, FLAC, WAV, Ogg Vorbis/Opus and M4A files are cleaned in a single pass
+that writes straight to the output and never modifies the input: tag regions
+(ID3v2, APE, Lyrics3, ID3v1, FLAC metadata blocks, RIFF ``LIST/INFO`` and
+similar chunks) are skipped by offset and the audio payload is copied with
+:func:`metastripper_core.fileio.copy_range`. Ogg streams get a fresh comment
+header, which renumbers every following page. Files these parsers reject
+fall back to mutagen, run on the output copy.
+"""
+import os
+import zlib
+import struct
+
+import mutagen
+from mutagen.id3 import ID3
+
+from .fileio import clone_file, copy_range
+from .metrics import stage
+from .mp4 import strip_mp4
+
+ID3V1_SIZE = 128
+APE_FOOTER_SIZE = 32
+APE_HAS_HEADER = 0x80000000
+FLAC_KEPT_BLOCKS = {0, 3, 5}  # STREAMINFO, SEEKTABLE, CUESHEET
+FLAC_VORBIS_COMMENT = 4
+WAV_DROPPED_CHUNKS = {b'id3 ', b'ID3 ', b'bext', b'iXML', b'_PMX', b'axml', b'cart', b'DISP'}
+WAV_INFO_KEYS = {'copyright': b'ICOP', 'date': b'ICRD'}
+VORBIS_KEYS = {'copyright': b'COPYRIGHT', 'date': b'DATE'}
+ID3_FRAMES = {'copyright': 'TCOP', 'date': 'TDRC'}
+OGG_HEADER = struct.Struct('<4sBBqIIIB')
+OGG_BOS = 0x02
+OGG_CONTINUED = 0x01
+
+_BIT_REVERSED = bytes(int(f'{i:08b}'[::-1], 2) for i in range(256))
+
+
+def _kept(keep_copyright, keep_date):
+    return [name for name, keep in (('copyright', keep_copyright), ('date', keep_date)) if keep]
+
+
+def _syncsafe(data):
+    if any(b & 0x80 for b in data):
+        raise ValueError("bad syncsafe integer")
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def _to_syncsafe(value):
+    return bytes(((value >> shift) & 0x7F) for shift in (21, 14, 7, 0))
+
+
+def _file_size(src):
+    src.seek(0, os.SEEK_END)
+    size = src.tell()
+    src.seek(0)
+    return size
+
+
+def _leading_id3(src, pos=0):
+    """Return the offset just past any ID3v2 tags starting at ``pos``."""
+    while True:
+        src.seek(pos)
+        header = src.read(10)
+        if len(header) < 10 or header[:3] != b'ID3' or header[3] == 0xFF or header[4] == 0xFF:
+            return pos
+        pos += 10 + _syncsafe(header[6:10]) + (10 if header[5] & 0x10 else 0)
+
+
+def _trailing_tags(src, start, end):
+    """Return the offset where ID3v1, APE, Lyrics3v2 and appended ID3v2 tags at ``end`` begin."""
+    while end > start:
+        if end - start >= ID3V1_SIZE:
+            src.seek(end - ID3V1_SIZE)
+            if src.read(3) == b'TAG':
+                end -= ID3V1_SIZE
+                continue
+        if end - start >= APE_FOOTER_SIZE:
+            src.seek(end - APE_FOOTER_SIZE)
+            footer = src.read(APE_FOOTER_SIZE)
+            if footer[:8] == b'APETAGEX':
+                _, size, _, flags = struct.unpack_from('<IIII', footer, 8)
+                end -= size + (APE_FOOTER_SIZE if flags & APE_HAS_HEADER else 0)
+                continue
+        if end - start >= 15:
+            src.seek(end - 15)
+            tail = src.read(15)
+            if tail[6:] == b'LYRICS200' and tail[:6].isdigit():
+                end -= int(tail[:6]) + 15
+                continue
+        if end - start >= 10:
+            src.seek(end - 10)
+            footer = src.read(10)
+            if footer[:3] == b'3DI':
+                end -= _syncsafe(footer[6:10]) + 20
+                continue
+        break
+    if end < start:
+        raise ValueError("trailing tag larger than file")
+    return end
+
+
+def _id3_tag(input_path, keep):
+    """Build an ID3v2.4 tag holding only the frames named in ``keep`` from the input's tag."""
+    if not keep:
+        return b''
+    tags = ID3(input_path)
+    frames = b''
+    for name in keep:
+        frame = tags.get(ID3_FRAMES[name])
+        if frame is None:
+            continue
+        data = b'\x03' + '\0'.join(str(text) for text in frame.text).encode('utf-8')
+        frames += ID3_FRAMES[name].encode() + _to_syncsafe(len(data)) + b'\0\0' + data
+    return b'ID3\x04\x00\x00' + _to_syncsafe(len(frames)) + frames if frames else b''
+
+
+def strip_mp3(input_path, output_path, keep_copyright=False, keep_date=False):
+    with open(input_path, 'rb') as src:
+        with stage('parse'):
+            file_size = _file_size(src)
+            start = _leading_id3(src)
+            end = _trailing_tags(src, start, file_size)
+            if start > end:
+                raise ValueError("ID3v2 tag larger than file")
+        with stage('rewrite'):
+            tag = _id3_tag(input_path, _kept(keep_copyright, keep_date)) if start else b''
+        with stage('write'), open(output_path, 'wb') as dst:
+            dst.write(tag)
+            copy_range(src, dst, start, end - start)
+
+
+def _parse_comments(data, pos=0):
+    """Split a Vorbis comment structure into ``(vendor, comments)``."""
+    try:
+        (length,) = struct.unpack_from('<I', data, pos)
+        vendor = data[pos + 4:pos + 4 + length]
+        pos += 4 + length
+        (count,) = struct.unpack_from('<I', data, pos)
+        pos += 4
+        comments = []
+        for _ in range(count):
+            (length,) = struct.unpack_from('<I', data, pos)
+            comments.append(data[pos + 4:pos + 4 + length])
+            pos += 4 + length
+    except struct.error:
+        raise ValueError("truncated Vorbis comment")
+    if pos > len(data):
+        raise ValueError("truncated Vorbis comment")
+    return vendor, comments
+
+
+def _build_comments(vendor, comments, keep):
+    """Serialize a Vorbis comment structure keeping only the fields named in ``keep``."""
+    keys = {VORBIS_KEYS[name] for name in keep}
+    kept = [c for c in comments if c.split(b'=', 1)[0].upper() in keys]
+    out = struct.pack('<I', len(vendor)) + vendor + struct.pack('<I', len(kept))
+    for comment in kept:
+        out += struct.pack('<I', len(comment)) + comment
+    return out
+
+
+def strip_flac(input_path, output_path, keep_copyright=False, keep_date=False):
+    keep = _kept(keep_copyright, keep_date)
+    with open(input_path, 'rb') as src:
+        with stage('parse'):
+            file_size = _file_size(src)
+            pos = _leading_id3(src)
+            src.seek(pos)
+            if src.read(4) != b'fLaC':
+                raise ValueError("not a FLAC file")
+            pos += 4
+            blocks = []
+            last = False
+            while not last:
+                header = src.read(4)
+                if len(header) < 4:
+                    raise ValueError("truncated metadata block")
+                last, kind = bool(header[0] & 0x80), header[0] & 0x7F
+                length = int.from_bytes(header[1:], 'big')
+                if kind == 127 or pos + 4 + length > file_size:
+                    raise ValueError("bad metadata block")
+                if kind in FLAC_KEPT_BLOCKS or (kind == FLAC_VORBIS_COMMENT and keep):
+                    blocks.append((kind, src.read(length)))
+                else:
+                    src.seek(length, os.SEEK_CUR)
+                pos += 4 + length
+            if not blocks or blocks[0][0] != 0:
+                raise ValueError("missing STREAMINFO")
+        with stage('rewrite'):
+            out = bytearray(b'fLaC')
+            for kind, body in blocks:
+                if kind == FLAC_VORBIS_COMMENT:
+                    vendor, comments = _parse_comments(body)
+                    body = _build_comments(vendor, comments, keep)
+                out += bytes([kind]) + len(body).to_bytes(3, 'big') + body
+                last_header = len(out) - len(body) - 4
+            out[last_header] |= 0x80
+        with stage('write'), open(output_path, 'wb') as dst:
+            dst.write(out)
+            copy_range(src, dst, pos, file_size - pos)
+
+
+def _info_list(body, keep):
+    """Rebuild a ``LIST/INFO`` chunk body with only the fields named in ``keep``; ``b''`` if none."""
+    keys = {WAV_INFO_KEYS[name] for name in keep}
+    out = b''
+    pos = 4
+    while pos + 8 <= len(body):
+        key, size = struct.unpack_from('<4sI', body, pos)
+        padded = size + (size & 1)
+        if key in keys:
+            out += body[pos:pos + 8 + padded]
+        pos += 8 + padded
+    return b'INFO' + out if out else b''
+
+
+def strip_wav(input_path, output_path, keep_copyright=False, keep_date=False):
+    keep = _kept(keep_copyright, keep_date)
+    with open(input_path, 'rb') as src:
+        with stage('parse'):
+            file_size = _file_size(src)
+            header = src.read(12)
+            if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+                raise ValueError("not a RIFF/WAVE file")
+            pieces = []  # (offset, length) ranges of the input, or bytes to write
+            pos = 12
+            while file_size - pos >= 8:
+                src.seek(pos)
+                chunk_id, size = struct.unpack('<4sI', src.read(8))
+                padded = size + (size & 1)
+                if pos + 8 + size > file_size:
+                    raise ValueError(f"chunk {chunk_id!r} runs past end of file")
+                padded = min(padded, file_size - pos - 8)
+                if chunk_id == b'LIST' and src.read(4) == b'INFO':
+                    src.seek(pos + 8)
+                    info = _info_list(src.read(size), keep) if keep else b''
+                    if info:
+                        pieces.append(b'LIST' + struct.pack('<I', len(info)) + info)
+                elif chunk_id not in WAV_DROPPED_CHUNKS:
+                    pieces.append((pos, 8 + padded))
+                pos += 8 + padded
+        riff_size = 4 + sum(len(p) if isinstance(p, bytes) else p[1] for p in pieces)
+        with stage('write'), open(output_path, 'wb') as dst:
+            dst.write(b'RIFF' + struct.pack('<I', riff_size) + b'WAVE')
+            for piece in pieces:
+                if isinstance(piece, bytes):
+                    dst.write(piece)
+                else:
+                    copy_range(src, dst, *piece)
+
+
+def ogg_crc(data):
+    """Ogg page checksum (CRC-32, polynomial 0x04C11DB7, unreflected), computed with zlib."""
+    crc = zlib.crc32(data.translate(_BIT_REVERSED), 0xFFFFFFFF) ^ 0xFFFFFFFF
+    return int(f'{crc:032b}'[::-1], 2)
+
+
+def ogg_page(flags, granule, serial, sequence, lacing, body):
+    page = bytearray(OGG_HEADER.pack(b'OggS', 0, flags, granule, serial, sequence, 0, len(lacing)))
+    page += lacing
+    page += body
+    page[22:26] = struct.pack('<I', ogg_crc(page))
+    return bytes(page)
+
+
+def ogg_paginate(packets, serial, sequence, flags=0):
+    """Lay complete header ``packets`` out on pages numbered from ``sequence``."""
+    segments = []  # (lacing value, data, ends packet)
+    for packet in packets:
+        for i in range(0, len(packet), 255):
+            chunk = packet[i:i + 255]
+            segments.append((len(chunk), chunk, len(chunk) < 255))
+        if len(packet) % 255 == 0:
+            segments.append((0, b'', True))
+    pages = []
+    for start in range(0, len(segments), 255):
+        group = segments[start:start + 255]
+        page_flags = flags if start == 0 else 0
+        if start and not segments[start - 1][2]:
+            page_flags |= OGG_CONTINUED
+        granule = 0 if any(ends for _, _, ends in group) else -1
+        pages.append(ogg_page(page_flags, granule, serial, sequence + len(pages),
+                              bytes(value for value, _, _ in group), b''.join(data for _, data, _ in group)))
+    return pages
+
+
+def _read_ogg_page(src):
+    """Return ``(header, lacing, body)`` of the next page, or None at end of file."""
+    header = src.read(OGG_HEADER.size)
+    if not header:
+        return None
+    if len(header) < OGG_HEADER.size or header[:4] != b'OggS' or header[4] != 0:
+        raise ValueError("bad Ogg page")
+    lacing = src.read(header[26])
+    body = src.read(sum(lacing))
+    if len(lacing) < header[26] or len(body) < sum(lacing):
+        raise ValueError("truncated Ogg page")
+    return header, lacing, body
+
+
+def _comment_packet(packet, keep):
+    if packet.startswith(b'OpusTags'):
+        vendor, comments = _parse_comments(packet, 8)
+        return b'OpusTags' + _build_comments(vendor, comments, keep)
+    if packet.startswith(b'\x03vorbis'):
+        vendor, comments = _parse_comments(packet, 7)
+        return b'\x03vorbis' + _build_comments(vendor, comments, keep) + b'\x01'
+    raise ValueError("missing comment header")
+
+
+def strip_ogg(input_path, output_path, keep_copyright=False, keep_date=False):
+    with open(input_path, 'rb') as src:
+        with stage('parse'):
+            file_size = _file_size(src)
+            packets, partial, header_pages, needed, serial = [], b'', 0, None, None
+            while needed is None or len(packets) < needed:
+                page = _read_ogg_page(src)
+                if page is None:
+                    raise ValueError("truncated Ogg headers")
+                header, lacing, body = page
+                _, _, flags, _, page_serial, _, _, _ = OGG_HEADER.unpack(header)
+                if serial is None:
+                    if not flags & OGG_BOS:
+                        raise ValueError("first Ogg page is not a stream start")
+                    serial = page_serial
+                elif page_serial != serial or flags & OGG_BOS:
+                    raise ValueError("multiplexed Ogg streams are not supported")
+                pos = 0
+                for value in lacing:
+                    partial += body[pos:pos + value]
+                    pos += value
+                    if value < 255:
+                        packets.append(partial)
+                        partial = b''
+                header_pages += 1
+                if needed is None and packets:
+                    if packets[0].startswith(b'\x01vorbis'):
+                        needed = 3
+                    elif packets[0].startswith(b'OpusHead'):
+                        needed = 2
+                    else:
+                        raise ValueError("unsupported Ogg codec")
+            if len(packets) != needed or partial:
+                raise ValueError("audio data shares a page with the Ogg headers")
+            audio_start = src.tell()
+            audio_pages = []
+            while True:
+                offset = src.tell()
+                header = src.read(OGG_HEADER.size)
+                if not header:
+                    break
+                if len(header) < OGG_HEADER.size or header[:4] != b'OggS':
+                    raise ValueError("bad Ogg page")
+                _, _, flags, _, page_serial, sequence, _, segments = OGG_HEADER.unpack(header)
+                if page_serial != serial or flags & OGG_BOS:
+                    raise ValueError("chained or multiplexed Ogg streams are not supported")
+                length = OGG_HEADER.size + segments + sum(src.read(segments))
+                if offset + length > file_size:
+                    raise ValueError("truncated Ogg page")
+                audio_pages.append((offset, length))
+                src.seek(offset + length)
+        with stage('rewrite'):
+            packets[1] = _comment_packet(packets[1], _kept(keep_copyright, keep_date))
+            pages = ogg_paginate(packets[:1], serial, 0, OGG_BOS) + ogg_paginate(packets[1:], serial, 1)
+            shift = len(pages) - header_pages
+        with stage('write'), open(output_path, 'wb') as dst:
+            dst.write(b''.join(pages))
+            if not shift:
+                copy_range(src, dst, audio_start, file_size - audio_start)
+                return
+            for offset, length in audio_pages:
+                src.seek(offset)
+                page = bytearray(src.read(length))
+                (sequence,) = struct.unpack_from('<I', page, 18)
+                struct.pack_into('<II', page, 18, sequence + shift, 0)
+                struct.pack_into('<I', page, 22, ogg_crc(page))
+                dst.write(page)
+
+
+def strip_m4a(input_path, output_path, keep_copyright=False, keep_date=False):
+    strip_mp4(input_path, output_path, keep_copyright, keep_date)
+
+
+STRIPPERS = {
+    '.mp3': strip_mp3, '.flac': strip_flac, '.wav': strip_wav,
+    '.ogg': strip_ogg, '.oga': strip_ogg, '.opus': strip_ogg, '.m4a': strip_m4a,
+}
+
+
+def clean_audio(input_path, output_path, options, log):
+    try:
+        stripper = STRIPPERS.get(os.path.splitext(input_path)[1].lower())
+        if stripper is not None:
+            try:
+                stripper(input_path, output_path, options.keep_copyright, options.keep_date)
+                return
+            except ValueError as e:
+                log(f"Direct tag removal failed for {os.path.basename(input_path)} ({e}), using mutagen",
+                    level='warning')
+        # mutagen edits files in place, so it only ever sees the output copy
+        with stage('write'):
+            clone_file(input_path, output_path)
+        with stage('rewrite'):
+            audio = mutagen.File(output_path)
+            if audio:
+                audio.delete()
+                audio.save()
+    except Exception as e:
+        raise Exception(f"Audio cleaning failed: {str(e)}")
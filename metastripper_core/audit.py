@@ -0,0 +1,828 @@
+"""Read-only metadata audit: header-only extraction into a queryable index.
+
+:func:`scan_file` lists the identifying fields a file carries without
+changing it. Each scanner reads only the regions that hold metadata (JPEG
+segments up to the first scan, PNG/RIFF/MP4 chunk headers with seeks over
+the data, the property parts of a ZIP package, the PDF trailer and info
+dictionary) and stops there. Formats without a scanner go through hachoir.
+Scanners report everything the matching cleaner removes, including blocks
+they cannot decode (maker notes, unknown APPn segments, data after a JPEG's
+end marker); hachoir makes no such promise, so only files read by a
+dedicated scanner count as clean for ``clean --skip-clean``.
+
+Fields are reported as ``(field, key, value)`` triples, where ``field`` is a
+coarse category from :data:`FIELDS` and ``key`` the format's own tag name.
+:func:`scan_paths` runs the scan on the worker pool and :class:`AuditIndex`
+stores the results in SQLite, where they can be queried ("which files carry
+GPS", "which authors appear") and used to skip files that are already clean.
+"""
+import os
+import re
+import time
+import zlib
+import struct
+import sqlite3
+import zipfile
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field as dataclass_field
+from datetime import datetime, timedelta, timezone
+
+from .engine import run_parallel
+from .exif import EXIF_HEADER
+from .heif import metadata_items
+from .mp4 import CONTAINERS, TOP_LEVEL, XMP_UUID, box_header
+from .ooxml import APP_PART, CORE_PART, CUSTOM_PART
+from .tiff import METADATA_TAGS
+
+FIELDS = ('author', 'gps', 'date', 'device', 'software', 'title', 'comment', 'copyright', 'organization',
+          'xmp', 'other')
+MAX_VALUE_LENGTH = 512
+MAX_TAG_BYTES = 64 * 1024  # larger TIFF values (maker notes, thumbnails) are not read
+HEAD_BYTES = 64 * 1024  # how much of RTF/HTML files is searched
+COMMIT_EVERY = 1000
+
+TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8, 13: 4,
+                   16: 8, 17: 8, 18: 8}
+TAG_SUBIFDS = 0x014A
+TAG_EXIF_IFD = 0x8769
+TAG_GPS_IFD = 0x8825
+TAG_INTEROP_IFD = 0xA005
+TAG_XMP = 0x02BC
+EXIF_TAGS = {
+    0x010E: ('comment', 'ImageDescription'), 0x010F: ('device', 'Make'), 0x0110: ('device', 'Model'),
+    0x0131: ('software', 'Software'), 0x0132: ('date', 'DateTime'), 0x013B: ('author', 'Artist'),
+    0x8298: ('copyright', 'Copyright'), 0x83BB: ('other', 'IPTC'), TAG_XMP: ('xmp', 'XMP'),
+    0x9C9B: ('title', 'XPTitle'), 0x9C9C: ('comment', 'XPComment'), 0x9C9D: ('author', 'XPAuthor'),
+    0x9C9E: ('comment', 'XPKeywords'), 0x9C9F: ('comment', 'XPSubject'),
+    0x9003: ('date', 'DateTimeOriginal'), 0x9004: ('date', 'DateTimeDigitized'),
+    0x9286: ('comment', 'UserComment'), 0xA430: ('author', 'CameraOwnerName'),
+    0xA431: ('device', 'BodySerialNumber'), 0xA433: ('device', 'LensMake'), 0xA434: ('device', 'LensModel'),
+    0xA435: ('device', 'LensSerialNumber'), 0x010D: ('title', 'DocumentName'), 0x013C: ('device', 'HostComputer'),
+    0x8649: ('other', 'Photoshop'), 0x927C: ('device', 'MakerNote'), 0xA420: ('other', 'ImageUniqueID'),
+    0x4746: ('other', 'Rating'), 0x4749: ('other', 'RatingPercent'), 0xC4A5: ('other', 'PrintIM'),
+    0xC62F: ('device', 'CameraSerialNumber'), 0xC634: ('other', 'DNGPrivateData'),
+}
+IMAGE_IFD_TAGS = set(EXIF_TAGS) | METADATA_TAGS | {TAG_SUBIFDS, TAG_EXIF_IFD, TAG_GPS_IFD, TAG_INTEROP_IFD}
+XP_TAGS = {0x9C9B, 0x9C9C, 0x9C9D, 0x9C9E, 0x9C9F}
+
+XMP_PREFIX = b'http://ns.adobe.com/xap/1.0/\x00'
+JPEG_KEPT = {0xE0, 0xEE}  # JFIF and Adobe; ICC profiles in APP2 are kept as well
+XMP_WRAPPER = re.compile(r'<\?xpacket[^>]*\?>|</?x:xmpmeta\b[^>]*>|</?rdf:RDF\b[^>]*>|\s+')
+XMP_TAGS = {
+    'dc:creator': 'author', 'dc:rights': 'copyright', 'dc:title': 'title', 'dc:description': 'comment',
+    'xmp:CreatorTool': 'software', 'xmp:CreateDate': 'date', 'xmp:ModifyDate': 'date',
+    'photoshop:DateCreated': 'date', 'photoshop:AuthorsPosition': 'author', 'exif:GPSLatitude': 'gps',
+    'exif:GPSLongitude': 'gps', 'tiff:Make': 'device', 'tiff:Model': 'device',
+}
+PNG_KEYWORDS = {
+    'author': 'author', 'copyright': 'copyright', 'creation time': 'date', 'software': 'software',
+    'title': 'title', 'description': 'comment', 'comment': 'comment', 'source': 'device',
+    'xml:com.adobe.xmp': 'xmp',
+}
+RIFF_INFO = {
+    b'IART': 'author', b'IENG': 'author', b'ITCH': 'author', b'ICRD': 'date', b'ICOP': 'copyright',
+    b'ISFT': 'software', b'INAM': 'title', b'IPRD': 'title', b'ICMT': 'comment', b'ISBJ': 'comment',
+    b'IKEY': 'comment', b'ISRC': 'organization', b'ISRF': 'device',
+}
+RIFF_METADATA_CHUNKS = {b'id3 ': 'other', b'ID3 ': 'other', b'bext': 'other', b'iXML': 'other',
+                        b'_PMX': 'xmp', b'XMP ': 'xmp', b'EXIF': 'other', b'axml': 'other'}
+ILST_KEYS = {
+    b'\xa9ART': 'author', b'aART': 'author', b'\xa9wrt': 'author', b'\xa9day': 'date', b'\xa9too': 'software',
+    b'\xa9swr': 'software', b'\xa9enc': 'software', b'\xa9nam': 'title', b'\xa9alb': 'title',
+    b'\xa9cmt': 'comment', b'desc': 'comment', b'cprt': 'copyright', b'\xa9xyz': 'gps', b'\xa9mak': 'device',
+    b'\xa9mod': 'device',
+}
+MP4_EPOCH = datetime(1904, 1, 1, tzinfo=timezone.utc)
+MP4_TIMESTAMPED = (b'mvhd', b'tkhd', b'mdhd')
+MP4_UDTA_STRUCTURE = {b'hdlr', b'free', b'skip'}
+AUDIO_KEYS = {
+    'artist': 'author', 'albumartist': 'author', 'composer': 'author', 'performer': 'author',
+    'lyricist': 'author', 'conductor': 'author', 'author': 'author', 'date': 'date', 'originaldate': 'date',
+    'title': 'title', 'album': 'title', 'copyright': 'copyright', 'organization': 'organization',
+    'encodedby': 'software', 'encoder': 'software', 'comment': 'comment', 'description': 'comment',
+    'website': 'other', 'location': 'gps',
+}
+ID3_FRAMES = {
+    'TPE1': 'author', 'TPE2': 'author', 'TPE3': 'author', 'TCOM': 'author', 'TEXT': 'author', 'TOLY': 'author',
+    'TOPE': 'author', 'TDRC': 'date', 'TDOR': 'date', 'TDEN': 'date', 'TYER': 'date', 'TIT2': 'title',
+    'TALB': 'title', 'TCOP': 'copyright', 'TPUB': 'organization', 'TENC': 'software', 'TSSE': 'software',
+    'COMM': 'comment', 'USLT': 'comment',
+}
+OOXML_CORE = {
+    'creator': 'author', 'lastModifiedBy': 'author', 'created': 'date', 'modified': 'date',
+    'lastPrinted': 'date', 'title': 'title', 'subject': 'comment', 'description': 'comment',
+    'keywords': 'comment', 'category': 'comment', 'contentStatus': 'other', 'identifier': 'other',
+}
+OOXML_APP = {'Company': 'organization', 'Manager': 'author', 'Application': 'software',
+             'AppVersion': 'software', 'Template': 'other', 'HyperlinkBase': 'other'}
+OOXML_REVIEW_PARTS = ('word/people.xml', 'word/comments.xml', 'ppt/commentAuthors.xml', 'ppt/authors.xml',
+                      'xl/persons/person.xml')
+REVIEW_AUTHOR = re.compile(rb'\s(?:w(?:15)?:author|name|displayName)="([^"]+)"')
+ODF_SETTINGS = re.compile(rb'<config:config-item config:name="(PrinterName|PrinterSetup|CurrentDatabaseDataSource|'
+                          rb'CurrentDatabaseCommand)"[^>]*>([^<]+)</config:config-item>')
+ODF_CHANGE_AUTHOR = re.compile(rb'<office:change-info\b.*?<dc:creator>([^<]+)</dc:creator>', re.S)
+ODF_META = {
+    'initial-creator': 'author', 'creator': 'author', 'creation-date': 'date', 'date': 'date',
+    'print-date': 'date', 'printed-by': 'author', 'generator': 'software', 'title': 'title',
+    'description': 'comment', 'subject': 'comment', 'keyword': 'comment', 'user-defined': 'other',
+    'template': 'other',
+}
+PDF_INFO = {'/Author': 'author', '/Creator': 'software', '/Producer': 'software', '/CreationDate': 'date',
+            '/ModDate': 'date', '/Title': 'title', '/Subject': 'comment', '/Keywords': 'comment',
+            '/Company': 'organization'}
+RTF_TEXT = re.compile(rb'\{\\(author|operator|company|manager|title|subject|doccomm|keywords)\s+([^}]*)\}')
+RTF_DATE = re.compile(rb'\{\\(creatim|revtim|printim)((?:\\[a-z]+\d+)+)\}')
+HTML_META = re.compile(rb'<meta\s+[^>]*?name\s*=\s*["\']?(author|generator|description|keywords|copyright)'
+                       rb'["\']?[^>]*?content\s*=\s*["\']([^"\']*)', re.I)
+HACHOIR_KEYS = {
+    'author': 'author', 'artist': 'author', 'music_composer': 'author', 'subtitle_author': 'author',
+    'producer': 'software', 'copyright': 'copyright', 'creation_date': 'date', 'last_modification': 'date',
+    'date_time_original': 'date', 'date_time_digitized': 'date', 'title': 'title', 'album': 'title',
+    'comment': 'comment', 'latitude': 'gps', 'longitude': 'gps', 'altitude': 'gps', 'location': 'gps',
+    'city': 'gps', 'country': 'gps', 'camera_manufacturer': 'device', 'camera_model': 'device',
+    'organization': 'organization', 'url': 'other',
+}
+
+
+def _text(raw, encoding='utf-8'):
+    value = raw.decode(encoding, errors='replace') if isinstance(raw, bytes) else str(raw)
+    return value.strip('\x00').strip()[:MAX_VALUE_LENGTH]
+
+
+def _add(found, category, key, value):
+    value = _text(value)
+    if value:
+        found.append((category, key, value))
+
+
+def _ifd(read, endian, offset, wanted, big=False):
+    """Yield ``(tag, type, count, raw)`` for the entries of the IFD at ``offset`` whose tag is in ``wanted``.
+
+    ``read(offset, length)`` fetches bytes of the TIFF data; ``big`` selects the BigTIFF layout.
+    ``wanted=None`` yields every entry.
+    """
+    count_format, entry_format, offset_format = ('Q', 'HHQ', 'Q') if big else ('H', 'HHI', 'I')
+    count_size, entry_size, inline = (8, 20, 8) if big else (2, 12, 4)
+    head = read(offset, count_size)
+    if len(head) < count_size:
+        raise ValueError("IFD offset out of range")
+    (count,) = struct.unpack(endian + count_format, head)
+    table = read(offset + count_size, count * entry_size)
+    if len(table) < count * entry_size:
+        raise ValueError("truncated IFD")
+    for i in range(count):
+        pos = i * entry_size
+        tag, typ, n = struct.unpack_from(endian + entry_format, table, pos)
+        if wanted is not None and tag not in wanted:
+            continue
+        size = TIFF_TYPE_SIZES.get(typ, 0) * n
+        if size <= inline:
+            raw = table[pos + entry_size - inline:pos + entry_size - inline + size]
+        elif size <= MAX_TAG_BYTES:
+            (value_offset,) = struct.unpack_from(endian + offset_format, table, pos + entry_size - inline)
+            raw = read(value_offset, size)
+        else:
+            raw = b''
+        yield tag, typ, n, raw
+
+
+def _gps(read, endian, offset, big=False):
+    refs, coords = {}, {}
+    for tag, typ, n, raw in _ifd(read, endian, offset, {1, 2, 3, 4}, big):
+        if typ == 2:
+            refs[tag] = _text(raw, 'ascii')
+        elif typ == 5 and n == 3 and len(raw) == 24:
+            parts = struct.unpack(endian + '6I', raw)
+            d, m, s = (parts[i] / parts[i + 1] if parts[i + 1] else 0.0 for i in (0, 2, 4))
+            coords[tag] = d + m / 60 + s / 3600
+    if 2 not in coords or 4 not in coords:
+        return 'present'
+    lat = -coords[2] if refs.get(1) == 'S' else coords[2]
+    lon = -coords[4] if refs.get(3) == 'W' else coords[4]
+    return f"{lat:.6f},{lon:.6f}"
+
+
+def _next_ifd(read, endian, offset, big=False):
+    count_format, entry_size, offset_format, offset_size = ('Q', 20, 'Q', 8) if big else ('H', 12, 'I', 4)
+    (count,) = struct.unpack(endian + count_format, read(offset, 8 if big else 2))
+    pointer = read(offset + (8 if big else 2) + count * entry_size, offset_size)
+    return struct.unpack(endian + offset_format, pointer)[0] if len(pointer) == offset_size else 0
+
+
+def _pointers(endian, typ, raw):
+    if typ in (4, 13):
+        return list(struct.unpack(f'{endian}{len(raw) // 4}I', raw[:len(raw) // 4 * 4]))
+    if typ in (16, 18):
+        return list(struct.unpack(f'{endian}{len(raw) // 8}Q', raw[:len(raw) // 8 * 8]))
+    return []
+
+
+def _tag_field(found, tag, typ, n, raw):
+    category, key = EXIF_TAGS.get(tag, ('other', f'0x{tag:04X}'))
+    if tag == TAG_XMP:
+        found.extend(_xmp_fields(raw) or [('xmp', 'XMP', f"{n} bytes")])
+    elif tag in XP_TAGS:
+        _add(found, category, key, raw.decode('utf-16-le', errors='replace'))
+    elif tag == 0x9286:
+        encoding = 'utf-16' if raw[:8] == b'UNICODE\x00' else 'latin-1'
+        _add(found, category, key, raw[8:].decode(encoding, errors='replace'))
+    elif typ == 2:
+        _add(found, category, key, raw)
+    else:
+        found.append((category, key, f"{TIFF_TYPE_SIZES.get(typ, 1) * n} bytes"))
+
+
+def _tiff_fields(read):
+    """Fields of TIFF/EXIF data accessed through ``read(offset, length)``.
+
+    Image IFDs (IFD0, the IFDs chained after it and their SubIFDs) are
+    searched for the tags the TIFF cleaner removes. The Exif and GPS sub-IFDs
+    are removed whole, so every entry in them counts.
+    """
+    found = []
+    order = read(0, 8)
+    if order[:2] == b'II':
+        endian = '<'
+    elif order[:2] == b'MM':
+        endian = '>'
+    else:
+        raise ValueError("bad TIFF byte order")
+    (version,) = struct.unpack_from(endian + 'H', order, 2)
+    big = version == 43
+    if big:
+        (offset,) = struct.unpack(endian + 'Q', read(8, 8))
+    else:
+        (offset,) = struct.unpack_from(endian + 'I', order, 4)
+    pending, seen = [offset], set()
+    while pending:
+        offset = pending.pop()
+        if offset in seen or not offset:
+            continue
+        seen.add(offset)
+        for tag, typ, n, raw in _ifd(read, endian, offset, IMAGE_IFD_TAGS, big):
+            pointers = _pointers(endian, typ, raw)
+            if tag == TAG_SUBIFDS:
+                pending.extend(pointers)
+            elif tag == TAG_EXIF_IFD:
+                for pointer in pointers:
+                    _exif_ifd_fields(read, endian, pointer, big, found)
+            elif tag == TAG_GPS_IFD:
+                found.extend(('gps', 'GPSInfo', _gps(read, endian, pointer, big)) for pointer in pointers)
+            elif tag == TAG_INTEROP_IFD:
+                found.append(('other', 'InteropIFD', 'present'))
+            else:
+                _tag_field(found, tag, typ, n, raw)
+        pending.append(_next_ifd(read, endian, offset, big))
+    return found
+
+
+def _exif_ifd_fields(read, endian, offset, big, found):
+    """Known tags of the Exif sub-IFD by name; the rest (exposure settings, vendor tags) as a count."""
+    others = 0
+    for tag, typ, n, raw in _ifd(read, endian, offset, None, big):
+        if tag in EXIF_TAGS:
+            _tag_field(found, tag, typ, n, raw)
+        else:
+            others += 1
+    if others:
+        found.append(('other', 'ExifIFD', f"{others} tags"))
+
+
+def _exif_fields(data):
+    """Fields of an embedded Exif block, which the cleaners drop whole: never empty for a non-empty block."""
+    found = _tiff_fields(lambda offset, length: data[offset:offset + length])
+    return found or [('other', 'EXIF', f"{len(data)} bytes")]
+
+
+def _xmp_fields(data):
+    text = data.decode('utf-8', errors='replace') if isinstance(data, bytes) else data
+    if not XMP_WRAPPER.sub('', text):
+        return []  # an empty packet, as left behind by the cleaners
+    found = [('xmp', 'XMP', f"{len(data)} bytes")]
+    for tag, category in XMP_TAGS.items():
+        attribute = re.search(rf'\s{tag}="([^"]*)"', text)
+        if attribute:
+            _add(found, category, tag, attribute.group(1))
+            continue
+        element = re.search(rf'<{tag}\b[^>]*>(.*?)</{tag}>', text, re.S)
+        if element:
+            items = re.findall(r'<rdf:li\b[^>]*>(.*?)</rdf:li>', element.group(1), re.S) or [element.group(1)]
+            for item in items:
+                _add(found, category, tag, re.sub(r'<[^>]+>', '', item))
+    return found
+
+
+def _jpeg_segment(found, kind, data):
+    if kind == 0xE1 and data.startswith(EXIF_HEADER):
+        found.extend(_exif_fields(data[len(EXIF_HEADER):]))
+    elif kind == 0xE1 and data.startswith(XMP_PREFIX):
+        found.extend(_xmp_fields(data[len(XMP_PREFIX):]) or [('xmp', 'XMP', f"{len(data)} bytes")])
+    elif kind == 0xED and data.startswith(b'Photoshop 3.0\x00'):
+        found.append(('other', 'IPTC', f"{len(data)} bytes"))
+    elif kind == 0xE2 and data.startswith(b'MPF\x00'):
+        found.append(('other', 'MPF', f"{len(data)} bytes"))
+    elif kind == 0xFE:
+        _add(found, 'comment', 'COM', data)
+    else:
+        found.append(('other', f"APP{kind - 0xE0}", f"{len(data)} bytes"))
+
+
+def scan_jpeg(path):
+    """Every segment the JPEG cleaner drops (APPn other than JFIF, ICC and Adobe; COM) and data after EOI."""
+    found = []
+    with open(path, 'rb') as f:
+        if f.read(2) != b'\xff\xd8':
+            raise ValueError("not a JPEG file")
+        while True:
+            marker = f.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                break
+            kind = marker[1]
+            if kind in (0xDA, 0xD9):  # start of scan: nothing but image data follows
+                break
+            if kind == 0xFF or 0xD0 <= kind <= 0xD7 or kind == 0x01:
+                f.seek(-1 if kind == 0xFF else 0, os.SEEK_CUR)
+                continue
+            length_bytes = f.read(2)
+            if len(length_bytes) < 2:
+                break
+            length = struct.unpack('>H', length_bytes)[0] - 2
+            if not (0xE0 <= kind <= 0xEF or kind == 0xFE) or kind in JPEG_KEPT:
+                f.seek(length, os.SEEK_CUR)
+                continue
+            data = f.read(length)
+            if kind == 0xE2 and data.startswith(b'ICC_PROFILE\x00'):
+                continue
+            _jpeg_segment(found, kind, data)
+        f.seek(-2, os.SEEK_END)
+        if f.read(2) != b'\xff\xd9':
+            found.append(('other', 'trailer', 'data after the end of the image'))
+    return found
+
+
+def _png_text(kind, data):
+    keyword, _, rest = data.partition(b'\x00')
+    if kind == b'zTXt':
+        rest = zlib.decompressobj().decompress(rest[1:], MAX_VALUE_LENGTH * 4)
+    elif kind == b'iTXt':
+        compressed = rest[:1] == b'\x01'
+        rest = rest[2:].split(b'\x00', 2)[-1]
+        if compressed:
+            rest = zlib.decompressobj().decompress(rest, MAX_VALUE_LENGTH * 4)
+    return keyword.decode('latin-1'), rest
+
+
+def scan_png(path):
+    found = []
+    with open(path, 'rb') as f:
+        if f.read(8) != b'\x89PNG\r\n\x1a\n':
+            raise ValueError("not a PNG file")
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                break
+            length, kind = struct.unpack('>I4s', header)
+            if kind == b'IEND':
+                break
+            if kind in (b'tEXt', b'zTXt', b'iTXt'):
+                keyword, value = _png_text(kind, f.read(length))
+                category = PNG_KEYWORDS.get(keyword.lower(), 'other')
+                if category == 'xmp':
+                    found.extend(_xmp_fields(value) or [('xmp', keyword, f"{len(value)} bytes")])
+                else:
+                    _add(found, category, keyword, value)
+                f.seek(4, os.SEEK_CUR)
+            elif kind == b'eXIf':
+                found.extend(_exif_fields(f.read(length)))
+                f.seek(4, os.SEEK_CUR)
+            elif kind == b'tIME':
+                year, month, day, hour, minute, second = struct.unpack('>HBBBBB', f.read(7))
+                found.append(('date', 'tIME', f"{year:04d}-{month:02d}-{day:02d} {hour:02d}:{minute:02d}:{second:02d}"))
+                f.seek(4, os.SEEK_CUR)
+            else:
+                f.seek(length + 4, os.SEEK_CUR)  # skip image data without reading it
+    return found
+
+
+def scan_tiff(path):
+    with open(path, 'rb') as f:
+        def read(offset, length):
+            f.seek(offset)
+            return f.read(length)
+        return _tiff_fields(read)
+
+
+def _riff_chunks(f, start, end):
+    """Yield ``(chunk_id, offset of data, size)`` for the RIFF chunks between ``start`` and ``end``."""
+    pos = start
+    while end - pos >= 8:
+        f.seek(pos)
+        chunk_id, size = struct.unpack('<4sI', f.read(8))
+        yield chunk_id, pos + 8, size
+        pos += 8 + size + (size & 1)
+
+
+def scan_heic(path):
+    """HEIC: the Exif and XMP items listed in the top-level ``meta`` box, which the HEIF cleaner drops."""
+    found = []
+    for kind, payload in metadata_items(path):
+        if not payload:
+            found.append(('xmp' if kind == 'xmp' else 'other', kind.upper(), 'item not read'))
+        elif kind == 'exif':
+            # Exif items start with the offset of the TIFF header, normally just past an "Exif\0\0" prefix.
+            tiff = payload[4:]
+            found.extend(_exif_fields(tiff[len(EXIF_HEADER):] if tiff.startswith(EXIF_HEADER) else tiff))
+        else:
+            found.extend(_xmp_fields(payload) or [('xmp', 'XMP', f"{len(payload)} bytes")])
+    return found
+
+
+def scan_riff(path):
+    """WebP and WAV: RIFF chunks are walked by their headers; only metadata chunks are read."""
+    found = []
+    with open(path, 'rb') as f:
+        header = f.read(12)
+        if header[:4] != b'RIFF':
+            raise ValueError("not a RIFF file")
+        file_size = os.fstat(f.fileno()).st_size
+        end = min(file_size, 8 + struct.unpack_from('<I', header, 4)[0])
+        if header[8:12] == b'WEBP' and file_size > end:
+            found.append(('other', 'trailer', 'data after the RIFF chunk'))
+        for chunk_id, offset, size in _riff_chunks(f, 12, end):
+            if chunk_id == b'LIST':
+                f.seek(offset)
+                if f.read(4) != b'INFO':
+                    continue
+                for key, value_offset, value_size in _riff_chunks(f, offset + 4, offset + size):
+                    f.seek(value_offset)
+                    _add(found, RIFF_INFO.get(key, 'other'), key.decode('latin-1'), f.read(value_size))
+            elif chunk_id == b'EXIF':
+                f.seek(offset)
+                data = f.read(size)
+                found.extend(_exif_fields(data[6:] if data.startswith(b'Exif\x00\x00') else data))
+            elif chunk_id in (b'XMP ', b'_PMX'):
+                f.seek(offset)
+                found.extend(_xmp_fields(f.read(size)) or [('xmp', 'XMP', f"{size} bytes")])
+            elif chunk_id in RIFF_METADATA_CHUNKS:
+                found.append((RIFF_METADATA_CHUNKS[chunk_id], chunk_id.decode('latin-1').strip(),
+                              f"{size} bytes"))
+    return found
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def scan_ooxml(path):
+    found = []
+    with zipfile.ZipFile(path) as z:
+        names = set(z.namelist())
+        if CORE_PART in names:
+            for element in ET.fromstring(z.read(CORE_PART)):
+                name = _local_name(element.tag)
+                _add(found, OOXML_CORE.get(name, 'other'), name, element.text or '')
+        if APP_PART in names:
+            for element in ET.fromstring(z.read(APP_PART)):
+                name = _local_name(element.tag)
+                if name in OOXML_APP:
+                    _add(found, OOXML_APP[name], name, element.text or '')
+        if CUSTOM_PART in names:
+            for element in ET.fromstring(z.read(CUSTOM_PART)):
+                value = ''.join(element.itertext())
+                _add(found, 'other', element.get('name') or _local_name(element.tag), value)
+        for part in OOXML_REVIEW_PARTS:
+            if part in names:
+                for author in sorted(set(REVIEW_AUTHOR.findall(z.read(part)))):
+                    _add(found, 'author', part, author)
+    return found
+
+
+def _odf_meta(found, data, prefix=''):
+    root = ET.fromstring(data)
+    for meta in root.iter():
+        if _local_name(meta.tag) != 'meta':
+            continue
+        for element in meta:
+            name = _local_name(element.tag)
+            if name == 'document-statistic':
+                continue
+            key = next((v for k, v in element.attrib.items() if _local_name(k) == 'name'), name)
+            _add(found, ODF_META.get(name, 'other'), prefix + key, ''.join(element.itertext()))
+
+
+def scan_odf(path):
+    """``meta.xml`` of the document and of every embedded object, printer settings and tracked-change authors."""
+    found = []
+    with zipfile.ZipFile(path) as z:
+        names = z.namelist()
+        for name in names:
+            if name == 'meta.xml' or name.endswith('/meta.xml'):
+                _odf_meta(found, z.read(name), name[:-len('meta.xml')])
+        if 'settings.xml' in names:
+            for key, value in ODF_SETTINGS.findall(z.read('settings.xml')):
+                _add(found, 'device', key.decode(), value)
+        if 'content.xml' in names:
+            for author in sorted(set(ODF_CHANGE_AUTHOR.findall(z.read('content.xml')))):
+                _add(found, 'author', 'change-info', author)
+    return found
+
+
+def scan_pdf(path):
+    from PyPDF2 import PdfReader
+
+    found = []
+    reader = PdfReader(path, strict=False)
+    if reader.is_encrypted:
+        return [('other', 'Encrypt', 'encrypted')]
+    info = reader.trailer.get('/Info')
+    if info is not None:
+        info = info.get_object()
+        for key in info:
+            _add(found, PDF_INFO.get(key, 'other'), key.lstrip('/'), info[key])
+    metadata = reader.trailer['/Root'].get_object().get('/Metadata')
+    if metadata is not None:
+        found.extend(_xmp_fields(metadata.get_object().get_data()))
+    return found
+
+
+def scan_rtf(path):
+    found = []
+    with open(path, 'rb') as f:
+        head = f.read(HEAD_BYTES)
+    for key, value in RTF_TEXT.findall(head):
+        category = {b'author': 'author', b'operator': 'author', b'manager': 'author',
+                    b'company': 'organization', b'title': 'title'}.get(key, 'comment')
+        _add(found, category, key.decode(), value)
+    for key, value in RTF_DATE.findall(head):
+        _add(found, 'date', key.decode(), value.replace(b'\\', b' '))
+    return found
+
+
+def scan_html(path):
+    found = []
+    with open(path, 'rb') as f:
+        head = f.read(HEAD_BYTES)
+    for key, value in HTML_META.findall(head):
+        key = key.decode().lower()
+        category = {'author': 'author', 'generator': 'software', 'copyright': 'copyright'}.get(key, 'comment')
+        _add(found, category, key, value)
+    return found
+
+
+def scan_nothing(path):
+    return []
+
+
+def _mp4_boxes(data, start, end):
+    pos = start
+    while pos < end:
+        size, kind, header = box_header(data, pos, end)
+        yield kind, pos + header, pos + size
+        pos += size
+
+
+def _meta_body(data, body):
+    """Start of the children of a ``meta`` box: a full box in MP4 (version/flags first), plain in QuickTime."""
+    return body if data[body + 4:body + 8] == b'hdlr' else body + 4
+
+
+def _scan_udta(data, start, end, found):
+    """Contents of ``udta`` and ``meta`` boxes, which the MP4 cleaner blanks whole."""
+    for kind, body, box_end in _mp4_boxes(data, start, end):
+        if kind == b'meta':
+            _scan_udta(data, _meta_body(data, body), box_end, found)
+        elif kind == b'ilst':
+            for key, item, item_end in _mp4_boxes(data, body, box_end):
+                value = b''
+                for sub, sub_body, sub_end in _mp4_boxes(data, item, item_end):
+                    if sub == b'data':
+                        value = data[sub_body + 8:sub_end]
+                _add(found, ILST_KEYS.get(key, 'other'), key.decode('latin-1'), value)
+        elif kind in ILST_KEYS and kind.startswith(b'\xa9'):
+            # QuickTime user data text: 16-bit length, 16-bit language, text
+            _add(found, ILST_KEYS[kind], kind.decode('latin-1'), data[body + 4:box_end])
+        elif kind == b'cprt':
+            _add(found, 'copyright', 'cprt', data[body + 6:box_end])  # after version, flags and language
+        elif kind not in MP4_UDTA_STRUCTURE:
+            found.append(('other', kind.decode('latin-1'), f"{box_end - body} bytes"))
+
+
+def _scan_moov(data, start, end, found):
+    for kind, body, box_end in _mp4_boxes(data, start, end):
+        if kind in CONTAINERS:
+            _scan_moov(data, body, box_end, found)
+        elif kind in (b'udta', b'meta'):
+            _scan_udta(data, _meta_body(data, body) if kind == b'meta' else body, box_end, found)
+        elif kind in MP4_TIMESTAMPED:
+            version = data[body]
+            (created,) = struct.unpack_from('>Q' if version == 1 else '>I', data, body + 4)
+            if created:
+                found.append(('date', kind.decode(), (MP4_EPOCH + timedelta(seconds=created)).isoformat()))
+        elif kind == b'uuid' and data[body:body + 16] == XMP_UUID:
+            found.extend(_xmp_fields(data[body + 16:box_end]) or [('xmp', 'XMP', f"{box_end - body} bytes")])
+
+
+def scan_mp4(path):
+    """MP4/MOV/M4A: top-level boxes are walked by header; only ``moov`` and metadata boxes are read."""
+    found = []
+    with open(path, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        pos = 0
+        while pos < file_size:
+            f.seek(pos)
+            head = f.read(min(32, file_size - pos))
+            size, kind, header = box_header(head.ljust(32, b'\0'), 0, file_size - pos)
+            if kind not in TOP_LEVEL:
+                raise ValueError(f"unexpected top-level box {kind!r}")
+            if kind in (b'moov', b'udta', b'meta') or (kind == b'uuid' and head[header:header + 16] == XMP_UUID):
+                f.seek(pos)
+                box = f.read(size)
+                _scan_moov(box, 0, len(box), found)
+            pos += size
+    return found
+
+
+def scan_audio(path):
+    import mutagen
+
+    found = []
+    audio = mutagen.File(path)
+    if audio is None or audio.tags is None:
+        return found
+    for key, value in audio.tags.items():
+        frame_id = getattr(value, 'FrameID', None)
+        if frame_id == 'APIC':
+            found.append(('other', frame_id, f"{value.mime}, {len(value.data)} bytes"))
+        elif frame_id:
+            _add(found, ID3_FRAMES.get(frame_id, 'other'), frame_id, str(value))
+        else:
+            for item in value if isinstance(value, list) else [value]:
+                _add(found, AUDIO_KEYS.get(key.lower(), 'other'), key, item)
+    for picture in getattr(audio, 'pictures', ()):
+        found.append(('other', 'picture', f"{picture.mime}, {len(picture.data)} bytes"))
+    return found
+
+
+def scan_generic(path):
+    from hachoir.parser import createParser
+    from hachoir.metadata import extractMetadata
+
+    found = []
+    parser = createParser(path)
+    if not parser:
+        return found
+    with parser:
+        metadata = extractMetadata(parser)
+    if metadata:
+        for item in metadata:
+            if item.key in HACHOIR_KEYS:
+                for value in item.values:
+                    _add(found, HACHOIR_KEYS[item.key], item.key, value.text)
+    return found
+
+
+SCANNERS = {
+    '.jpg': scan_jpeg, '.jpeg': scan_jpeg, '.png': scan_png, '.webp': scan_riff, '.wav': scan_riff,
+    '.tiff': scan_tiff, '.tif': scan_tiff, '.cr2': scan_tiff, '.nef': scan_tiff, '.dng': scan_tiff,
+    '.pdf': scan_pdf, '.docx': scan_ooxml, '.pptx': scan_ooxml, '.xlsx': scan_ooxml,
+    '.odt': scan_odf, '.odp': scan_odf, '.ods': scan_odf, '.odg': scan_odf,
+    '.rtf': scan_rtf, '.html': scan_html, '.htm': scan_html, '.txt': scan_nothing, '.csv': scan_nothing,
+    '.mp3': scan_audio, '.flac': scan_audio, '.ogg': scan_audio, '.oga': scan_audio, '.opus': scan_audio,
+    '.m4a': scan_mp4, '.mp4': scan_mp4, '.mov': scan_mp4, '.heic': scan_heic,
+}
+COMPLETE_SCANNERS = {scanner.__name__ for scanner in SCANNERS.values()}  # hachoir may miss what a cleaner strips
+
+
+@dataclass
+class ScanResult:
+    path: str
+    size: int = 0
+    mtime_ns: int = 0
+    scanner: str = ''
+    fields: list = dataclass_field(default_factory=list)  # (field, key, value) triples
+    error: str = ''
+    elapsed: float = 0.0
+
+    @property
+    def status(self):
+        """``'error'``, ``'metadata'`` or ``'clean'``."""
+        if self.error:
+            return 'error'
+        return 'metadata' if self.fields else 'clean'
+
+
+def scan_file(filepath, st=None):
+    """Extract the metadata fields of one file into a :class:`ScanResult`. Never raises."""
+    result = ScanResult(os.path.abspath(filepath))
+    start = time.perf_counter()
+    try:
+        st = st or os.stat(filepath)
+        result.size, result.mtime_ns = st.st_size, st.st_mtime_ns
+        scanner = SCANNERS.get(os.path.splitext(filepath)[1].lower(), scan_generic)
+        result.scanner = scanner.__name__
+        result.fields = scanner(filepath)
+    except Exception as e:
+        result.error = str(e) or type(e).__name__
+    finally:
+        result.elapsed = time.perf_counter() - start
+    return result
+
+
+def scan_paths(files, workers=None, cancel=None):
+    """Scan ``files`` (paths or ``(path, stat_result)`` pairs) in parallel, yielding results as they complete."""
+    return run_parallel(scan_file, files, (), workers, cancel)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE, size INTEGER, mtime_ns INTEGER,
+    scanner TEXT, status TEXT, error TEXT, scanned_at REAL
+);
+CREATE INDEX IF NOT EXISTS files_status ON files (status);
+CREATE TABLE IF NOT EXISTS fields (
+    file_id INTEGER, field TEXT, key TEXT, value TEXT
+);
+CREATE INDEX IF NOT EXISTS fields_file ON fields (file_id);
+CREATE INDEX IF NOT EXISTS fields_field ON fields (field, value);
+"""
+
+
+class AuditIndex:
+    """SQLite index of scan results, keyed by absolute path.
+
+    Writes are batched into one transaction per ``COMMIT_EVERY`` results;
+    call :meth:`close` (or :meth:`commit`) to flush the last batch.
+    """
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self.uncommitted = 0
+
+    def is_current(self, filepath, st):
+        """True if ``filepath`` was scanned with this size and mtime."""
+        row = self.db.execute("SELECT size, mtime_ns FROM files WHERE path = ?",
+                              (os.path.abspath(filepath),)).fetchone()
+        return row == (st.st_size, st.st_mtime_ns)
+
+    def is_clean(self, filepath, st):
+        """True if the last scan of ``filepath``, at this size and mtime, found no metadata.
+
+        Only scans by a dedicated scanner count: one that went through hachoir
+        proves nothing about what the cleaner would remove.
+        """
+        row = self.db.execute("SELECT size, mtime_ns, status, scanner FROM files WHERE path = ?",
+                              (os.path.abspath(filepath),)).fetchone()
+        return bool(row) and row[:3] == (st.st_size, st.st_mtime_ns, 'clean') and row[3] in COMPLETE_SCANNERS
+
+    def add(self, result):
+        values = (result.size, result.mtime_ns, result.scanner, result.status, result.error, time.time())
+        row = self.db.execute("SELECT id FROM files WHERE path = ?", (result.path,)).fetchone()
+        if row:
+            file_id = row[0]
+            self.db.execute("UPDATE files SET size = ?, mtime_ns = ?, scanner = ?, status = ?, error = ?, "
+                            "scanned_at = ? WHERE id = ?", values + (file_id,))
+            self.db.execute("DELETE FROM fields WHERE file_id = ?", (file_id,))
+        else:
+            file_id = self.db.execute(
+                "INSERT INTO files (path, size, mtime_ns, scanner, status, error, scanned_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", (result.path,) + values).lastrowid
+        self.db.executemany("INSERT INTO fields VALUES (?, ?, ?, ?)",
+                            [(file_id, category, key, value) for category, key, value in result.fields])
+        self.uncommitted += 1
+        if self.uncommitted >= COMMIT_EVERY:
+            self.commit()
+
+    def commit(self):
+        self.db.commit()
+        self.uncommitted = 0
+
+    def summary(self):
+        """``{'files': {status: count}, 'fields': {field: number of files carrying it}}``."""
+        return {
+            'files': dict(self.db.execute("SELECT status, COUNT(*) FROM files GROUP BY status")),
+            'fields': dict(self.db.execute(
+                "SELECT field, COUNT(DISTINCT file_id) FROM fields GROUP BY field ORDER BY 2 DESC")),
+        }
+
+    def files_with(self, category, value=None):
+        """Paths of the files carrying ``category`` (optionally with exactly ``value``), in path order."""
+        query = "SELECT DISTINCT f.path FROM fields x JOIN files f ON f.id = x.file_id WHERE x.field = ?"
+        params = [category]
+        if value is not None:
+            query += " AND x.value = ?"
+            params.append(value)
+        return [path for (path,) in self.db.execute(query + " ORDER BY f.path", params)]
+
+    def values(self, category):
+        """``(value, number of files)`` for every distinct value of ``category``, most common first."""
+        return self.db.execute(
+            "SELECT value, COUNT(DISTINCT file_id) FROM fields WHERE field = ? GROUP BY value "
+            "ORDER BY 2 DESC, 1", (category,)).fetchall()
+
+    def close(self):
+        self.commit()
+        self.db.close()
@@ -0,0 +1,558 @@
+"""Benchmark suite: a deterministic synthetic corpus and a timed run through the engine.
+
+:func:`generate_corpus` writes metadata-laden sample files for every format it
+knows how to produce. Each file is seeded from ``(seed, extension, index)``,
+so the same arguments always give the same corpus. :func:`run_benchmark`
+cleans a corpus through :func:`metastripper_core.engine.clean_paths` and
+reports throughput, latency percentiles and peak memory per handler, as a
+JSON-serializable dict that can be diffed between runs. :func:`import_time`
+measures how long the command line takes to import, which dominates the cost
+of short-lived worker processes.
+"""
+import io
+import os
+import sys
+import math
+import time
+import wave
+import random
+import struct
+import zipfile
+import subprocess
+import platform
+import tempfile
+import shutil
+from dataclasses import replace
+from datetime import datetime, timezone
+
+import py7zr
+from PIL import Image, PngImagePlugin
+from mutagen import id3
+from mutagen.flac import FLAC, Picture
+from mutagen.oggopus import OggOpus
+
+from .audio import OGG_BOS, ogg_page, ogg_paginate
+from .engine import CleanOptions, clean_paths, default_workers
+from .handlers import get_handler
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+REPORT_VERSION = 1
+FIXED_DATE = (2020, 1, 2, 3, 4, 6)
+FIXED_EPOCH = 1577934246  # FIXED_DATE as a Unix timestamp
+AUTHOR = 'Jane Example'
+WORDS = ('alpha', 'bravo', 'charlie', 'delta', 'echo', 'foxtrot', 'golf', 'hotel',
+         'india', 'juliet', 'kilo', 'lima', 'mike', 'november', 'oscar', 'papa')
+
+
+def _words(rng, size):
+    out = io.StringIO()
+    while out.tell() < size:
+        out.write(' '.join(rng.choice(WORDS) for _ in range(12)) + '.\n')
+    return out.getvalue()
+
+
+def _exif():
+    exif = Image.Exif()
+    exif[0x010F] = 'ExampleCam'  # Make
+    exif[0x0110] = 'Model X'  # Model
+    exif[0x013B] = AUTHOR  # Artist
+    exif[0x8298] = f'(c) {AUTHOR}'  # Copyright
+    exif[0x0132] = '2020:01:02 03:04:05'  # DateTime
+    exif.get_ifd(0x8825).update({1: 'N', 2: (52.0, 31.0, 12.0), 3: 'E', 4: (13.0, 24.0, 36.0)})
+    return exif
+
+
+def _noise_image(rng, size, bytes_per_pixel):
+    side = max(16, int(math.sqrt(size / bytes_per_pixel)))
+    return Image.frombytes('RGB', (side, side), rng.randbytes(side * side * 3))
+
+
+def _make_jpeg(path, rng, size):
+    _noise_image(rng, size, 2.5).save(path, 'JPEG', quality=90, exif=_exif(),
+                                      comment=f'Made by {AUTHOR}'.encode())
+
+
+def _make_png(path, rng, size):
+    info = PngImagePlugin.PngInfo()
+    info.add_text('Author', AUTHOR)
+    info.add_text('Copyright', f'(c) {AUTHOR}')
+    info.add_itxt('Description', 'Synthetic benchmark image')
+    _noise_image(rng, size, 3).save(path, 'PNG', pnginfo=info, exif=_exif())
+
+
+def _make_webp(path, rng, size):
+    _noise_image(rng, size, 2.5).save(path, 'WEBP', quality=90, exif=_exif())
+
+
+def _make_tiff(path, rng, size):
+    _noise_image(rng, size, 3).save(path, 'TIFF', exif=_exif())
+
+
+def _make_plain_image(fmt):
+    def make(path, rng, size):
+        _noise_image(rng, size, 3).save(path, fmt)
+    return make
+
+
+CONTENT_TYPES = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                 '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                 '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                 '<Default Extension="xml" ContentType="application/xml"/>'
+                 '<Default Extension="bin" ContentType="application/octet-stream"/>'
+                 '<Override PartName="/{main}" ContentType="{main_type}"/>'
+                 '<Override PartName="/docProps/core.xml" '
+                 'ContentType="application/vnd.openxmlformats-package.core-properties+xml"/>'
+                 '<Override PartName="/docProps/app.xml" '
+                 'ContentType="application/vnd.openxmlformats-officedocument.extended-properties+xml"/>'
+                 '</Types>')
+ROOT_RELS = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+             '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+             '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+             'relationships/officeDocument" Target="{main}"/>'
+             '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/package/2006/relationships/'
+             'metadata/core-properties" Target="docProps/core.xml"/>'
+             '<Relationship Id="rId3" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+             'relationships/extended-properties" Target="docProps/app.xml"/>'
+             '</Relationships>')
+CORE_XML = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<cp:coreProperties xmlns:cp="http://schemas.openxmlformats.org/package/2006/metadata/core-properties" '
+            'xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:dcterms="http://purl.org/dc/terms/" '
+            'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">'
+            f'<dc:title>Quarterly report</dc:title><dc:creator>{AUTHOR}</dc:creator>'
+            f'<cp:lastModifiedBy>{AUTHOR}</cp:lastModifiedBy><cp:revision>7</cp:revision>'
+            '<dcterms:created xsi:type="dcterms:W3CDTF">2020-01-02T03:04:05Z</dcterms:created>'
+            '<dcterms:modified xsi:type="dcterms:W3CDTF">2020-01-03T03:04:05Z</dcterms:modified>'
+            '</cp:coreProperties>')
+APP_XML = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+           '<Properties xmlns="http://schemas.openxmlformats.org/officeDocument/2006/extended-properties">'
+           '<Application>Microsoft Office Word</Application><Company>Example Corp</Company>'
+           f'<Manager>{AUTHOR}</Manager><TotalTime>42</TotalTime></Properties>')
+OOXML_MAIN = {
+    '.docx': ('word/document.xml',
+              'application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml',
+              '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+              '{paragraphs}</w:body></w:document>',
+              '<w:p w:rsidR="00A1B2C3" w:rsidRDefault="00D4E5F6"><w:r><w:t>{line}</w:t></w:r></w:p>'),
+    '.pptx': ('ppt/presentation.xml',
+              'application/vnd.openxmlformats-officedocument.presentationml.presentation.main+xml',
+              '<p:presentation xmlns:p="http://schemas.openxmlformats.org/presentationml/2006/main">'
+              '<p:extLst>{paragraphs}</p:extLst></p:presentation>',
+              '<p:ext uri="{line}"/>'),
+    '.xlsx': ('xl/workbook.xml',
+              'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml',
+              '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheets/>'
+              '<definedNames>{paragraphs}</definedNames></workbook>',
+              '<definedName name="n">{line}</definedName>'),
+}
+
+
+def _zip_info(name, compress_type=zipfile.ZIP_DEFLATED):
+    info = zipfile.ZipInfo(name, FIXED_DATE)
+    info.compress_type = compress_type
+    info.external_attr = 0o644 << 16
+    return info
+
+
+def _make_ooxml(path, rng, size):
+    ext = os.path.splitext(path)[1]
+    main, main_type, body, item = OOXML_MAIN[ext]
+    lines = _words(rng, size // 2).splitlines()
+    with zipfile.ZipFile(path, 'w') as z:
+        z.writestr(_zip_info('[Content_Types].xml'), CONTENT_TYPES.format(main=main, main_type=main_type))
+        z.writestr(_zip_info('_rels/.rels'), ROOT_RELS.format(main=main))
+        z.writestr(_zip_info('docProps/core.xml'), CORE_XML)
+        z.writestr(_zip_info('docProps/app.xml'), APP_XML)
+        z.writestr(_zip_info(main), body.format(paragraphs=''.join(item.format(line=line) for line in lines)))
+        z.writestr(_zip_info(os.path.dirname(main) + '/media/payload.bin', zipfile.ZIP_STORED),
+                   rng.randbytes(size // 2))
+
+
+def _pdf_stream(dictionary, data):
+    return f"<< {dictionary} /Length {len(data)} >>\nstream\n".encode() + data + b"\nendstream"
+
+
+def _make_pdf(path, rng, size):
+    """Write the PDF object by object: catalog, page tree, info, XMP, then a page and its content per page."""
+    pages = max(1, size // (64 * 1024))
+    kids = ' '.join(f"{5 + 2 * i} 0 R" for i in range(pages))
+    xmp = f'<x:xmpmeta xmlns:x="adobe:ns:meta/"><dc:creator>{AUTHOR}</dc:creator></x:xmpmeta>'.encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R /Metadata 4 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode(),
+        f"<< /Author ({AUTHOR}) /Creator (Example Writer) /Producer (Example PDF 1.0) /Title (Quarterly report) "
+        f"/CreationDate (D:20200102030405Z) >>".encode(),
+        _pdf_stream("/Type /Metadata /Subtype /XML", xmp),
+    ]
+    for i in range(pages):
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {6 + 2 * i} 0 R "
+                       f"/Resources << /ProcSet [/PDF] >> >>".encode())
+        filler = rng.randbytes(size // pages // 2).hex()
+        objects.append(_pdf_stream('', b'BT /F1 12 Tf 72 720 Td (' + _words(rng, 60).encode().strip()
+                                   + b') Tj ET\n% ' + filler.encode()))
+    out = bytearray(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b''.join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R /Info 3 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, 'wb') as f:
+        f.write(out)
+
+
+ODF_NAMESPACES = ('xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0" '
+                  'xmlns:style="urn:oasis:names:tc:opendocument:xmlns:style:1.0" '
+                  'xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0" '
+                  'xmlns:table="urn:oasis:names:tc:opendocument:xmlns:table:1.0" '
+                  'xmlns:draw="urn:oasis:names:tc:opendocument:xmlns:drawing:1.0" '
+                  'xmlns:svg="urn:oasis:names:tc:opendocument:xmlns:svg-compatible:1.0" '
+                  'xmlns:meta="urn:oasis:names:tc:opendocument:xmlns:meta:1.0" '
+                  'xmlns:dc="http://purl.org/dc/elements/1.1/" office:version="1.2"')
+ODF_CONTENT = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+               '<office:document-content {ns}><office:body>{body}</office:body></office:document-content>')
+ODF_STYLES = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+              '<office:document-styles {ns}><office:styles/><office:automatic-styles>'
+              '<style:page-layout style:name="Layout"/></office:automatic-styles><office:master-styles>'
+              '<style:master-page style:name="Default" style:page-layout-name="Layout"/></office:master-styles>'
+              '</office:document-styles>')
+ODF_META = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<office:document-meta {ns}><office:meta><dc:creator>{author}</dc:creator>'
+            '<meta:initial-creator>{author}</meta:initial-creator><dc:title>Quarterly report</dc:title>'
+            '<meta:creation-date>2020-01-02T03:04:05</meta:creation-date><dc:date>2020-01-03T03:04:05</dc:date>'
+            '</office:meta></office:document-meta>')
+ODF_MANIFEST = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<manifest:manifest xmlns:manifest="urn:oasis:names:tc:opendocument:xmlns:manifest:1.0" '
+                'manifest:version="1.2"><manifest:file-entry manifest:full-path="/" manifest:media-type="{mimetype}"/>'
+                '<manifest:file-entry manifest:full-path="content.xml" manifest:media-type="text/xml"/>'
+                '<manifest:file-entry manifest:full-path="styles.xml" manifest:media-type="text/xml"/>'
+                '<manifest:file-entry manifest:full-path="meta.xml" manifest:media-type="text/xml"/>'
+                '</manifest:manifest>')
+ODF_PAGE = ('<draw:page draw:name="page1" draw:master-page-name="Default"><draw:frame svg:width="20cm" '
+            'svg:height="10cm" svg:x="1cm" svg:y="1cm"><draw:text-box>{paragraphs}</draw:text-box></draw:frame>'
+            '</draw:page>')
+# extension -> (mimetype, office:body content)
+ODF_BODY = {
+    '.odt': ('application/vnd.oasis.opendocument.text', '<office:text>{paragraphs}</office:text>'),
+    '.ods': ('application/vnd.oasis.opendocument.spreadsheet',
+             '<office:spreadsheet><table:table table:name="Sheet1">{paragraphs}</table:table></office:spreadsheet>'),
+    '.odp': ('application/vnd.oasis.opendocument.presentation',
+             '<office:presentation>' + ODF_PAGE + '</office:presentation>'),
+    '.odg': ('application/vnd.oasis.opendocument.graphics', '<office:drawing>' + ODF_PAGE + '</office:drawing>'),
+}
+
+
+def _odf_paragraph(ext, line):
+    if ext != '.ods':
+        return f'<text:p>{line}</text:p>'
+    cells = ''.join(f'<table:table-cell office:value-type="string"><text:p>{word}</text:p></table:table-cell>'
+                    for word in line.split()[:4])
+    return f'<table:table-row>{cells}</table:table-row>'
+
+
+def _make_odf(path, rng, size):
+    ext = os.path.splitext(path)[1]
+    mimetype, body = ODF_BODY[ext]
+    paragraphs = ''.join(_odf_paragraph(ext, line) for line in _words(rng, size).splitlines())
+    with zipfile.ZipFile(path, 'w') as z:
+        z.writestr(_zip_info('mimetype', zipfile.ZIP_STORED), mimetype)
+        z.writestr(_zip_info('content.xml'),
+                   ODF_CONTENT.format(ns=ODF_NAMESPACES, body=body.format(paragraphs=paragraphs)))
+        z.writestr(_zip_info('styles.xml'), ODF_STYLES.format(ns=ODF_NAMESPACES))
+        z.writestr(_zip_info('meta.xml'), ODF_META.format(ns=ODF_NAMESPACES, author=AUTHOR))
+        z.writestr(_zip_info('META-INF/manifest.xml'), ODF_MANIFEST.format(mimetype=mimetype))
+
+
+def _make_rtf(path, rng, size):
+    body = _words(rng, size).replace('\n', '\\par\n')
+    with open(path, 'w', encoding='ascii') as f:
+        f.write('{\\rtf1\\ansi{\\info{\\title Quarterly report}{\\author ' + AUTHOR + '}'
+                '{\\creatim\\yr2020\\mo1\\dy2}}\n' + body + '}')
+
+
+def _make_text(path, rng, size):
+    content = _words(rng, size)
+    if path.endswith('.csv'):
+        content = content.replace(' ', ',')
+    elif path.endswith('.html'):
+        content = (f'<html><head><meta name="author" content="{AUTHOR}"></head><body><p>'
+                   + content.replace('\n', '</p><p>') + '</p></body></html>')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+
+OPUS_SERIAL = 0x5EED
+OPUS_PACKET_SIZE = 160
+OPUS_PAGE_SIZE = 4000
+MP3_FRAME_HEADER = b'\xff\xfb\x90\x64'  # MPEG-1 Layer III, 128 kbit/s, 44.1 kHz
+MP3_FRAME_SIZE = 417
+
+
+def _make_mp3(path, rng, size):
+    with open(path, 'wb') as f:
+        for _ in range(max(1, size // MP3_FRAME_SIZE)):
+            f.write(MP3_FRAME_HEADER + rng.randbytes(MP3_FRAME_SIZE - 4))
+    tags = id3.ID3()
+    tags.add(id3.TIT2(encoding=3, text='Synthetic track'))
+    tags.add(id3.TPE1(encoding=3, text=AUTHOR))
+    tags.add(id3.TDRC(encoding=3, text='2020-01-02'))
+    tags.add(id3.COMM(encoding=3, lang='eng', desc='', text='Recorded at home'))
+    tags.add(id3.APIC(encoding=3, mime='image/jpeg', type=3, desc='Cover', data=rng.randbytes(16 * 1024)))
+    tags.save(path)
+
+
+def _make_flac(path, rng, size):
+    streaminfo = struct.pack('>HH', 4096, 4096) + b'\0' * 6
+    streaminfo += ((44100 << 44) | (1 << 41) | (15 << 36) | 441000).to_bytes(8, 'big') + b'\0' * 16
+    with open(path, 'wb') as f:
+        f.write(b'fLaC' + bytes([0x80]) + len(streaminfo).to_bytes(3, 'big') + streaminfo)
+        f.write(b'\xff\xf8' + rng.randbytes(max(0, size - 64 * 1024)))
+    audio = FLAC(path)
+    audio['title'] = 'Synthetic track'
+    audio['artist'] = AUTHOR
+    audio['date'] = '2020-01-02'
+    picture = Picture()
+    picture.type, picture.mime, picture.data = 3, 'image/jpeg', rng.randbytes(16 * 1024)
+    audio.add_picture(picture)
+    audio.save()
+
+
+def _make_wav(path, rng, size):
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(44100)
+        w.writeframes(rng.randbytes(max(4, size // 4 * 4)))
+    info = b'INFO'
+    for key, value in ((b'IART', AUTHOR), (b'INAM', 'Synthetic track'), (b'ICRD', '2020-01-02')):
+        data = value.encode() + b'\0'
+        info += key + struct.pack('<I', len(data)) + data + (b'\0' if len(data) % 2 else b'')
+    with open(path, 'r+b') as f:
+        f.seek(0, os.SEEK_END)
+        f.write(b'LIST' + struct.pack('<I', len(info)) + info)
+        riff_size = f.tell() - 8
+        f.seek(4)
+        f.write(struct.pack('<I', riff_size))
+
+
+def _make_opus(path, rng, size):
+    head = b'OpusHead' + struct.pack('<BBHIhB', 1, 2, 312, 48000, 0, 0)
+    tags = b'OpusTags' + struct.pack('<I', 9) + b'synthetic' + struct.pack('<I', 0)
+    with open(path, 'wb') as f:
+        f.write(b''.join(ogg_paginate([head], OPUS_SERIAL, 0, OGG_BOS) + ogg_paginate([tags], OPUS_SERIAL, 1)))
+        for sequence in range(2, 2 + max(1, size // OPUS_PAGE_SIZE)):
+            packets = [rng.randbytes(OPUS_PACKET_SIZE) for _ in range(OPUS_PAGE_SIZE // OPUS_PACKET_SIZE)]
+            lacing = b''.join(b'\xff' * (len(p) // 255) + bytes([len(p) % 255]) for p in packets)
+            f.write(ogg_page(0, (sequence - 1) * 48000, OPUS_SERIAL, sequence, lacing, b''.join(packets)))
+    audio = OggOpus(path)
+    audio['title'] = 'Synthetic track'
+    audio['artist'] = AUTHOR
+    audio['date'] = '2020-01-02'
+    audio['comment'] = 'Recorded at home'
+    audio.save()
+
+
+def _box(kind, payload):
+    return struct.pack('>I', 8 + len(payload)) + kind + payload
+
+
+def _make_mp4(path, rng, size):
+    brand = {'.mov': b'qt  ', '.m4a': b'M4A '}.get(os.path.splitext(path)[1], b'isom')
+    ilst = b''.join(_box(key, _box(b'data', struct.pack('>II', 1, 0) + value.encode()))
+                    for key, value in ((b'\xa9nam', 'Synthetic clip'), (b'\xa9ART', AUTHOR),
+                                       (b'\xa9day', '2020-01-02')))
+    hdlr = _box(b'hdlr', b'\0' * 8 + b'mdirappl' + b'\0' * 9)
+    udta = _box(b'udta', _box(b'meta', b'\0' * 4 + hdlr + _box(b'ilst', ilst))
+                + _box(b'\xa9xyz', struct.pack('>HH', 18, 0) + b'+52.5200+013.4050/'))
+    mvhd = _box(b'mvhd', b'\0' * 12 + struct.pack('>II', 1000, 10000) + b'\0\x01\0\0\x01\0' + b'\0' * 74
+                + struct.pack('>I', 2))
+    with open(path, 'wb') as f:
+        f.write(_box(b'ftyp', brand + b'\0\0\x02\0' + brand))
+        f.write(_box(b'mdat', rng.randbytes(size)))
+        f.write(_box(b'moov', mvhd + udta))
+
+
+def _archive_members(rng, size):
+    members = []
+    for name, make in (('photo.jpg', _make_jpeg), ('report.docx', _make_ooxml), ('notes.txt', _make_text)):
+        fd, temp_path = tempfile.mkstemp(suffix=os.path.splitext(name)[1])
+        os.close(fd)
+        try:
+            make(temp_path, rng, size // 3)
+            with open(temp_path, 'rb') as f:
+                members.append((name, f.read()))
+        finally:
+            os.remove(temp_path)
+    return members
+
+
+def _make_zip(path, rng, size):
+    with zipfile.ZipFile(path, 'w') as z:
+        z.comment = f'Packed by {AUTHOR}'.encode()
+        for name, data in _archive_members(rng, size):
+            z.writestr(_zip_info(name), data)
+
+
+def _make_7z(path, rng, size):
+    staging = tempfile.mkdtemp(prefix='metastripper_bench_')
+    try:
+        with py7zr.SevenZipFile(path, 'w') as z:
+            for name, data in _archive_members(rng, size):
+                member = os.path.join(staging, name)
+                with open(member, 'wb') as f:
+                    f.write(data)
+                os.utime(member, (FIXED_EPOCH, FIXED_EPOCH))  # writestr() would stamp the current time
+                z.write(member, name)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def _make_generic(path, rng, size):
+    with open(path, 'wb') as f:
+        f.write(rng.randbytes(size))
+
+
+GENERATORS = {
+    '.jpg': _make_jpeg, '.jpeg': _make_jpeg, '.png': _make_png, '.webp': _make_webp, '.tiff': _make_tiff,
+    '.bmp': _make_plain_image('BMP'), '.gif': _make_plain_image('GIF'),
+    '.pdf': _make_pdf, '.docx': _make_ooxml, '.pptx': _make_ooxml, '.xlsx': _make_ooxml,
+    '.odt': _make_odf, '.ods': _make_odf, '.odp': _make_odf, '.odg': _make_odf, '.rtf': _make_rtf,
+    '.txt': _make_text, '.csv': _make_text, '.html': _make_text,
+    '.mp3': _make_mp3, '.flac': _make_flac, '.wav': _make_wav, '.opus': _make_opus,
+    '.m4a': _make_mp4, '.mp4': _make_mp4, '.mov': _make_mp4,
+    '.zip': _make_zip, '.7z': _make_7z, '.bin': _make_generic,
+}
+
+
+def generate_corpus(directory, count=5, size_kb=256, seed=0, extensions=None):
+    """Write ``count`` files of roughly ``size_kb`` for each extension and return their paths.
+
+    ``extensions`` limits the corpus to those suffixes (default: all in
+    :data:`GENERATORS`). Unknown extensions raise ``ValueError``.
+    """
+    extensions = sorted(GENERATORS) if extensions is None else [e.lower() for e in extensions]
+    unknown = [e for e in extensions if e not in GENERATORS]
+    if unknown:
+        raise ValueError(f"No generator for {', '.join(unknown)}")
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for ext in extensions:
+        for index in range(count):
+            path = os.path.join(directory, f"sample_{index:04d}{ext}")
+            GENERATORS[ext](path, random.Random(f"{seed}:{ext}:{index}"), size_kb * 1024)
+            paths.append(path)
+    return paths
+
+
+def import_time(module='metastripper_core.cli', top=10):
+    """Import ``module`` in a fresh interpreter under ``-X importtime``.
+
+    Returns the cumulative import time of ``module`` and the ``top`` modules
+    with the highest self time, all in milliseconds.
+    """
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          capture_output=True, text=True, check=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    total = next((cumulative for name, _, cumulative in rows if name == module), 0.0)
+    heaviest = sorted(rows, key=lambda row: row[1], reverse=True)[:top]
+    return {
+        'module': module,
+        'total_ms': round(total, 3),
+        'heaviest': [{'module': name, 'self_ms': round(self_ms, 3), 'cumulative_ms': round(cumulative, 3)}
+                     for name, self_ms, cumulative in heaviest],
+    }
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    rank = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+def _summary(timings, sizes, wall):
+    """Throughput over ``wall`` seconds (or over busy time when ``wall`` is None) and latency percentiles."""
+    timings = sorted(timings)
+    busy = wall if wall is not None else sum(timings)
+    total_bytes = sum(sizes)
+    return {
+        'files': len(timings),
+        'bytes': total_bytes,
+        'seconds': round(busy, 6),
+        'files_per_s': round(len(timings) / busy, 3) if busy else 0.0,
+        'mb_per_s': round(total_bytes / (1024 * 1024) / busy, 3) if busy else 0.0,
+        'p50_ms': round(_percentile(timings, 50) * 1000, 3),
+        'p99_ms': round(_percentile(timings, 99) * 1000, 3),
+    }
+
+
+def _peak_rss_mb(children=False):
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_benchmark(paths, options=None, workers=None):
+    """Clean ``paths`` into a scratch folder and return a JSON-serializable report.
+
+    The ``total`` section measures wall-clock throughput of the whole batch;
+    each ``handlers`` entry measures throughput over that handler's own busy
+    time, so it reflects per-file cost independent of the worker count.
+    """
+    workers = workers or default_workers()
+    scratch = tempfile.mkdtemp(prefix='metastripper_bench_')
+    options = options or CleanOptions()
+    options = replace(options, output_dir=scratch, cache_dir='')
+    sizes = {path: os.path.getsize(path) for path in paths}
+    per_handler = {}
+    timings, failures = [], []
+    try:
+        start = time.perf_counter()
+        for result in clean_paths(paths, options, workers=workers):
+            name = get_handler(result.input_path).__name__
+            group = per_handler.setdefault(name, {'timings': [], 'sizes': [], 'extensions': set(), 'failed': 0,
+                                                  'stages': {}})
+            group['timings'].append(result.elapsed)
+            group['sizes'].append(sizes[result.input_path])
+            group['extensions'].add(os.path.splitext(result.input_path)[1].lower())
+            for stage, seconds in result.stages.items():
+                group['stages'][stage] = group['stages'].get(stage, 0.0) + seconds
+            timings.append(result.elapsed)
+            if result.status == 'failed':
+                group['failed'] += 1
+                failures.append({'path': result.input_path, 'error': result.error})
+        wall = time.perf_counter() - start
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    handlers = {}
+    for name, group in sorted(per_handler.items()):
+        handlers[name] = _summary(group['timings'], group['sizes'], None)
+        handlers[name]['failed'] = group['failed']
+        handlers[name]['extensions'] = sorted(group['extensions'])
+        handlers[name]['stage_seconds'] = {stage: round(seconds, 6) for stage, seconds in group['stages'].items()}
+    total = _summary(timings, list(sizes.values()), wall)
+    total['failed'] = len(failures)
+    return {
+        'version': REPORT_VERSION,
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'workers': workers,
+        'total': total,
+        'handlers': handlers,
+        'peak_rss_mb': {'main': _peak_rss_mb(), 'workers': _peak_rss_mb(children=True)},
+        'failures': failures,
+    }
@@ -0,0 +1,179 @@
+"""Persistent result cache so repeated runs over the same tree skip unchanged files.
+
+Two layers, both stored in a SQLite database inside the cache directory:
+
+* ``files`` remembers, per input path, the size/mtime it had when it was last
+  cleaned, its content digest and where the output went. If the input stat,
+  the options and the output are all unchanged the file is skipped without
+  being read.
+* ``objects`` maps ``digest + options`` to a cleaned copy kept under
+  ``objects/``. A changed path with known content (a copy, a rename, a touched
+  file) is served by copying that object instead of cleaning again, and is
+  reported with the status of the run that stored it. Objects are evicted
+  least-recently-used once the cache grows past its size limit.
+
+Objects and outputs never share an inode: both directions use
+:func:`~metastripper_core.fileio.clone_file`, a reflink on copy-on-write
+filesystems and a real copy elsewhere, so editing a cleaned file in place
+cannot change what later cache hits return.
+"""
+import os
+import sys
+import time
+import sqlite3
+import hashlib
+import tempfile
+import threading
+
+from .fileio import clone_file, staging_path
+
+CACHE_VERSION = 1  # bump when handler output changes so stale results are ignored
+HASH_BUFSIZE = 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER, mtime_ns INTEGER, digest TEXT, options TEXT,
+    output_path TEXT, output_size INTEGER, output_mtime_ns INTEGER
+);
+CREATE TABLE IF NOT EXISTS objects (
+    key TEXT PRIMARY KEY, size INTEGER, last_used REAL, status TEXT
+);
+CREATE INDEX IF NOT EXISTS objects_last_used ON objects (last_used);
+"""
+
+
+def default_cache_dir():
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base or tempfile.gettempdir(), 'metastripper')
+
+
+def options_fingerprint(options):
+    """Encode every option that changes handler output."""
+    flags = (options.remove_all, options.keep_copyright, options.keep_date, options.strip_review_data)
+    return f"v{CACHE_VERSION}:" + ''.join('1' if f else '0' for f in flags)
+
+
+def file_digest(path):
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(HASH_BUFSIZE)
+            if not chunk:
+                return h.hexdigest()
+            h.update(chunk)
+
+
+def clone_into_place(src, dst):
+    """Clone ``src`` to a staging name next to ``dst`` and rename it over ``dst`` atomically."""
+    staged = staging_path(dst)
+    try:
+        clone_file(src, staged)
+        os.replace(staged, dst)
+    finally:
+        if os.path.lexists(staged):
+            os.remove(staged)
+
+
+class ResultCache:
+    def __init__(self, cache_dir, limit_mb):
+        self.cache_dir = cache_dir
+        self.limit = limit_mb * 1024 * 1024
+        self.objects_dir = os.path.join(cache_dir, 'objects')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        # Worker processes share the database, so wait on locks instead of failing.
+        self.db = sqlite3.connect(os.path.join(cache_dir, 'cache.sqlite'), timeout=60)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def object_path(self, key):
+        return os.path.join(self.objects_dir, key[:2], key.replace(':', '_'))
+
+    def is_unchanged(self, input_path, st, fingerprint, output_path):
+        """True if ``input_path`` was already cleaned to ``output_path`` with these options."""
+        row = self.db.execute(
+            "SELECT size, mtime_ns, options, output_path, output_size, output_mtime_ns FROM files WHERE path = ?",
+            (input_path,)).fetchone()
+        if not row or row[:4] != (st.st_size, st.st_mtime_ns, fingerprint, output_path):
+            return False
+        try:
+            out = os.stat(output_path)
+        except OSError:
+            return False
+        return (out.st_size, out.st_mtime_ns) == row[4:]
+
+    def digest_for(self, input_path, st):
+        """Return the content digest, reusing the stored one when size and mtime still match."""
+        row = self.db.execute("SELECT size, mtime_ns, digest FROM files WHERE path = ?", (input_path,)).fetchone()
+        if row and row[:2] == (st.st_size, st.st_mtime_ns):
+            return row[2]
+        return file_digest(input_path)
+
+    def fetch(self, key, output_path):
+        """Place the cached result for ``key`` at ``output_path`` and return its status; None on a miss."""
+        path = self.object_path(key)
+        with self.db:
+            self.db.execute("UPDATE objects SET last_used = ? WHERE key = ?", (time.time(), key))
+            row = self.db.execute("SELECT status FROM objects WHERE key = ?", (key,)).fetchone()
+        if not row or not os.path.exists(path):
+            return None
+        clone_into_place(path, output_path)
+        return row[0]
+
+    def store(self, key, output_path, status):
+        """Keep a copy of ``output_path``, the result of a run that ended with ``status``."""
+        path = self.object_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        clone_into_place(output_path, path)
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO objects (key, size, last_used, status) VALUES (?, ?, ?, ?)",
+                            (key, os.path.getsize(path), time.time(), status))
+        self.evict()
+
+    def record(self, input_path, st, digest, fingerprint, output_path):
+        out = os.stat(output_path)
+        with self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (input_path, st.st_size, st.st_mtime_ns, digest, fingerprint,
+                 output_path, out.st_size, out.st_mtime_ns))
+
+    def evict(self):
+        """Drop least-recently-used objects until the cache is back under 90% of its limit."""
+        (total,) = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()
+        if total <= self.limit:
+            return
+        target = self.limit * 0.9
+        victims = []
+        for key, size in self.db.execute("SELECT key, size FROM objects ORDER BY last_used"):
+            if total <= target:
+                break
+            victims.append(key)
+            total -= size
+        with self.db:
+            self.db.executemany("DELETE FROM objects WHERE key = ?", [(k,) for k in victims])
+        for key in victims:
+            try:
+                os.remove(self.object_path(key))
+            except OSError:
+                pass
+
+
+_local = threading.local()
+
+
+def get_cache(cache_dir, limit_mb):
+    """Return this thread's :class:`ResultCache` for ``cache_dir``.
+
+    SQLite connections cannot be shared between threads, and the GUI runs
+    each batch on a new thread, so every thread opens its own connection.
+    """
+    caches = _local.__dict__.setdefault('caches', {})
+    cache = caches.get(cache_dir)
+    if cache is None:
+        cache = caches[cache_dir] = ResultCache(cache_dir, limit_mb)
+    return cache
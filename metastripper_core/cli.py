@@ -0,0 +1,342 @@
+"""Command-line entry point: ``python -m metastripper_core`` or ``python metastripper.py <command>``."""
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+from dataclasses import asdict
+
+from .cache import default_cache_dir
+from .engine import CleanOptions, clean_paths, default_workers
+from .handlers import HANDLERS
+from .metrics import EventLog, MetricsExporter, ProfileKeeper
+from .walker import SYMLINK_POLICIES, iter_files
+
+DEFAULT_INDEX = 'metastripper_audit.sqlite'
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='metastripper', description="Remove metadata from files.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    clean = commands.add_parser('clean', help="Clean files or folders")
+    clean.add_argument('paths', nargs='+', help="Files or folders to clean")
+    clean.add_argument('-r', '--recursive', action='store_true', help="Process folders recursively")
+    clean.add_argument('--include', action='append', default=[], metavar='GLOB',
+                       help="Only clean files matching GLOB when walking folders (repeatable)")
+    clean.add_argument('--exclude', action='append', default=[], metavar='GLOB',
+                       help="Skip files and folders matching GLOB (repeatable)")
+    clean.add_argument('--symlinks', choices=SYMLINK_POLICIES, default='files',
+                       help="Symlink handling while walking folders (default: %(default)s)")
+    clean.add_argument('--supported-only', action='store_true',
+                       help="When walking folders, skip files without a dedicated cleaner")
+    clean.add_argument('-o', '--output', default='', help="Output folder (default: next to each input)")
+    clean.add_argument('--keep-copyright', action='store_true', help="Keep copyright info")
+    clean.add_argument('--keep-date', action='store_true', help="Keep creation date")
+    clean.add_argument('--strip-review-data', action='store_true',
+                       help="Also remove Office comment authors and revision IDs")
+    clean.add_argument('--backup', action='store_true', help="Create backup before cleaning")
+    clean.add_argument('--max-size', type=int, default=0, metavar='MB', help="Skip files larger than MB")
+    clean.add_argument('--cache', nargs='?', const=default_cache_dir(), default='', metavar='DIR',
+                       help="Skip files unchanged since the last run (default DIR: %(const)s)")
+    clean.add_argument('--cache-limit', type=int, default=1024, metavar='MB',
+                       help="Maximum size of cached results (default: %(default)s)")
+    clean.add_argument('-j', '--workers', type=int, default=default_workers(),
+                       help="Worker processes (default: CPU count)")
+    clean.add_argument('--preload', default='', metavar='EXTS',
+                       help="Import the cleaners for EXTS (comma-separated, or 'all') in every worker "
+                            "before cleaning; by default they are imported on first use")
+    clean.add_argument('--skip-clean', default='', metavar='INDEX',
+                       help="Skip files that the audit index INDEX found free of metadata")
+    clean.add_argument('--job', nargs='?', const='', default=None, metavar='ID',
+                       help="Journal progress as job ID so an interrupted run resumes when restarted with "
+                            "the same ID (default ID: derived from the paths and options)")
+    clean.add_argument('--journal-dir', default=os.path.join(default_cache_dir(), 'jobs'), metavar='DIR',
+                       help="Where job journals are kept (default: %(default)s)")
+    clean.add_argument('--json', action='store_true', help="Print one JSON result per line")
+    clean.add_argument('--events', default='', metavar='FILE',
+                       help="Append per-file stage timings to FILE as JSON lines")
+    clean.add_argument('--metrics', default='', metavar='FILE',
+                       help="Export aggregate metrics to FILE in Prometheus text format")
+    clean.add_argument('--profile', default='', metavar='DIR',
+                       help="Keep cProfile dumps of the slowest files in DIR")
+    clean.add_argument('--profile-top', type=int, default=10, metavar='N',
+                       help="Number of slowest files to keep profiles for (default: %(default)s)")
+    clean.add_argument('--profile-memory', action='store_true',
+                       help="Also record tracemalloc statistics for profiled files")
+    clean.set_defaults(func=cmd_clean)
+
+    audit = commands.add_parser('audit', help="List the metadata in files without changing them")
+    audit.add_argument('paths', nargs='+', help="Files or folders to scan")
+    audit.add_argument('-r', '--recursive', action='store_true', help="Process folders recursively")
+    audit.add_argument('--include', action='append', default=[], metavar='GLOB',
+                       help="Only scan files matching GLOB when walking folders (repeatable)")
+    audit.add_argument('--exclude', action='append', default=[], metavar='GLOB',
+                       help="Skip files and folders matching GLOB (repeatable)")
+    audit.add_argument('--symlinks', choices=SYMLINK_POLICIES, default='files',
+                       help="Symlink handling while walking folders (default: %(default)s)")
+    audit.add_argument('--index', default=DEFAULT_INDEX, metavar='FILE',
+                       help="SQLite index to store results in (default: %(default)s)")
+    audit.add_argument('--rescan', action='store_true',
+                       help="Scan files again even if they are unchanged since they were last indexed")
+    audit.add_argument('-j', '--workers', type=int, default=default_workers(),
+                       help="Worker processes (default: CPU count)")
+    audit.add_argument('--json', action='store_true', help="Print one JSON result per line")
+    audit.set_defaults(func=cmd_audit)
+
+    report = commands.add_parser('report', help="Query an audit index")
+    report.add_argument('--index', default=DEFAULT_INDEX, metavar='FILE',
+                        help="SQLite index written by 'audit' (default: %(default)s)")
+    query = report.add_mutually_exclusive_group()
+    query.add_argument('--field', help="List the files that carry FIELD (author, gps, date, device, "
+                                       "software, title, comment, copyright, organization, xmp, other)")
+    query.add_argument('--values', metavar='FIELD',
+                       help="List the distinct values of FIELD with the number of files carrying each")
+    report.add_argument('--value', help="With --field, only list files where FIELD equals VALUE")
+    report.add_argument('--json', action='store_true', help="Print the report as JSON")
+    report.set_defaults(func=cmd_report)
+
+    bench = commands.add_parser('benchmark', help="Time every handler on a synthetic corpus")
+    bench.add_argument('--corpus', default='', metavar='DIR',
+                       help="Write the corpus to DIR and keep it (default: a temporary folder)")
+    bench.add_argument('--formats', default='', metavar='EXTS',
+                       help="Comma-separated extensions to generate (default: all)")
+    bench.add_argument('--count', type=int, default=5, help="Files per format (default: %(default)s)")
+    bench.add_argument('--size', type=int, default=256, metavar='KB',
+                       help="Approximate size of each file (default: %(default)s)")
+    bench.add_argument('--seed', type=int, default=0, help="Corpus seed (default: %(default)s)")
+    bench.add_argument('-j', '--workers', type=int, default=default_workers(),
+                       help="Worker processes (default: CPU count)")
+    bench.add_argument('-o', '--output', default='', metavar='FILE',
+                       help="Write the JSON report to FILE instead of stdout")
+    bench.add_argument('--import-budget', type=float, default=0, metavar='MS',
+                       help="Fail if importing the command line takes longer than MS milliseconds")
+    bench.add_argument('--startup-only', action='store_true',
+                       help="Only measure import time, skip the corpus run")
+    bench.set_defaults(func=cmd_benchmark)
+    return parser
+
+
+def options_from_args(args):
+    return CleanOptions(
+        keep_copyright=args.keep_copyright,
+        keep_date=args.keep_date,
+        strip_review_data=args.strip_review_data,
+        backup=args.backup,
+        size_limit=args.max_size,
+        output_dir=args.output,
+        cache_dir=args.cache,
+        cache_limit=args.cache_limit,
+        profile_dir=args.profile,
+        profile_memory=args.profile_memory,
+    )
+
+
+def parse_extensions(value):
+    """``'jpg,.PNG'`` -> ``['.jpg', '.png']``; ``'all'`` -> every registered extension."""
+    if value.strip().lower() == 'all':
+        return list(HANDLERS)
+    return ['.' + ext.strip().lstrip('.').lower() for ext in value.split(',') if ext.strip()]
+
+
+def print_message(message, level='info'):
+    print(f"{level.upper()}: {message}", file=sys.stderr)
+
+
+def cmd_clean(args):
+    options = options_from_args(args)
+    journal = None
+    if args.job is not None:
+        from .journal import JobJournal, job_id_for
+        job_id = args.job or job_id_for(args.paths, args.recursive, options)
+        try:
+            journal = JobJournal(args.journal_dir, job_id, options)
+        except (ValueError, OSError) as e:
+            print(f"error: {e}", file=sys.stderr)
+            return 2
+        print_message(f"{'Resuming' if journal.resumed else 'Starting'} job {job_id} ({journal.path})")
+
+    files = iter_files(
+        args.paths, recursive=args.recursive, include=args.include, exclude=args.exclude,
+        symlinks=args.symlinks, size_limit=args.max_size,
+        extensions=set(HANDLERS) if args.supported_only else None,
+        skip_dirs=[args.output], log=print_message)
+    index = None
+    already_clean = 0
+    if args.skip_clean:
+        from .audit import AuditIndex
+        index = AuditIndex(args.skip_clean)
+
+        def not_clean(entries):
+            nonlocal already_clean
+            for filepath, st in entries:
+                if st is not None and index.is_clean(filepath, st):
+                    already_clean += 1
+                    continue
+                yield filepath, st
+        files = not_clean(files)
+
+    sinks = []
+    if args.events:
+        sinks.append(EventLog(args.events))
+    if args.metrics:
+        sinks.append(MetricsExporter(args.metrics))
+    profiles = ProfileKeeper(args.profile_top) if args.profile else None
+    if profiles:
+        sinks.append(profiles)
+
+    processed = failed = 0
+    try:
+        for result in clean_paths(files, options, workers=args.workers,
+                                  preload=parse_extensions(args.preload), journal=journal):
+            processed += 1
+            for sink in sinks:
+                sink.observe(result)
+            if result.status == 'failed':
+                failed += 1
+            if args.json:
+                print(json.dumps(asdict(result)), flush=True)
+                continue
+            for level, message in result.messages:
+                print_message(message, level)
+            if result.status in ('cleaned', 'copied'):
+                print(f"{result.status:<7} {result.input_path} -> {result.output_path} ({result.elapsed:.2f}s)")
+            elif result.status == 'failed':
+                print(f"failed  {result.input_path}: {result.error}", file=sys.stderr)
+    finally:
+        for sink in sinks:
+            sink.close()
+        if index:
+            index.close()
+        if journal:
+            journal.close()
+            counts = journal.counts()
+            summary = f"Job {journal.job_id}: {counts['done']} done, {counts['failed']} failed"
+            if counts['failed'] or counts['in-progress']:
+                summary += f", {counts['in-progress']} interrupted; run again with --job {journal.job_id} to resume"
+            print_message(summary)
+    if already_clean:
+        print_message(f"Skipped {already_clean} files already clean according to {args.skip_clean}")
+        processed += already_clean
+    if profiles:
+        for elapsed, path, dumps in profiles.slowest():
+            print_message(f"profile {elapsed:.2f}s {path}: {', '.join(dumps.values())}")
+    if not processed:
+        print("No files to process", file=sys.stderr)
+        return 1
+    return 1 if failed else 0
+
+
+def cmd_audit(args):
+    from .audit import AuditIndex, scan_paths
+
+    index = AuditIndex(args.index)
+    unchanged = 0
+
+    def changed(entries):
+        nonlocal unchanged
+        for filepath, st in entries:
+            if st is not None and not args.rescan and index.is_current(filepath, st):
+                unchanged += 1
+                continue
+            yield filepath, st
+
+    files = iter_files(args.paths, recursive=args.recursive, include=args.include, exclude=args.exclude,
+                       symlinks=args.symlinks, skip_dirs=[], log=print_message)
+    counts = {'clean': 0, 'metadata': 0, 'error': 0}
+    try:
+        for result in scan_paths(changed(files), workers=args.workers):
+            index.add(result)
+            counts[result.status] += 1
+            if args.json:
+                print(json.dumps(dict(asdict(result), status=result.status)), flush=True)
+            elif result.status == 'error':
+                print(f"error    {result.path}: {result.error}", file=sys.stderr)
+            elif result.status == 'metadata':
+                fields = sorted({category for category, _, _ in result.fields})
+                print(f"metadata {result.path}: {', '.join(fields)}")
+    finally:
+        index.close()
+    print_message(f"Scanned {sum(counts.values())} files: {counts['metadata']} with metadata, "
+                  f"{counts['clean']} clean, {counts['error']} errors; "
+                  f"{unchanged} unchanged since the last scan")
+    if not sum(counts.values()) and not unchanged:
+        print("No files to process", file=sys.stderr)
+        return 1
+    return 1 if counts['error'] else 0
+
+
+def cmd_report(args):
+    from .audit import FIELDS, AuditIndex
+
+    for category in (args.field, args.values):
+        if category and category not in FIELDS:
+            print(f"error: unknown field {category!r}, expected one of {', '.join(FIELDS)}", file=sys.stderr)
+            return 2
+    if not os.path.exists(args.index):
+        print(f"error: no audit index at {args.index}", file=sys.stderr)
+        return 2
+    index = AuditIndex(args.index)
+    try:
+        if args.field:
+            report = index.files_with(args.field, args.value)
+            lines = report
+        elif args.values:
+            report = index.values(args.values)
+            lines = [f"{count:>8}  {value}" for value, count in report]
+        else:
+            report = index.summary()
+            lines = [f"{status:<12} {count:>8} files" for status, count in sorted(report['files'].items())]
+            lines += [f"{category:<12} {count:>8} files" for category, count in report['fields'].items()]
+    finally:
+        index.close()
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for line in lines:
+            print(line)
+    return 0
+
+
+def cmd_benchmark(args):
+    from .bench import generate_corpus, import_time, run_benchmark
+    report = {}
+    if not args.startup_only:
+        extensions = parse_extensions(args.formats) if args.formats else None
+        corpus = args.corpus or tempfile.mkdtemp(prefix='metastripper_corpus_')
+        try:
+            paths = generate_corpus(corpus, args.count, args.size, args.seed, extensions)
+            report = run_benchmark(paths, workers=args.workers)
+        except ValueError as e:
+            print(f"error: {e}", file=sys.stderr)
+            return 2
+        finally:
+            if not args.corpus:
+                shutil.rmtree(corpus, ignore_errors=True)
+        report.update(seed=args.seed, count=args.count, size_kb=args.size)
+    startup = report['startup'] = import_time()
+    over_budget = 0 < args.import_budget < startup['total_ms']
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        for name, stats in report.get('handlers', {}).items():
+            print(f"{name:<14} {stats['files_per_s']:>9.1f} files/s {stats['mb_per_s']:>8.1f} MB/s "
+                  f"p50 {stats['p50_ms']:.1f} ms  p99 {stats['p99_ms']:.1f} ms")
+        if 'total' in report:
+            total = report['total']
+            print(f"{'total':<14} {total['files_per_s']:>9.1f} files/s {total['mb_per_s']:>8.1f} MB/s "
+                  f"({total['files']} files, {total['failed']} failed)")
+        print(f"{'import':<14} {startup['total_ms']:>9.1f} ms")
+    else:
+        print(json.dumps(report, indent=2))
+    if over_budget:
+        print(f"error: importing {startup['module']} took {startup['total_ms']:.0f} ms, "
+              f"over the {args.import_budget:.0f} ms budget", file=sys.stderr)
+        return 1
+    return 1 if report.get('total', {}).get('failed') else 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
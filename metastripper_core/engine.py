@@ -0,0 +1,287 @@
+"""GUI-free batch engine: option handling, per-file pipeline and the process pool."""
+import os
+import time
+import multiprocessing
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from .cache import file_digest, get_cache, options_fingerprint
+from .fileio import clone_file, staging_path
+from .handlers import OUTPUT_EXTENSIONS, get_handler, warm_up
+from .metrics import StageRecorder, profiled
+from .video import FFMPEG_SLOTS, share_ffmpeg_slots
+
+
+@dataclass(frozen=True)
+class CleanOptions:
+    remove_all: bool = True
+    keep_copyright: bool = False
+    keep_date: bool = False
+    strip_review_data: bool = False  # OOXML/ODF comment authors and OOXML revision IDs
+    backup: bool = False
+    size_limit: int = 0  # MB, 0 disables the limit
+    output_dir: str = ''  # empty means next to the input file
+    cache_dir: str = ''  # result cache location, empty disables caching
+    cache_limit: int = 1024  # MB
+    profile_dir: str = ''  # write a cProfile dump per file here, empty disables profiling
+    profile_memory: bool = False  # also record tracemalloc statistics when profiling
+
+
+@dataclass
+class CleanResult:
+    input_path: str
+    output_path: str = ''
+    status: str = 'cleaned'  # 'cleaned', 'copied' (nothing removed), 'skipped' or 'failed'
+    error: str = ''
+    elapsed: float = 0.0
+    messages: list = field(default_factory=list)  # (level, message) pairs
+    handler: str = ''
+    stages: dict = field(default_factory=dict)  # stage name -> seconds, see metrics.STAGES
+    bytes_read: int = 0
+    bytes_written: int = 0
+    profile: dict = field(default_factory=dict)  # 'cpu'/'memory' -> dump path when profiling
+    checksum: str = ''  # digest of the output, only computed for journaled jobs
+    from_journal: bool = False  # reported from the job journal instead of being cleaned
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def get_output_path(original_path, output_dir=''):
+    output_dir = output_dir or os.path.dirname(original_path)
+    filename = os.path.basename(original_path)
+    name, ext = os.path.splitext(filename)
+    ext = OUTPUT_EXTENSIONS.get(ext.lower(), ext)
+    new_filename = f"{name}_cleaned{ext}"
+    return os.path.join(output_dir, new_filename)
+
+
+def clean_file(filepath, options, st=None):
+    """Clean a single file and return a :class:`CleanResult`. Never raises.
+
+    ``st`` is the file's ``stat_result`` when the caller already has it (see
+    :func:`metastripper_core.walker.iter_files`).
+    """
+    result = CleanResult(filepath)
+    recorder = StageRecorder()
+    start = time.perf_counter()
+
+    def log(message, level='info'):
+        result.messages.append((level, message))
+
+    def run_handler(handler):
+        # Handlers write to a sibling of the output that is renamed into place,
+        # so an interrupted run never leaves a half-written output behind.
+        result.bytes_read += st.st_size
+        staged = staging_path(output_path)
+        try:
+            if not options.profile_dir:
+                recorder.run_handler(handler, filepath, staged, options, log)
+            else:
+                with profiled(options.profile_dir, filepath, options.profile_memory) as paths:
+                    try:
+                        recorder.run_handler(handler, filepath, staged, options, log)
+                    finally:
+                        result.profile = paths
+            with recorder.time('move'):
+                os.replace(staged, output_path)
+        finally:
+            if os.path.lexists(staged):
+                os.remove(staged)
+
+    try:
+        with recorder.active():
+            try:
+                with recorder.time('stat'):
+                    st = st or os.stat(filepath)
+            except FileNotFoundError:
+                result.status = 'skipped'
+                log(f"File not found: {filepath}", level='warning')
+                return result
+
+            if options.size_limit > 0:
+                size_mb = st.st_size / (1024 * 1024)
+                if size_mb > options.size_limit:
+                    result.status = 'skipped'
+                    log(f"Skipping {filepath}: Size {size_mb:.2f} MB exceeds limit", level='warning')
+                    return result
+
+            output_path = get_output_path(filepath, options.output_dir)
+            result.output_path = output_path
+            os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+
+            cache = digest = None
+            if options.cache_dir:
+                with recorder.time('cache'):
+                    cache = get_cache(options.cache_dir, options.cache_limit)
+                    source = os.path.abspath(filepath)
+                    fingerprint = options_fingerprint(options)
+                    if cache.is_unchanged(source, st, fingerprint, os.path.abspath(output_path)):
+                        result.status = 'skipped'
+                        log(f"Unchanged since last run: {filepath}")
+                        return result
+                    digest = cache.digest_for(source, st)
+                    key = f"{digest}:{fingerprint}"
+
+            if options.backup:
+                backup_path = f"{filepath}.bak"
+                with recorder.time('backup'):
+                    clone_file(filepath, backup_path)
+                result.bytes_written += st.st_size
+                log(f"Created backup: {backup_path}")
+
+            with recorder.time('dispatch'):
+                handler = get_handler(filepath)
+            result.handler = handler.__name__
+
+            if cache is None:
+                run_handler(handler)
+            else:
+                with recorder.time('cache'):
+                    cached_status = cache.fetch(key, output_path)
+                if cached_status:
+                    recorder.copied = cached_status == 'copied'
+                    log(f"Reused cached result for {filepath}")
+                else:
+                    run_handler(handler)
+                    with recorder.time('cache'):
+                        cache.store(key, output_path, 'copied' if recorder.copied else 'cleaned')
+                with recorder.time('cache'):
+                    cache.record(source, st, digest, fingerprint, os.path.abspath(output_path))
+            result.bytes_written += os.path.getsize(output_path)
+            if recorder.copied:
+                result.status = 'copied'
+    except Exception as e:
+        result.status = 'failed'
+        result.error = str(e)
+    finally:
+        result.stages = recorder.stages
+        result.elapsed = time.perf_counter() - start
+    return result
+
+
+def clean_and_checksum(filepath, options, st=None):
+    """:func:`clean_file`, plus the output's digest for the job journal, computed while it is still cached.
+
+    A resumed job compares the digest before it skips the file, so a damaged
+    output is cleaned again.
+    """
+    result = clean_file(filepath, options, st)
+    if result.status in ('cleaned', 'copied'):
+        try:
+            result.checksum = file_digest(result.output_path)
+        except OSError as e:
+            result.status = 'failed'
+            result.error = f"Checksum failed: {e}"
+    return result
+
+
+def _as_entry(item):
+    return item if isinstance(item, tuple) else (item, None)
+
+
+def _init_worker(ffmpeg_slots, initializer, initargs):
+    share_ffmpeg_slots(ffmpeg_slots)
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def run_parallel(func, files, args=(), workers=None, cancel=None, initializer=None, initargs=()):
+    """Call ``func(path, *args, st)`` for every entry of ``files`` and yield the results as they complete.
+
+    ``files`` may be any iterable of paths or ``(path, stat_result)`` pairs; it
+    is consumed lazily. It may also hold ready-made :class:`CleanResult`
+    objects, which are yielded as soon as they are reached. ``workers``
+    defaults to the CPU count; ``1`` runs everything in the calling process.
+    At most ``2 * workers`` calls are in flight at once. Once ``cancel``
+    (anything with ``is_set()``) is set, no new calls are started; running
+    ones are finished and reported. ``func`` must be a module-level function
+    that never raises. Worker processes share one ffmpeg semaphore, so
+    ``FFMPEG_SLOTS`` caps remuxes across the whole pool.
+    """
+    workers = workers or default_workers()
+    files = iter(files)
+    cancelled = cancel.is_set if cancel is not None else (lambda: False)
+    if workers <= 1:
+        for item in files:
+            if cancelled():
+                return
+            if isinstance(item, CleanResult):
+                yield item
+                continue
+            filepath, st = _as_entry(item)
+            yield func(filepath, *args, st)
+        return
+
+    slots = multiprocessing.BoundedSemaphore(FFMPEG_SLOTS)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(slots, initializer, initargs)) as pool:
+        pending = set()
+
+        def fill():
+            """Submit entries until ``2 * workers`` are in flight, yielding ready-made results on the way."""
+            while len(pending) < workers * 2 and not cancelled():
+                item = next(files, None)
+                if item is None:
+                    return
+                if isinstance(item, CleanResult):
+                    yield item
+                    continue
+                filepath, st = _as_entry(item)
+                pending.add(pool.submit(func, filepath, *args, st))
+
+        yield from fill()
+        while pending:
+            done, _ = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+            pending.difference_update(done)
+            if cancelled():
+                for future in pending:
+                    future.cancel()
+            yield from fill()
+            for future in done:
+                if not future.cancelled():
+                    yield future.result()
+
+
+def clean_paths(files, options, workers=None, cancel=None, preload=None, journal=None):
+    """Clean ``files`` and yield a :class:`CleanResult` for each as it completes.
+
+    ``files`` may be any iterable of paths or ``(path, stat_result)`` pairs; it
+    is consumed lazily, so a generator such as :func:`iter_files` lets cleaning
+    start while the walk is still running. ``workers`` defaults to the CPU
+    count; ``1`` runs everything in the calling process. At most
+    ``2 * workers`` files are in flight at once. Once ``cancel`` (anything with
+    ``is_set()``, e.g. a ``threading.Event``) is set, no new files are started;
+    files already being cleaned are finished and reported.
+
+    Handler backends are imported on first use. ``preload`` is a list of
+    extensions whose backends are imported up front instead, in this process
+    (inherited by forked workers) and in each worker as it starts.
+
+    With a :class:`~metastripper_core.journal.JobJournal`, every file's
+    progress is journaled and files the job already finished are reported as
+    'skipped' without being cleaned again.
+    """
+    if preload:
+        warm_up(preload)
+    pool_args = dict(initializer=warm_up if preload else None, initargs=(preload,))
+    if journal is None:
+        return run_parallel(clean_file, files, (options,), workers, cancel, **pool_args)
+    return _clean_journaled(files, options, workers, cancel, journal, pool_args)
+
+
+def _clean_journaled(files, options, workers, cancel, journal, pool_args):
+    def entries():
+        for filepath, st in map(_as_entry, files):
+            if journal.is_done(filepath, st):
+                yield CleanResult(filepath, status='skipped', from_journal=True, messages=[
+                    ('info', f"Already done in job {journal.job_id}: {filepath}")])
+                continue
+            journal.started(filepath, get_output_path(filepath, options.output_dir))
+            yield filepath, st
+
+    for result in run_parallel(clean_and_checksum, entries(), (options,), workers, cancel, **pool_args):
+        if not result.from_journal:
+            journal.finished(result)
+        yield result
@@ -0,0 +1,104 @@
+"""Filtering of Exif (TIFF-structured) metadata blocks, shared by the image cleaners.
+
+Only ASCII copyright and date tags can survive; everything else, including
+maker notes, GPS and thumbnails, is dropped.
+"""
+import struct
+
+EXIF_HEADER = b'Exif\x00\x00'
+
+# EXIF tags that survive when the matching option is set (ASCII values only).
+TAG_COPYRIGHT = 0x8298
+TAG_DATETIME = 0x0132
+TAG_EXIF_IFD = 0x8769
+TAG_DATETIME_ORIGINAL = 0x9003
+TAG_DATETIME_DIGITIZED = 0x9004
+TYPE_ASCII = 2
+TYPE_LONG = 4
+
+
+def _read_ifd(tiff, endian, offset):
+    """Return ``{tag: (type, count, raw_value)}`` for ASCII entries of the IFD at ``offset``,
+    plus the Exif sub-IFD offset if present."""
+    if offset + 2 > len(tiff):
+        raise ValueError("IFD offset out of range")
+    (count,) = struct.unpack_from(endian + 'H', tiff, offset)
+    entries, exif_offset = {}, None
+    for i in range(count):
+        pos = offset + 2 + i * 12
+        if pos + 12 > len(tiff):
+            raise ValueError("truncated IFD")
+        tag, typ, n = struct.unpack_from(endian + 'HHI', tiff, pos)
+        if tag == TAG_EXIF_IFD and typ == TYPE_LONG:
+            (exif_offset,) = struct.unpack_from(endian + 'I', tiff, pos + 8)
+        elif typ == TYPE_ASCII:
+            if n <= 4:
+                raw = tiff[pos + 8:pos + 8 + n]
+            else:
+                (value_offset,) = struct.unpack_from(endian + 'I', tiff, pos + 8)
+                raw = tiff[value_offset:value_offset + n]
+            if len(raw) == n:
+                entries[tag] = (typ, n, raw)
+    return entries, exif_offset
+
+
+def filter_exif(tiff, keep_copyright=False, keep_date=False):
+    """Rebuild a TIFF/EXIF blob keeping only copyright and/or date tags.
+
+    Returns ``None`` when nothing is kept, so the caller can drop the block.
+    """
+    ifd0_tags, exif_tags = set(), set()
+    if keep_copyright:
+        ifd0_tags.add(TAG_COPYRIGHT)
+    if keep_date:
+        ifd0_tags.add(TAG_DATETIME)
+        exif_tags.update((TAG_DATETIME_ORIGINAL, TAG_DATETIME_DIGITIZED))
+    if not ifd0_tags or len(tiff) < 8:
+        return None
+
+    if tiff[:2] == b'II':
+        endian = '<'
+    elif tiff[:2] == b'MM':
+        endian = '>'
+    else:
+        raise ValueError("bad TIFF byte order")
+    (ifd0_offset,) = struct.unpack_from(endian + 'I', tiff, 4)
+    ifd0, exif_offset = _read_ifd(tiff, endian, ifd0_offset)
+    exif = _read_ifd(tiff, endian, exif_offset)[0] if exif_offset else {}
+    ifd0 = {tag: v for tag, v in ifd0.items() if tag in ifd0_tags}
+    exif = {tag: v for tag, v in exif.items() if tag in exif_tags}
+    if not ifd0 and not exif:
+        return None
+    return build_exif(ifd0, exif)
+
+
+def build_exif(ifd0, exif):
+    """Serialize little-endian TIFF data with ``ifd0`` and an optional Exif sub-IFD."""
+    n0 = len(ifd0) + (1 if exif else 0)
+    exif_ifd_offset = 8 + 2 + 12 * n0 + 4
+    data_offset = exif_ifd_offset + (2 + 12 * len(exif) + 4 if exif else 0)
+    data = bytearray()
+
+    def entries(tags, extra=()):
+        out = bytearray()
+        items = sorted(list(tags.items()) + list(extra))
+        out += struct.pack('<H', len(items))
+        for tag, (typ, n, raw) in items:
+            if typ == TYPE_LONG:
+                value = raw
+            elif n <= 4:
+                value = raw.ljust(4, b'\x00')
+            else:
+                value = struct.pack('<I', data_offset + len(data))
+                data.extend(raw)
+                if len(data) % 2:
+                    data.append(0)
+            out += struct.pack('<HHI', tag, typ, n) + value
+        out += b'\x00\x00\x00\x00'
+        return out
+
+    pointer = [(TAG_EXIF_IFD, (TYPE_LONG, 1, struct.pack('<I', exif_ifd_offset)))] if exif else []
+    body = entries(ifd0, pointer)
+    if exif:
+        body += entries(exif)
+    return b'II*\x00' + struct.pack('<I', 8) + bytes(body) + bytes(data)
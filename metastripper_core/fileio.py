@@ -0,0 +1,98 @@
+"""Low-level output helpers: cheap file copies and staged, atomic output paths.
+
+Copies go through the cheapest mechanism the platform offers: a reflink
+(``FICLONE``, which shares extents on btrfs, XFS and other copy-on-write
+filesystems), then ``copy_file_range``/``sendfile`` in the kernel, then plain
+reads and writes. Hardlinks are never used, since a hardlinked backup,
+output or cache object would alias another file.
+"""
+import os
+import sys
+import shutil
+import secrets
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+COPY_BUFSIZE = 1024 * 1024
+FICLONE = 0x40049409  # _IOW(0x94, 9, int) from linux/fs.h
+STAGING_PREFIX = 'metastripper_'
+
+
+def _kernel_copy(in_fd, out_fd, offset, length):
+    """Copy in the kernel with ``copy_file_range`` or ``sendfile``; return the bytes copied."""
+    copied = 0
+    for name in ('copy_file_range', 'sendfile'):
+        call = getattr(os, name, None)
+        if call is None:
+            continue
+        try:
+            while copied < length:
+                if name == 'copy_file_range':
+                    n = call(in_fd, out_fd, length - copied, offset + copied)
+                else:
+                    n = call(out_fd, in_fd, offset + copied, length - copied)
+                if not n:
+                    break
+                copied += n
+        except OSError:
+            continue  # unsupported here (EXDEV, EINVAL, ENOTSOCK...); try the next method
+        break
+    return copied
+
+
+def copy_range(src, dst, offset, length):
+    """Append ``length`` bytes starting at ``offset`` of file object ``src`` to file object ``dst``.
+
+    The data is copied with ``copy_file_range``/``sendfile`` where the
+    platform allows, so it never passes through Python; the rest is copied
+    with plain reads and writes. Raises ``ValueError`` if ``src`` is too short.
+    """
+    dst.flush()
+    copied = _kernel_copy(src.fileno(), dst.fileno(), offset, length)
+    dst.seek(0, os.SEEK_END)  # resync the buffered writer with the advanced descriptor
+    src.seek(offset + copied)
+    remaining = length - copied
+    while remaining > 0:
+        chunk = src.read(min(remaining, COPY_BUFSIZE))
+        if not chunk:
+            raise ValueError("unexpected end of file")
+        dst.write(chunk)
+        remaining -= len(chunk)
+
+
+def _reflink(src, dst):
+    """Share ``src``'s extents with ``dst`` (both open file objects); False if unsupported."""
+    if fcntl is None or not sys.platform.startswith('linux'):
+        return False
+    try:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return True
+    except OSError:
+        return False
+
+
+def clone_file(src, dst):
+    """Copy ``src`` to ``dst`` with its permissions and timestamps, like ``shutil.copy2``.
+
+    A reflink is tried first, so on copy-on-write filesystems the copy takes
+    no extra space and no data is read; otherwise the data is copied with
+    :func:`copy_range`.
+    """
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        if not _reflink(fsrc, fdst):
+            copy_range(fsrc, fdst, 0, os.fstat(fsrc.fileno()).st_size)
+    shutil.copystat(src, dst)
+
+
+def staging_path(path):
+    """Return an unused path in ``path``'s directory to write to before renaming it over ``path``.
+
+    The name keeps ``path``'s extension, since some writers pick the format
+    from it. Staging next to the destination keeps the final
+    :func:`os.replace` atomic and keeps large outputs out of the temp dir.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, f"{STAGING_PREFIX}{secrets.token_hex(6)}_{name}")
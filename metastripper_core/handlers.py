@@ -0,0 +1,215 @@
+"""Per-format metadata cleaners and the extension registry.
+
+Every handler has the signature ``handler(input_path, output_path, options, log)``
+where ``options`` is a :class:`metastripper_core.engine.CleanOptions` and ``log``
+is a ``log(message, level='info')`` callable. Handlers never touch the UI, so they
+can run inside worker processes.
+
+Cleaners that need a heavy library (Pillow, PyPDF2, mutagen, ffmpeg, py7zr)
+live next to their backend and are registered as
+:class:`LazyHandler` entries: the backend is only imported the first time a
+file of that type is dispatched, so a batch of JPEGs never loads PyPDF2.
+"""
+import os
+import zipfile
+import tempfile
+
+from .fileio import clone_file
+from .metrics import mark_copied
+from .ooxml import strip_package
+
+TEMP_PREFIX = 'metastripper_'
+
+
+def temp_path_for(filename, directory=None):
+    """Return a unique temp file path; safe when several workers share a basename.
+
+    ``directory`` defaults to the system temp dir; callers pass the output's
+    directory so large intermediates stay on the destination filesystem.
+    """
+    fd, path = tempfile.mkstemp(prefix=TEMP_PREFIX, suffix=f'_{filename}', dir=directory)
+    os.close(fd)
+    return path
+
+
+def copy_unchanged(input_path, output_path):
+    """Copy a file the handler cannot clean; the result is reported as 'copied'."""
+    clone_file(input_path, output_path)
+    mark_copied()
+
+
+def is_valid_zip(filepath):
+    try:
+        with zipfile.ZipFile(filepath, 'r') as zf:
+            zf.testzip()
+        return True
+    except zipfile.BadZipFile:
+        return False
+
+
+def clean_ooxml(input_path, output_path, options, log):
+    try:
+        strip_package(input_path, output_path, options.keep_copyright, options.keep_date,
+                      options.strip_review_data)
+    except zipfile.BadZipFile as e:
+        raise Exception(f"not a valid OOXML package ({e})")
+
+
+def clean_docx(input_path, output_path, options, log):
+    try:
+        clean_ooxml(input_path, output_path, options, log)
+    except Exception as e:
+        raise Exception(f"DOCX cleaning failed: {str(e)}")
+
+
+def clean_pptx(input_path, output_path, options, log):
+    try:
+        clean_ooxml(input_path, output_path, options, log)
+    except Exception as e:
+        raise Exception(f"PPTX cleaning failed: {str(e)}")
+
+
+def clean_excel(input_path, output_path, options, log):
+    try:
+        if not is_valid_zip(input_path):
+            log(f"Invalid or corrupted Excel file: {input_path}, copying without cleaning", level='warning')
+            copy_unchanged(input_path, output_path)
+            return
+        clean_ooxml(input_path, output_path, options, log)
+    except Exception as e:
+        raise Exception(f"Excel cleaning failed: {str(e)}")
+
+
+def clean_rtf(input_path, output_path, options, log):
+    try:
+        copy_unchanged(input_path, output_path)
+    except Exception as e:
+        raise Exception(f"RTF cleaning failed: {str(e)}")
+
+
+def clean_text(input_path, output_path, options, log):
+    try:
+        copy_unchanged(input_path, output_path)
+    except Exception as e:
+        raise Exception(f"Text file handling failed: {str(e)}")
+
+
+def clean_generic(input_path, output_path, options, log):
+    """Fallback for types without a cleaner: nothing can be removed, so the file is copied as-is."""
+    try:
+        copy_unchanged(input_path, output_path)
+    except Exception as e:
+        raise Exception(f"Generic cleaning failed: {str(e)}")
+
+
+class LazyHandler:
+    """Registry entry for a cleaner whose module is imported on first use.
+
+    ``loader`` returns the backend module. The loaders below spell their
+    imports out instead of building module names from strings, so freezers
+    such as PyInstaller still bundle every backend.
+    """
+
+    def __init__(self, name, loader):
+        self.__name__ = name
+        self._loader = loader
+        self._handler = None
+
+    def resolve(self):
+        if self._handler is None:
+            self._handler = getattr(self._loader(), self.__name__)
+        return self._handler
+
+    def __call__(self, input_path, output_path, options, log):
+        return self.resolve()(input_path, output_path, options, log)
+
+    def __repr__(self):
+        return f"<LazyHandler {self.__name__}>"
+
+
+def _images():
+    from . import images
+    return images
+
+
+def _pdf():
+    from . import pdf
+    return pdf
+
+
+def _opendocument():
+    from . import opendocument
+    return opendocument
+
+
+def _audio():
+    from . import audio
+    return audio
+
+
+def _video():
+    from . import video
+    return video
+
+
+def _archives():
+    from . import archives
+    return archives
+
+
+clean_image = LazyHandler('clean_image', _images)
+clean_pdf = LazyHandler('clean_pdf', _pdf)
+clean_odf = LazyHandler('clean_odf', _opendocument)
+clean_audio = LazyHandler('clean_audio', _audio)
+clean_video = LazyHandler('clean_video', _video)
+clean_archive = LazyHandler('clean_archive', _archives)
+
+HANDLERS = {}
+for _exts, _handler in (
+    (('.jpg', '.jpeg', '.png', '.tiff', '.tif', '.bmp', '.webp', '.gif', '.heic', '.cr2', '.nef'), clean_image),
+    (('.pdf',), clean_pdf),
+    (('.docx',), clean_docx),
+    (('.pptx',), clean_pptx),
+    (('.xlsx', '.xls'), clean_excel),
+    (('.odt', '.ods', '.odp', '.odg'), clean_odf),
+    (('.rtf',), clean_rtf),
+    (('.txt', '.csv', '.html'), clean_text),
+    (('.mp3', '.wav', '.flac', '.ogg', '.oga', '.opus', '.m4a'), clean_audio),
+    (('.mp4', '.avi', '.mkv', '.mov'), clean_video),
+    (('.zip', '.rar', '.7z'), clean_archive),
+):
+    for _ext in _exts:
+        HANDLERS[_ext] = _handler
+
+
+# Handlers that only copy; archive members of these types are passed through.
+PASSTHROUGH_HANDLERS = (clean_rtf, clean_text, clean_generic)
+
+# Formats that cannot be written back are saved in another container.
+OUTPUT_EXTENSIONS = {'.rar': '.zip'}
+
+
+def _resolve(handler):
+    return handler.resolve() if isinstance(handler, LazyHandler) else handler
+
+
+def get_handler(filepath):
+    """Return the cleaner for ``filepath``, falling back to ``clean_generic``.
+
+    Imports the handler's backend if this is the first file of its type.
+    """
+    ext = os.path.splitext(filepath)[1].lower()
+    return _resolve(HANDLERS.get(ext, clean_generic))
+
+
+def warm_up(extensions=None):
+    """Import the backends for ``extensions`` (default: all) before the first dispatch.
+
+    Used as the worker pool initializer. A backend that fails to import is
+    skipped here; files of that type then fail individually when dispatched.
+    """
+    for ext in HANDLERS if extensions is None else extensions:
+        try:
+            _resolve(HANDLERS.get(ext.lower(), clean_generic))
+        except ImportError:
+            pass
@@ -0,0 +1,397 @@
+"""Decode-free removal of Exif and XMP items from HEIF/HEIC images.
+
+HEIF keeps metadata as items. Each item is listed in ``iinf``, located by
+``iloc`` and linked to the image through ``iref`` and ``ipma``. The cleaner
+reads only the top-level ``meta`` box, which is small whatever the image
+size, and drops the metadata items from those four boxes. It then writes
+the shorter ``meta`` back at its original size, padded with a ``free`` box,
+so every ``iloc`` offset into ``mdat`` stays valid. Finally it overwrites
+the removed items' payloads with zeros in a copy of the file. Image data is
+never read, so memory use does not depend on the pixel count.
+
+When dates or the copyright are kept, the Exif item is filtered instead of
+dropped, and it is rewritten in place. Malformed or unsupported input raises
+``ValueError``.
+"""
+import struct
+
+from .exif import EXIF_HEADER, filter_exif
+from .fileio import clone_file
+from .metrics import mark_copied, stage
+from .mp4 import box_header, free_box
+
+COPY_BUFSIZE = 1024 * 1024
+MAX_META_BYTES = 64 * 1024 * 1024
+MAX_EXIF_BYTES = 16 * 1024 * 1024
+XMP_MIME = 'application/rdf+xml'
+
+
+def _uint(data, pos, size, end):
+    if pos + size > end:
+        raise ValueError("truncated HEIF box")
+    return int.from_bytes(data[pos:pos + size], 'big')
+
+
+def _cstring(data, pos, end):
+    """Return ``(text, position after the terminator)`` for a null-terminated string."""
+    stop = data.find(b'\x00', pos, end)
+    if stop < 0:
+        return data[pos:end].decode('utf-8', errors='replace'), end
+    return data[pos:stop].decode('utf-8', errors='replace'), stop + 1
+
+
+def _children(data, start, end):
+    """Yield ``(type, offset, size, header_length)`` for the boxes between ``start`` and ``end``."""
+    pos = start
+    while pos < end:
+        size, kind, header = box_header(data, pos, end)
+        yield kind, pos, size, header
+        pos += size
+
+
+def _box(kind, body):
+    return struct.pack('>I4s', 8 + len(body), kind) + body
+
+
+def _metadata_items(data, start, size, header):
+    """IDs of the Exif items and the XMP items listed in an ``iinf`` box."""
+    end = start + size
+    body = start + header
+    version = data[body]
+    pos = body + 4 + (2 if version == 0 else 4)
+    exif, xmp = set(), set()
+    for kind, box, box_size, child_header in _children(data, pos, end):
+        if kind != b'infe':
+            continue
+        b, box_end = box + child_header, box + box_size
+        infe_version = data[b]
+        q = b + 4
+        if infe_version >= 2:
+            id_size = 2 if infe_version == 2 else 4
+            item_id = _uint(data, q, id_size, box_end)
+            q += id_size + 2
+            item_type = bytes(data[q:q + 4])
+            _, q = _cstring(data, q + 4, box_end)
+        else:
+            item_id = _uint(data, q, 2, box_end)
+            item_type = b'mime'
+            _, q = _cstring(data, q + 4, box_end)
+        if item_type == b'Exif':
+            exif.add(item_id)
+        elif item_type == b'mime':
+            content_type, _ = _cstring(data, q, box_end)
+            if content_type.split(';')[0].strip().lower() == XMP_MIME:
+                xmp.add(item_id)
+    return exif, xmp
+
+
+def _filter_iinf(data, start, size, header, removed):
+    end = start + size
+    body = start + header
+    version = data[body]
+    count_size = 2 if version == 0 else 4
+    kept = []
+    for kind, box, box_size, child_header in _children(data, body + 4 + count_size, end):
+        if kind == b'infe':
+            b = box + child_header
+            id_size = 4 if data[b] >= 3 else 2
+            if _uint(data, b + 4, id_size, box + box_size) in removed:
+                continue
+        kept.append(bytes(data[box:box + box_size]))
+    return _box(b'iinf', bytes(data[body:body + 4]) + len(kept).to_bytes(count_size, 'big') + b''.join(kept))
+
+
+class _Location:
+    __slots__ = ('item_id', 'start', 'end', 'method', 'base', 'extents')
+
+    def __init__(self, item_id, start, end, method, base, extents):
+        self.item_id, self.start, self.end = item_id, start, end
+        self.method, self.base, self.extents = method, base, extents
+
+
+def _parse_iloc(data, start, size, header):
+    """Return ``(header bytes, length_size, count_size, locations)`` for an ``iloc`` box."""
+    end = start + size
+    body = start + header
+    version = data[body]
+    if version > 2:
+        raise ValueError(f"unsupported iloc version {version}")
+    pos = body + 4
+    sizes = _uint(data, pos, 2, end)
+    offset_size, length_size = sizes >> 12, (sizes >> 8) & 15
+    base_size, index_size = (sizes >> 4) & 15, (sizes & 15 if version else 0)
+    pos += 2
+    count_size = 2 if version < 2 else 4
+    count = _uint(data, pos, count_size, end)
+    pos += count_size
+    id_size = 2 if version < 2 else 4
+    locations = []
+    for _ in range(count):
+        item_start = pos
+        item_id = _uint(data, pos, id_size, end)
+        pos += id_size
+        method = 0
+        if version:
+            method = _uint(data, pos, 2, end) & 15
+            pos += 2
+        data_reference = _uint(data, pos, 2, end)
+        base = _uint(data, pos + 2, base_size, end)
+        extent_count = _uint(data, pos + 2 + base_size, 2, end)
+        pos += 4 + base_size
+        extents = []
+        for _ in range(extent_count):
+            pos += index_size
+            offset = _uint(data, pos, offset_size, end)
+            length = _uint(data, pos + offset_size, length_size, end)
+            extents.append((offset, length, pos + offset_size - item_start))
+            pos += offset_size + length_size
+        if data_reference:
+            method = -1  # data in another file; never touched
+        locations.append(_Location(item_id, item_start, pos, method, base, extents))
+    return bytes(data[body:body + 6]), length_size, count_size, locations
+
+
+def _filter_iref(data, start, size, header, removed):
+    end = start + size
+    body = start + header
+    id_size = 2 if data[body] == 0 else 4
+    kept = []
+    for kind, box, box_size, child_header in _children(data, body + 4, end):
+        b, box_end = box + child_header, box + box_size
+        from_id = _uint(data, b, id_size, box_end)
+        count = _uint(data, b + id_size, 2, box_end)
+        to_ids = [_uint(data, b + id_size + 2 + i * id_size, id_size, box_end) for i in range(count)]
+        to_ids = [i for i in to_ids if i not in removed]
+        if from_id in removed or not to_ids:
+            continue
+        kept.append(_box(kind, from_id.to_bytes(id_size, 'big') + len(to_ids).to_bytes(2, 'big') +
+                         b''.join(i.to_bytes(id_size, 'big') for i in to_ids)))
+    return _box(b'iref', bytes(data[body:body + 4]) + b''.join(kept))
+
+
+def _filter_ipma(data, start, size, header, removed):
+    end = start + size
+    body = start + header
+    version, flags = data[body], _uint(data, body + 1, 3, end)
+    id_size = 2 if version < 1 else 4
+    association_size = 2 if flags & 1 else 1
+    count = _uint(data, body + 4, 4, end)
+    pos = body + 8
+    kept = []
+    for _ in range(count):
+        item_id = _uint(data, pos, id_size, end)
+        entry_end = pos + id_size + 1 + _uint(data, pos + id_size, 1, end) * association_size
+        if entry_end > end:
+            raise ValueError("truncated ipma box")
+        if item_id not in removed:
+            kept.append(bytes(data[pos:entry_end]))
+        pos = entry_end
+    return _box(b'ipma', bytes(data[body:body + 4]) + len(kept).to_bytes(4, 'big') + b''.join(kept))
+
+
+def _filter_iprp(data, start, size, header, removed):
+    children = []
+    for kind, box, box_size, child_header in _children(data, start + header, start + size):
+        if kind == b'ipma':
+            children.append(_filter_ipma(data, box, box_size, child_header, removed))
+        else:
+            children.append(bytes(data[box:box + box_size]))
+    return _box(b'iprp', b''.join(children))
+
+
+def _top_level_meta(src, file_size):
+    pos = 0
+    while pos < file_size:
+        src.seek(pos)
+        head = src.read(min(16, file_size - pos))
+        size, kind, header = box_header(head.ljust(16, b'\0'), 0, file_size - pos)
+        if pos == 0 and kind != b'ftyp':
+            raise ValueError("not a HEIF file")
+        if kind == b'meta':
+            return pos, size, header
+        pos += size
+    raise ValueError("no meta box")
+
+
+def _zero(f, start, length):
+    f.seek(start)
+    block = bytes(min(length, COPY_BUFSIZE))
+    while length > 0:
+        n = min(len(block), length)
+        f.write(block[:n])
+        length -= n
+
+
+def metadata_items(path):
+    """Return ``(kind, payload)`` for each Exif and XMP item of a HEIF file, ``kind`` being 'exif' or 'xmp'.
+
+    Payloads are read from the file or from ``idat``. Items stored in another
+    file, and payloads over ``MAX_EXIF_BYTES``, are returned empty.
+    """
+    with open(path, 'rb') as src:
+        src.seek(0, 2)
+        file_size = src.tell()
+        meta_pos, meta_size, meta_header = _top_level_meta(src, file_size)
+        if meta_size > MAX_META_BYTES:
+            raise ValueError("meta box too large")
+        src.seek(meta_pos)
+        meta = src.read(meta_size)
+        boxes = {}
+        for kind, pos, size, header in _children(meta, meta_header + 4, meta_size):
+            boxes.setdefault(kind, (pos, size, header))
+        if b'iinf' not in boxes:
+            return []
+        exif, xmp = _metadata_items(meta, *boxes[b'iinf'])
+        locations = _parse_iloc(meta, *boxes[b'iloc'])[3] if b'iloc' in boxes else []
+        idat = boxes.get(b'idat')
+        payloads = {item_id: b'' for item_id in exif | xmp}
+        for loc in locations:
+            if loc.item_id not in payloads or sum(length for _, length, _ in loc.extents) > MAX_EXIF_BYTES:
+                continue
+            data = bytearray()
+            for offset, length, _ in loc.extents:
+                if loc.method == 0:
+                    src.seek(loc.base + offset)
+                    data += src.read(length)
+                elif loc.method == 1 and idat is not None:
+                    start = idat[0] + idat[2] + loc.base + offset
+                    data += meta[start:start + length]
+            payloads[loc.item_id] = bytes(data)
+    return [('exif' if item_id in exif else 'xmp', payload) for item_id, payload in sorted(payloads.items())]
+
+
+def strip_heic(input_path, output_path, keep_copyright=False, keep_date=False):
+    """Copy ``input_path`` without its Exif and XMP items (or with a filtered Exif item)."""
+    with open(input_path, 'rb') as src:
+        src.seek(0, 2)
+        file_size = src.tell()
+        meta_pos, meta_size, meta_header = _top_level_meta(src, file_size)
+        if meta_size > MAX_META_BYTES:
+            raise ValueError("meta box too large")
+        with stage('parse'):
+            src.seek(meta_pos)
+            meta = bytearray(src.read(meta_size))
+            boxes = {}
+            for kind, pos, size, header in _children(meta, meta_header + 4, meta_size):
+                boxes.setdefault(kind, (pos, size, header))
+            if b'iinf' not in boxes or b'iloc' not in boxes:
+                raise ValueError("no item information")
+            exif, xmp = _metadata_items(meta, *boxes[b'iinf'])
+            iloc_head, length_size, count_size, locations = _parse_iloc(meta, *boxes[b'iloc'])
+            by_id = {loc.item_id: loc for loc in locations}
+            if b'pitm' in boxes:
+                pos, size, header = boxes[b'pitm']
+                primary = _uint(meta, pos + header + 4, 2 if meta[pos + header] == 0 else 4, pos + size)
+                if primary in exif | xmp:
+                    raise ValueError("primary item is metadata")
+        if not exif and not xmp:
+            clone_file(input_path, output_path)
+            mark_copied()
+            return
+
+        idat = boxes.get(b'idat')
+        idat_data = idat[0] + idat[2] if idat else None
+
+        def payload_spans(loc):
+            """``(in_meta, start, length)`` of each extent: a file offset, or an offset into ``meta``."""
+            spans = []
+            for offset, length, _ in loc.extents:
+                if length == 0:
+                    raise ValueError("open-ended metadata item")
+                if loc.method == 0:
+                    start = loc.base + offset
+                    if start + length > file_size or (start < meta_pos + meta_size and meta_pos < start + length):
+                        raise ValueError("metadata item out of range")
+                    spans.append((False, start, length))
+                elif loc.method == 1 and idat_data is not None:
+                    start = idat_data + loc.base + offset
+                    if start + length > idat[0] + idat[1]:
+                        raise ValueError("metadata item out of range")
+                    spans.append((True, start, length))
+                else:
+                    raise ValueError("unsupported item construction method")
+            return spans
+
+        writes = []  # (file offset, bytes) written over payloads in the output
+        zeros = []  # (file offset, length) zeroed in the output
+        patched = {}  # item ID -> iloc entry with the filtered Exif length
+        removed = set(xmp)
+        with stage('rewrite'):
+            for item_id in exif:
+                loc = by_id.get(item_id)
+                spans = payload_spans(loc) if loc is not None and loc.method != -1 else []
+                kept = None
+                if (keep_copyright or keep_date) and len(spans) == 1 and length_size and \
+                        spans[0][2] <= MAX_EXIF_BYTES:
+                    in_meta, start, length = spans[0]
+                    if in_meta:
+                        blob = bytes(meta[start:start + length])
+                    else:
+                        src.seek(start)
+                        blob = src.read(length)
+                    if len(blob) >= 4:
+                        tiff = blob[4 + int.from_bytes(blob[:4], 'big'):]
+                        if tiff.startswith(EXIF_HEADER):
+                            tiff = tiff[len(EXIF_HEADER):]
+                        filtered = filter_exif(tiff, keep_copyright, keep_date)
+                        if filtered and len(filtered) + 4 <= length:
+                            kept = bytes(4) + filtered
+                if kept is None:
+                    removed.add(item_id)
+                    continue
+                entry = bytearray(meta[loc.start:loc.end])
+                length_pos = loc.extents[0][2]
+                entry[length_pos:length_pos + length_size] = len(kept).to_bytes(length_size, 'big')
+                patched[item_id] = bytes(entry)
+                in_meta, start, length = spans[0]
+                data = kept + bytes(length - len(kept))
+                if in_meta:
+                    meta[start:start + length] = data
+                else:
+                    writes.append((start, data))
+
+            for item_id in removed:
+                loc = by_id.get(item_id)
+                if loc is None or loc.method == -1:
+                    continue
+                for in_meta, start, length in payload_spans(loc):
+                    if in_meta:
+                        meta[start:start + length] = bytes(length)
+                    else:
+                        zeros.append((start, length))
+
+            kept_locations = [patched.get(loc.item_id, bytes(meta[loc.start:loc.end]))
+                              for loc in locations if loc.item_id not in removed]
+            iloc = _box(b'iloc', iloc_head + len(kept_locations).to_bytes(count_size, 'big') +
+                        b''.join(kept_locations))
+            children = []
+            for kind, pos, size, header in _children(meta, meta_header + 4, meta_size):
+                if kind == b'iinf':
+                    children.append(_filter_iinf(meta, pos, size, header, removed))
+                elif kind == b'iloc':
+                    children.append(iloc)
+                elif kind == b'iref':
+                    children.append(_filter_iref(meta, pos, size, header, removed))
+                elif kind == b'iprp':
+                    children.append(_filter_iprp(meta, pos, size, header, removed))
+                else:
+                    children.append(bytes(meta[pos:pos + size]))
+            new_meta = bytes(meta[:meta_header + 4]) + b''.join(children)
+            padding = meta_size - len(new_meta)
+            if padding and padding < 8:
+                raise ValueError("no room for padding in meta box")
+            if padding:
+                new_meta += free_box(padding) + bytes(padding - len(free_box(padding)))
+            if len(new_meta) != meta_size:
+                raise ValueError("meta box grew")
+
+    with stage('write'):
+        clone_file(input_path, output_path)
+        with open(output_path, 'r+b') as dst:
+            dst.seek(meta_pos)
+            dst.write(new_meta)
+            for start, data in writes:
+                dst.seek(start)
+                dst.write(data)
+            for start, length in zeros:
+                _zero(dst, start, length)
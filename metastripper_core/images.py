@@ -0,0 +1,294 @@
+"""Image cleaning: lossless, decode-free stripping for JPEG, PNG, WebP, TIFF, RAW and HEIC.
+
+The strippers walk the file segment by segment and copy image data through
+unchanged, or rewrite only the metadata structures of a copy (TIFF and RAW
+in :mod:`.tiff`, HEIC in :mod:`.heif`), so memory use does not depend on the
+pixel count. Malformed input raises ``ValueError`` and :func:`clean_image`
+falls back to decoding and re-encoding, with imageio for HEIC and RAW files
+and with Pillow for every other image format.
+"""
+import os
+import re
+import zlib
+import struct
+
+from PIL import Image
+
+from .exif import EXIF_HEADER, filter_exif
+from .handlers import copy_unchanged
+from .heif import strip_heic
+from .metrics import stage
+from .tiff import strip_tiff
+
+COPY_BUFSIZE = 1024 * 1024
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_TEXT_CHUNKS = (b'tEXt', b'iTXt', b'zTXt')
+PNG_METADATA_CHUNKS = PNG_TEXT_CHUNKS + (b'eXIf', b'tIME')
+
+# A marker inside entropy-coded data: 0xFF not followed by a stuffed zero, a restart code or a fill byte.
+SCAN_MARKER = re.compile(rb'\xff[^\x00\xd0-\xd7\xff]')
+
+
+def copy_bytes(src, dst, length):
+    """Copy exactly ``length`` bytes from ``src`` to ``dst`` through a fixed-size buffer."""
+    while length > 0:
+        chunk = src.read(min(length, COPY_BUFSIZE))
+        if not chunk:
+            raise ValueError("unexpected end of file")
+        dst.write(chunk)
+        length -= len(chunk)
+
+
+def read_exact(src, length):
+    data = src.read(length)
+    if len(data) != length:
+        raise ValueError("unexpected end of file")
+    return data
+
+
+def _copy_scan(src, dst):
+    """Copy entropy-coded data up to the next marker and leave ``src`` at it; False at end of file."""
+    while True:
+        start = src.tell()
+        chunk = src.read(COPY_BUFSIZE)
+        if not chunk:
+            return False
+        match = SCAN_MARKER.search(chunk)
+        if match:
+            dst.write(chunk[:match.start()])
+            src.seek(start + match.start())
+            return True
+        if chunk.endswith(b'\xff') and len(chunk) > 1:  # marker may straddle the next read
+            dst.write(chunk[:-1])
+            src.seek(start + len(chunk) - 1)
+        else:
+            dst.write(chunk)
+
+
+def strip_jpeg(input_path, output_path, keep_copyright=False, keep_date=False):
+    """Drop APPn (except JFIF, ICC and Adobe) and COM segments; copy scan data as-is.
+
+    Output ends at the primary image's EOI. Anything appended after it (MPF
+    secondary images with their own EXIF, motion-photo video) is dropped.
+    """
+    with open(input_path, 'rb') as src, open(output_path, 'wb') as dst:
+        if src.read(2) != b'\xff\xd8':
+            raise ValueError("not a JPEG file")
+        dst.write(b'\xff\xd8')
+        while True:
+            marker = read_exact(src, 2)
+            if marker[0] != 0xff:
+                raise ValueError("bad JPEG marker")
+            while marker[1] == 0xff:  # fill bytes
+                marker = marker[1:] + read_exact(src, 1)
+            code = marker[1]
+            if code == 0xd9:  # EOI
+                dst.write(marker)
+                return
+            if 0xd0 <= code <= 0xd7 or code == 0x01:  # standalone markers
+                dst.write(marker)
+                continue
+            length_bytes = read_exact(src, 2)
+            (length,) = struct.unpack('>H', length_bytes)
+            if length < 2:
+                raise ValueError("bad JPEG segment length")
+            if code == 0xda:  # SOS: entropy-coded data follows, up to the next marker
+                dst.write(marker + length_bytes)
+                copy_bytes(src, dst, length - 2)
+                if not _copy_scan(src, dst):
+                    return  # truncated file without EOI
+                continue
+            if code == 0xe1 or code == 0xfe or 0xe3 <= code <= 0xed or code == 0xef:
+                payload = read_exact(src, length - 2)
+                if code == 0xe1 and payload.startswith(EXIF_HEADER):
+                    kept = filter_exif(payload[len(EXIF_HEADER):], keep_copyright, keep_date)
+                    if kept:
+                        segment = EXIF_HEADER + kept
+                        dst.write(b'\xff\xe1' + struct.pack('>H', len(segment) + 2) + segment)
+                continue
+            if code == 0xe2:
+                payload = read_exact(src, length - 2)
+                if payload.startswith(b'ICC_PROFILE\x00'):
+                    dst.write(marker + length_bytes + payload)
+                continue
+            # APP0 (JFIF), APP14 (Adobe) and all frame/table segments are kept
+            dst.write(marker + length_bytes)
+            copy_bytes(src, dst, length - 2)
+
+
+def _png_text_keyword(data):
+    return data.split(b'\x00', 1)[0]
+
+
+def strip_png(input_path, output_path, keep_copyright=False, keep_date=False):
+    """Drop text, eXIf and tIME chunks; every other chunk is copied byte-for-byte."""
+    keep_keywords = set()
+    if keep_copyright:
+        keep_keywords.add(b'Copyright')
+    if keep_date:
+        keep_keywords.add(b'Creation Time')
+    with open(input_path, 'rb') as src, open(output_path, 'wb') as dst:
+        if src.read(8) != PNG_SIGNATURE:
+            raise ValueError("not a PNG file")
+        dst.write(PNG_SIGNATURE)
+        while True:
+            header = read_exact(src, 8)
+            length, chunk_type = struct.unpack('>I4s', header)
+            if chunk_type not in PNG_METADATA_CHUNKS:
+                dst.write(header)
+                copy_bytes(src, dst, length + 4)  # data + CRC
+                if chunk_type == b'IEND':
+                    return
+                continue
+            data = read_exact(src, length)
+            crc = read_exact(src, 4)
+            if chunk_type in PNG_TEXT_CHUNKS:
+                if _png_text_keyword(data) in keep_keywords:
+                    dst.write(header + data + crc)
+            elif chunk_type == b'tIME':
+                if keep_date:
+                    dst.write(header + data + crc)
+            elif chunk_type == b'eXIf':
+                kept = filter_exif(data, keep_copyright, keep_date)
+                if kept:
+                    _write_png_chunk(dst, b'eXIf', kept)
+
+
+def _write_png_chunk(dst, chunk_type, data):
+    dst.write(struct.pack('>I', len(data)) + chunk_type + data)
+    dst.write(struct.pack('>I', zlib.crc32(chunk_type + data) & 0xffffffff))
+
+
+def strip_webp(input_path, output_path, keep_copyright=False, keep_date=False):
+    """Drop EXIF and XMP RIFF chunks and clear the matching VP8X flags.
+
+    Only the chunks inside the RIFF size are kept; anything appended after
+    them is dropped.
+    """
+    file_size = os.path.getsize(input_path)
+    with open(input_path, 'rb') as src:
+        riff = read_exact(src, 12)
+        if riff[:4] != b'RIFF' or riff[8:12] != b'WEBP':
+            raise ValueError("not a WebP file")
+        end = 8 + struct.unpack_from('<I', riff, 4)[0]
+        if end > file_size:
+            raise ValueError("truncated WebP file")
+        # First pass: index chunk headers only, so the new RIFF size is known up front.
+        chunks = []
+        pos = 12
+        while pos + 8 <= end:
+            src.seek(pos)
+            fourcc, size = struct.unpack('<4sI', read_exact(src, 8))
+            padded = size + (size & 1)
+            if pos + 8 + size > end:
+                raise ValueError("truncated WebP chunk")
+            chunks.append((fourcc, pos, size))
+            pos += 8 + padded
+
+        exif_blob = None
+        for fourcc, pos, size in chunks:
+            if fourcc == b'EXIF':
+                src.seek(pos + 8)
+                data = read_exact(src, size)
+                if data.startswith(EXIF_HEADER):
+                    data = data[len(EXIF_HEADER):]
+                exif_blob = filter_exif(data, keep_copyright, keep_date)
+
+        kept = [c for c in chunks if c[0] not in (b'EXIF', b'XMP ')]
+        if not any(fourcc == b'VP8X' for fourcc, _, _ in kept):
+            exif_blob = None  # EXIF is only valid in the extended format
+        body_size = 4 + sum(8 + size + (size & 1) for _, _, size in kept)
+        if exif_blob:
+            body_size += 8 + len(exif_blob) + (len(exif_blob) & 1)
+
+        with open(output_path, 'wb') as dst:
+            dst.write(b'RIFF' + struct.pack('<I', body_size) + b'WEBP')
+            for fourcc, pos, size in kept:
+                src.seek(pos)
+                header = read_exact(src, 8)
+                if fourcc == b'VP8X':
+                    flags = read_exact(src, 1)[0] & ~0x0c
+                    if exif_blob:
+                        flags |= 0x08
+                    dst.write(header + bytes([flags]))
+                    copy_bytes(src, dst, size - 1 + (size & 1))
+                else:
+                    dst.write(header)
+                    copy_bytes(src, dst, size + (size & 1))
+            if exif_blob:
+                dst.write(b'EXIF' + struct.pack('<I', len(exif_blob)) + exif_blob)
+                if len(exif_blob) & 1:
+                    dst.write(b'\x00')
+
+
+def strip_raw(input_path, output_path, keep_copyright=False, keep_date=False):
+    """TIFF-based RAW files keep Make and Model, which converters need to decode the sensor data."""
+    strip_tiff(input_path, output_path, keep_copyright, keep_date, keep_device=True)
+
+
+STRIPPERS = {
+    '.jpg': strip_jpeg,
+    '.jpeg': strip_jpeg,
+    '.png': strip_png,
+    '.webp': strip_webp,
+    '.tiff': strip_tiff,
+    '.tif': strip_tiff,
+    '.cr2': strip_raw,
+    '.nef': strip_raw,
+    '.heic': strip_heic,
+}
+
+
+def clean_image(input_path, output_path, options, log):
+    try:
+        ext = os.path.splitext(input_path)[1].lower()
+        stripper = STRIPPERS.get(ext)
+        if stripper:
+            try:
+                stripper(input_path, output_path, options.keep_copyright, options.keep_date)
+                return
+            except ValueError as e:
+                log(f"Lossless strip failed for {os.path.basename(input_path)} ({e}), re-encoding",
+                    level='warning')
+        if ext in ('.heic', '.cr2', '.nef'):
+            try:
+                import imageio  # optional, and slow to import (numpy)
+            except ImportError:
+                log(f"imageio not installed, copying {input_path} without cleaning", level='warning')
+                copy_unchanged(input_path, output_path)
+                return
+            img = imageio.imread(input_path)
+            imageio.imwrite(output_path, img)
+        elif ext == '.svg':
+            copy_unchanged(input_path, output_path)
+        else:
+            with stage('parse'):
+                img = Image.open(input_path)
+                data = list(img.getdata())
+            mode = img.mode
+            size = img.size
+
+            with stage('rewrite'):
+                new_img = Image.new(mode, size)
+                new_img.putdata(data)
+                if img.palette:
+                    new_img.putpalette(img.getpalette())
+                if img.info.get('transparency'):
+                    new_img.info['transparency'] = img.info['transparency']
+
+            save_params = {
+                '.png': {'format': 'PNG', 'compress_level': 9},
+                '.jpg': {'format': 'JPEG', 'quality': 95, 'optimize': True},
+                '.jpeg': {'format': 'JPEG', 'quality': 95, 'optimize': True},
+                '.gif': {'format': 'GIF'},
+                '.tiff': {'format': 'TIFF'},
+                '.tif': {'format': 'TIFF'},
+                '.bmp': {'format': 'BMP'},
+                '.webp': {'format': 'WEBP', 'quality': 95}
+            }
+            with stage('write'):
+                new_img.save(output_path, **save_params.get(ext, {}))
+            img.close()
+    except Exception as e:
+        raise Exception(f"Image cleaning failed: {str(e)}")
@@ -0,0 +1,192 @@
+"""Write-ahead job journal, so an interrupted batch can resume where it stopped.
+
+A journal is an append-only JSON-lines file named after the job ID. The
+first line records the job's options; every later line records one state
+change of one input file:
+
+* ``in-progress`` when the file is handed to a worker, with the output path
+  it will be written to;
+* ``done`` once the output is in place, with the input's size and mtime and
+  the output's size and checksum (``done`` also covers skipped files);
+* ``failed`` with the error.
+
+Files the journal has never seen are ``pending``. Records are fsynced in
+batches (every ``SYNC_EVERY`` records or ``SYNC_INTERVAL`` seconds). A crash
+can only lose the last batch, and losing a record just means that file is
+cleaned again, because cleaning is idempotent. A torn last line is cut off
+when the journal is reopened.
+
+Opening the journal of an existing job resumes it. Files recorded as
+``done``, whose input is unchanged and whose output still has the recorded
+size and checksum, are skipped. Everything else, including failed files, is
+cleaned again. Staging files left next to the outputs of files that were
+``in-progress`` at the crash are removed, since a half-written output
+cannot be resumed.
+"""
+import os
+import re
+import glob
+import json
+import time
+import hashlib
+from dataclasses import asdict
+from datetime import datetime, timezone
+
+from .cache import file_digest
+from .fileio import STAGING_PREFIX
+
+PENDING, IN_PROGRESS, DONE, FAILED = 'pending', 'in-progress', 'done', 'failed'
+JOURNAL_VERSION = 1
+SYNC_EVERY = 256
+SYNC_INTERVAL = 2.0  # seconds
+JOB_ID = re.compile(r'^[\w.-]+$')
+
+
+def job_id_for(paths, recursive, options):
+    """Derive a stable job ID from what is being cleaned and how."""
+    key = json.dumps([sorted(os.path.abspath(p) for p in paths), recursive, asdict(options)], sort_keys=True)
+    return hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+
+
+def journal_path(journal_dir, job_id):
+    if not JOB_ID.match(job_id):
+        raise ValueError(f"invalid job ID {job_id!r}: use letters, digits, '.', '-' and '_'")
+    return os.path.join(journal_dir, f"{job_id}.journal")
+
+
+class JobJournal:
+    """The journal of job ``job_id`` in ``journal_dir``, created or resumed.
+
+    Raises ``ValueError`` if the job was started with different options.
+    """
+
+    def __init__(self, journal_dir, job_id, options):
+        self.job_id = job_id
+        self.path = journal_path(journal_dir, job_id)
+        self.done = {}  # input path -> (size, mtime_ns, output path, output size, output checksum)
+        self.states = {}  # input path -> last recorded state
+        self.outputs = {}  # input path -> output path, for in-progress files
+        self.resumed = False
+        os.makedirs(journal_dir, exist_ok=True)
+        options = asdict(options)
+        if os.path.exists(self.path):
+            self._load(options)
+        self.file = open(self.path, 'ab')
+        if not self.resumed:
+            self._append({'job': job_id, 'version': JOURNAL_VERSION, 'options': options,
+                          'created': datetime.now(timezone.utc).isoformat(timespec='seconds')})
+            self.sync()
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+        self._remove_partial_outputs()
+
+    def _load(self, options):
+        with open(self.path, 'r+b') as f:
+            data = f.read()
+            end = data.rfind(b'\n') + 1
+            if end < len(data):
+                f.truncate(end)  # torn final record from a crash
+        lines = data[:end].splitlines()
+        if not lines:
+            return
+        header = json.loads(lines[0])
+        if header.get('options') != options:
+            raise ValueError(f"job {self.job_id} was started with different options; use a new job ID")
+        self.resumed = True
+        for line in lines[1:]:
+            record = json.loads(line)
+            path, state = record['path'], record['state']
+            self.states[path] = state
+            if state == DONE:
+                self.done[path] = (record['size'], record['mtime_ns'], record.get('output', ''),
+                                   record.get('output_size'), record.get('checksum'))
+            else:
+                self.done.pop(path, None)
+            if state == IN_PROGRESS:
+                self.outputs[path] = record.get('output', '')
+            else:
+                self.outputs.pop(path, None)
+
+    def _remove_partial_outputs(self):
+        for output in self.outputs.values():
+            if not output:
+                continue
+            directory, name = os.path.split(output)
+            for stale in glob.glob(os.path.join(glob.escape(directory), f"{STAGING_PREFIX}*_{glob.escape(name)}")):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+        self.outputs.clear()
+
+    def _append(self, record):
+        self.file.write(json.dumps(record, separators=(',', ':')).encode() + b'\n')
+
+    def _record(self, record):
+        self.states[record['path']] = record['state']
+        self._append(record)
+        self.unsynced += 1
+        if self.unsynced >= SYNC_EVERY or time.monotonic() - self.last_sync >= SYNC_INTERVAL:
+            self.sync()
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def is_done(self, filepath, st):
+        """True if ``filepath`` was completed by this job and neither it nor its output changed since.
+
+        The output is re-hashed, so a damaged output is cleaned again.
+        """
+        entry = self.done.get(os.path.abspath(filepath))
+        if entry is None or st is None or entry[:2] != (st.st_size, st.st_mtime_ns):
+            return False
+        output, output_size, checksum = entry[2:]
+        if not output:
+            return True
+        try:
+            return os.path.getsize(output) == output_size and (not checksum or file_digest(output) == checksum)
+        except OSError:
+            return False
+
+    def started(self, filepath, output_path):
+        self._record({'path': os.path.abspath(filepath), 'state': IN_PROGRESS,
+                      'output': os.path.abspath(output_path)})
+
+    def finished(self, result):
+        """Record the :class:`~metastripper_core.engine.CleanResult` of a file."""
+        path = os.path.abspath(result.input_path)
+        if result.status == 'failed':
+            self.done.pop(path, None)
+            self._record({'path': path, 'state': FAILED, 'error': result.error})
+            return
+        try:
+            st = os.stat(result.input_path)
+        except OSError:
+            self._record({'path': path, 'state': DONE, 'size': None, 'mtime_ns': None})
+            return
+        record = {'path': path, 'state': DONE, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+        if result.output_path and os.path.exists(result.output_path):
+            record.update(output=os.path.abspath(result.output_path),
+                          output_size=os.path.getsize(result.output_path), checksum=result.checksum)
+        self.done[path] = (record['size'], record['mtime_ns'], record.get('output', ''), record.get('output_size'),
+                           record.get('checksum'))
+        self._record(record)
+
+    def counts(self):
+        """Number of files in each state, as recorded so far."""
+        counts = {IN_PROGRESS: 0, DONE: 0, FAILED: 0}
+        for state in self.states.values():
+            counts[state] += 1
+        return counts
+
+    def close(self):
+        self.sync()
+        self.file.close()
+
+    def discard(self):
+        """Close and delete the journal, once the job no longer needs resuming."""
+        self.close()
+        os.remove(self.path)
@@ -0,0 +1,248 @@
+"""Per-file, per-stage instrumentation and the sinks that export it.
+
+:func:`metastripper_core.engine.clean_file` times its own stages (``stat``,
+``cache``, ``backup``, ``dispatch``, ``move``) with a :class:`StageRecorder`.
+Handlers attribute their internal time with :func:`stage` (``parse``,
+``rewrite``, ``write``); handler time they do not attribute counts as
+``rewrite``. :func:`stage` and :func:`mark_copied` are no-ops outside an
+instrumented call. Archive members are cleaned inside :func:`nested`: their
+stages count towards the archive, but they cannot mark it as copied.
+
+The timings travel back to the parent process on the
+:class:`~metastripper_core.engine.CleanResult`, where the sinks below turn
+them into a JSON-lines event log, a Prometheus text file (the format the
+node exporter's textfile collector reads) and a set of profiles for the slowest files. Every sink has ``observe(result)`` and
+``close()``.
+"""
+import os
+import io
+import json
+import heapq
+import time
+import hashlib
+import threading
+import cProfile
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+STAGES = ('stat', 'cache', 'backup', 'dispatch', 'parse', 'rewrite', 'write', 'move')
+HANDLER_STAGES = ('parse', 'rewrite', 'write')
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0)
+EXPORT_INTERVAL = 10.0  # seconds between metrics file refreshes during a run
+MEMORY_TOP_STATS = 25
+
+_local = threading.local()
+
+
+class StageRecorder:
+    """Accumulates stage timings for one file in the current thread."""
+
+    def __init__(self):
+        self.stages = {}
+        self.copied = False
+
+    @contextmanager
+    def time(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    @contextmanager
+    def active(self):
+        previous = getattr(_local, 'recorder', None)
+        _local.recorder = self
+        try:
+            yield self
+        finally:
+            _local.recorder = previous
+
+    def run_handler(self, handler, *args):
+        """Call ``handler``, booking whatever time it does not attribute itself to ``rewrite``."""
+        before = sum(self.stages.get(name, 0.0) for name in HANDLER_STAGES)
+        start = time.perf_counter()
+        try:
+            handler(*args)
+        finally:
+            attributed = sum(self.stages.get(name, 0.0) for name in HANDLER_STAGES) - before
+            unattributed = time.perf_counter() - start - attributed
+            self.stages['rewrite'] = self.stages.get('rewrite', 0.0) + max(0.0, unattributed)
+
+
+@contextmanager
+def stage(name):
+    """Attribute the enclosed block to stage ``name`` of the file being cleaned."""
+    recorder = getattr(_local, 'recorder', None)
+    if recorder is None:
+        yield
+        return
+    with recorder.time(name):
+        yield
+
+
+def mark_copied():
+    """Record that the current file was copied without removing anything."""
+    recorder = getattr(_local, 'recorder', None)
+    if recorder is not None:
+        recorder.copied = True
+
+
+@contextmanager
+def nested():
+    """Clean a part of the current file (an archive member) without letting it decide the file's outcome."""
+    recorder = getattr(_local, 'recorder', None)
+    copied = recorder.copied if recorder is not None else False
+    try:
+        yield
+    finally:
+        if recorder is not None:
+            recorder.copied = copied
+
+
+@contextmanager
+def profiled(profile_dir, filepath, memory=False):
+    """Profile the enclosed block into ``profile_dir``; yields a dict that receives the file paths."""
+    os.makedirs(profile_dir, exist_ok=True)
+    tag = hashlib.blake2b(os.path.abspath(filepath).encode(), digest_size=6).hexdigest()
+    base = os.path.join(profile_dir, f"{tag}_{os.path.basename(filepath)}")
+    paths = {}
+    profiler = cProfile.Profile()
+    tracing = memory and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    profiler.enable()
+    try:
+        yield paths
+    finally:
+        profiler.disable()
+        paths['cpu'] = base + '.prof'
+        profiler.dump_stats(paths['cpu'])
+        if tracing:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            paths['memory'] = base + '.memory.txt'
+            with open(paths['memory'], 'w', encoding='utf-8') as f:
+                f.write(f"peak traced memory: {peak} bytes\n")
+                for line in snapshot.statistics('lineno')[:MEMORY_TOP_STATS]:
+                    f.write(f"{line}\n")
+
+
+def _write_atomic(path, content):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(temp_path, path)
+
+
+class EventLog:
+    """Appends one JSON object per cleaned file to ``path``."""
+
+    def __init__(self, path):
+        self.file = open(path, 'a', encoding='utf-8', buffering=1)
+
+    def observe(self, result):
+        self.file.write(json.dumps({
+            'time': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+            'path': result.input_path,
+            'output': result.output_path,
+            'handler': result.handler,
+            'status': result.status,
+            'error': result.error,
+            'elapsed': round(result.elapsed, 6),
+            'stages': {name: round(seconds, 6) for name, seconds in result.stages.items()},
+            'bytes_read': result.bytes_read,
+            'bytes_written': result.bytes_written,
+        }) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+class MetricsExporter:
+    """Aggregates results into a Prometheus text file, refreshed during the run."""
+
+    def __init__(self, path):
+        self.path = path
+        self.files = {}  # (handler, status) -> count
+        self.stage_seconds = {}  # (handler, stage) -> seconds
+        self.bytes = {}  # (handler, direction) -> bytes
+        self.durations = {}  # handler -> [bucket counts..., sum, count]
+        self.last_export = time.monotonic()
+
+    def observe(self, result):
+        handler = result.handler or 'none'
+        key = (handler, result.status)
+        self.files[key] = self.files.get(key, 0) + 1
+        for name, seconds in result.stages.items():
+            self.stage_seconds[(handler, name)] = self.stage_seconds.get((handler, name), 0.0) + seconds
+        for direction, value in (('read', result.bytes_read), ('written', result.bytes_written)):
+            self.bytes[(handler, direction)] = self.bytes.get((handler, direction), 0) + value
+        histogram = self.durations.setdefault(handler, [0] * len(DURATION_BUCKETS) + [0.0, 0])
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if result.elapsed <= bound:
+                histogram[i] += 1
+        histogram[-2] += result.elapsed
+        histogram[-1] += 1
+        if time.monotonic() - self.last_export >= EXPORT_INTERVAL:
+            self.export()
+
+    def render(self):
+        out = io.StringIO()
+        out.write("# HELP metastripper_files_total Files processed by handler and outcome.\n")
+        out.write("# TYPE metastripper_files_total counter\n")
+        for (handler, status), count in sorted(self.files.items()):
+            out.write(f'metastripper_files_total{{handler="{handler}",status="{status}"}} {count}\n')
+        out.write("# HELP metastripper_stage_seconds_total Time spent in each pipeline stage.\n")
+        out.write("# TYPE metastripper_stage_seconds_total counter\n")
+        for (handler, name), seconds in sorted(self.stage_seconds.items()):
+            out.write(f'metastripper_stage_seconds_total{{handler="{handler}",stage="{name}"}} {seconds:.6f}\n')
+        out.write("# HELP metastripper_bytes_total Input bytes read and output bytes written.\n")
+        out.write("# TYPE metastripper_bytes_total counter\n")
+        for (handler, direction), value in sorted(self.bytes.items()):
+            out.write(f'metastripper_bytes_total{{handler="{handler}",direction="{direction}"}} {value}\n')
+        out.write("# HELP metastripper_file_seconds Time to clean one file.\n")
+        out.write("# TYPE metastripper_file_seconds histogram\n")
+        for handler, histogram in sorted(self.durations.items()):
+            for bound, count in zip(DURATION_BUCKETS, histogram):
+                out.write(f'metastripper_file_seconds_bucket{{handler="{handler}",le="{bound}"}} {count}\n')
+            out.write(f'metastripper_file_seconds_bucket{{handler="{handler}",le="+Inf"}} {histogram[-1]}\n')
+            out.write(f'metastripper_file_seconds_sum{{handler="{handler}"}} {histogram[-2]:.6f}\n')
+            out.write(f'metastripper_file_seconds_count{{handler="{handler}"}} {histogram[-1]}\n')
+        return out.getvalue()
+
+    def export(self):
+        _write_atomic(self.path, self.render())
+        self.last_export = time.monotonic()
+
+    def close(self):
+        self.export()
+
+
+class ProfileKeeper:
+    """Keeps the profiles of the ``top`` slowest files and deletes the rest."""
+
+    def __init__(self, top):
+        self.top = top
+        self.heap = []  # (elapsed, input_path, profile paths), fastest first
+
+    def observe(self, result):
+        if not result.profile:
+            return
+        heapq.heappush(self.heap, (result.elapsed, result.input_path, result.profile))
+        if len(self.heap) > self.top:
+            _, _, dropped = heapq.heappop(self.heap)
+            for path in dropped.values():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def slowest(self):
+        """``(elapsed, input_path, profile paths)`` for the kept files, slowest first."""
+        return sorted(self.heap, reverse=True)
+
+    def close(self):
+        pass
@@ -0,0 +1,170 @@
+"""In-process metadata removal for MP4/MOV (ISO base media) files.
+
+Only the boxes that carry metadata are touched: ``udta`` (including ``©xyz``
+locations and iTunes-style ``meta/ilst`` tags) and ``meta`` under ``moov``
+and every ``trak``, XMP ``uuid`` boxes, and the creation/modification times
+in ``mvhd``, ``tkhd`` and ``mdhd`` unless dates are kept. Removed boxes are
+overwritten in place by a ``free`` box of the same size, so ``mdat`` and
+every chunk offset stay valid and media data is copied through unchanged.
+When the copyright is kept, a ``udta`` or ``meta`` box is instead rewritten
+with only its copyright entries (``cprt``, ``©cpy`` and the iTunes ``cprt``
+tag), followed by a ``free`` box for the rest of its space.
+Malformed input raises ``ValueError`` so callers can fall back to ffmpeg.
+"""
+import struct
+
+from .fileio import copy_range
+from .metrics import stage
+
+COPY_BUFSIZE = 1024 * 1024
+TOP_LEVEL = {b'ftyp', b'moov', b'mdat', b'free', b'skip', b'wide', b'pnot', b'uuid', b'meta', b'udta',
+             b'moof', b'mfra', b'sidx', b'styp', b'pdin', b'prft', b'emsg'}
+CONTAINERS = {b'moov', b'trak', b'mdia', b'minf', b'stbl', b'edts', b'dinf', b'mvex', b'moof', b'traf'}
+METADATA_BOXES = {b'udta', b'meta'}
+TIMESTAMPED = {b'mvhd', b'tkhd', b'mdhd'}
+XMP_UUID = bytes.fromhex('BE7ACFCB97A942E89C71999491E3AFAC')
+COPYRIGHT_BOXES = {b'cprt', b'\xa9cpy'}  # in udta, and cprt as an ilst tag
+MAX_KEPT_BOX = 16 * 1024 * 1024  # larger top-level metadata boxes are blanked whole
+
+
+def box_header(data, pos, end):
+    """Return ``(size, type, header_length)`` for the box at ``data[pos:]``."""
+    if end - pos < 8:
+        raise ValueError("truncated box header")
+    size, kind = struct.unpack_from('>I4s', data, pos)
+    header = 8
+    if size == 1:
+        if end - pos < 16:
+            raise ValueError("truncated box header")
+        (size,) = struct.unpack_from('>Q', data, pos + 8)
+        header = 16
+    elif size == 0:
+        size = end - pos
+    if size < header or pos + size > end:
+        raise ValueError(f"bad size for box {kind!r}")
+    return size, kind, header
+
+
+def free_box(size):
+    """Header of a ``free`` box that is ``size`` bytes long in total."""
+    if size < 2 ** 32:
+        return struct.pack('>I4s', size, b'free')
+    return struct.pack('>I4sQ', 1, b'free', size)
+
+
+def _is_metadata(kind, data, pos, header):
+    if kind in METADATA_BOXES:
+        return True
+    return kind == b'uuid' and data[pos + header:pos + header + 16] == XMP_UUID
+
+
+def _children(data, start, end):
+    pos = start
+    while pos < end:
+        size, kind, header = box_header(data, pos, end)
+        yield kind, pos, size, header
+        pos += size
+
+
+def _copyright_only(data, pos, size, header):
+    """The ``udta`` or ``meta`` box at ``data[pos:]`` reduced to its copyright entries, or ``b''`` if it has none."""
+    kind = bytes(data[pos + 4:pos + 8])
+    body, end = pos + header, pos + size
+    prefix = b''
+    if kind == b'meta' and data[body + 4:body + 8] != b'hdlr':
+        prefix = bytes(data[body:body + 4])  # full box version and flags (QuickTime omits them)
+        body += 4
+    handler, kept = b'', []
+    for child, start, child_size, child_header in _children(data, body, end):
+        box = bytes(data[start:start + child_size])
+        if kind == b'udta' and child in COPYRIGHT_BOXES:
+            kept.append(box)
+        elif child == b'meta':
+            kept.append(_copyright_only(data, start, child_size, child_header))
+        elif kind == b'meta' and child == b'hdlr':
+            handler = box
+        elif kind == b'meta' and child == b'ilst':
+            tags = [bytes(data[s:s + n]) for tag, s, n, _ in
+                    _children(data, start + child_header, start + child_size) if tag == b'cprt']
+            if tags:
+                kept.append(struct.pack('>I4s', 8 + sum(map(len, tags)), b'ilst') + b''.join(tags))
+    kept = b''.join(kept)
+    if not kept:
+        return b''
+    body = prefix + handler + kept
+    return struct.pack('>I4s', 8 + len(body), kind) + body
+
+
+def _blank(data, pos, size, kept=b''):
+    """Replace the box at ``data[pos:pos + size]`` with ``kept`` followed by a ``free`` box of the same total size."""
+    rest = size - len(kept)
+    if 0 < rest < 8:  # no room for a free box header; cannot happen when whole boxes were dropped
+        kept, rest = b'', size
+    free = free_box(rest) if rest else b''
+    data[pos:pos + size] = kept + free + bytes(rest - len(free))
+
+
+def _scrub(data, start, end, keep_copyright, keep_date):
+    """Blank metadata boxes between ``start`` and ``end`` of ``data`` (a bytearray) in place."""
+    pos = start
+    while pos < end:
+        size, kind, header = box_header(data, pos, end)
+        if _is_metadata(kind, data, pos, header):
+            kept = _copyright_only(data, pos, size, header) if keep_copyright and kind in METADATA_BOXES else b''
+            _blank(data, pos, size, kept)
+        elif kind in CONTAINERS:
+            _scrub(data, pos + header, pos + size, keep_copyright, keep_date)
+        elif kind in TIMESTAMPED and not keep_date:
+            body = pos + header
+            width = 8 if data[body] == 1 else 4
+            if body + 4 + 2 * width > pos + size:
+                raise ValueError(f"truncated {kind.decode()} box")
+            data[body + 4:body + 4 + 2 * width] = bytes(2 * width)
+        pos += size
+
+
+def _zeros(dst, length):
+    block = bytes(min(length, COPY_BUFSIZE))
+    while length > 0:
+        dst.write(block[:length])
+        length -= len(block)
+
+
+def strip_mp4(input_path, output_path, keep_copyright=False, keep_date=False):
+    with open(input_path, 'rb') as src, open(output_path, 'wb') as dst:
+        src.seek(0, 2)
+        file_size = src.tell()
+        src.seek(0)
+        pos = 0
+        found_moov = False
+        while pos < file_size:
+            head = src.read(min(32, file_size - pos))
+            size, kind, header = box_header(head.ljust(32, b'\0'), 0, file_size - pos)
+            if kind not in TOP_LEVEL:
+                raise ValueError(f"unexpected top-level box {kind!r}")
+            if pos == 0 and kind not in (b'ftyp', b'wide', b'free', b'skip', b'moov', b'mdat', b'pnot'):
+                raise ValueError("not an MP4/MOV file")
+            src.seek(pos)
+            if kind == b'moov':
+                found_moov = True
+                with stage('parse'):
+                    data = bytearray(src.read(size))
+                with stage('rewrite'):
+                    _scrub(data, header, size, keep_copyright, keep_date)
+                dst.write(data)
+            elif keep_copyright and kind in METADATA_BOXES and size <= MAX_KEPT_BOX:
+                with stage('parse'):
+                    data = bytearray(src.read(size))
+                with stage('rewrite'):
+                    _blank(data, 0, size, _copyright_only(data, 0, size, header))
+                dst.write(data)
+            elif kind in METADATA_BOXES or (kind == b'uuid' and head[header:header + 16] == XMP_UUID):
+                free = free_box(size)
+                dst.write(free)
+                _zeros(dst, size - len(free))
+                src.seek(pos + size)
+            else:
+                copy_range(src, dst, pos, size)
+            pos += size
+        if not found_moov:
+            raise ValueError("no moov box")
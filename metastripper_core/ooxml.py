@@ -0,0 +1,121 @@
+"""Streaming metadata removal for OOXML packages (DOCX, PPTX, XLSX).
+
+Only the property parts (and, optionally, the review parts) are parsed and
+rewritten; every other entry is copied into the output archive still
+compressed. Cost scales with the size of the metadata, not of the document,
+and content the object-model libraries do not understand is kept intact.
+"""
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+
+from .metrics import stage
+from .ziputil import copy_raw, write_member
+
+NS = {
+    'cp': 'http://schemas.openxmlformats.org/package/2006/metadata/core-properties',
+    'dc': 'http://purl.org/dc/elements/1.1/',
+    'dcterms': 'http://purl.org/dc/terms/',
+    'dcmitype': 'http://purl.org/dc/dcmitype/',
+    'xsi': 'http://www.w3.org/2001/XMLSchema-instance',
+}
+for _prefix, _uri in NS.items():
+    ET.register_namespace(_prefix, _uri)
+
+CORE_DATES = {f"{{{NS['dcterms']}}}created", f"{{{NS['dcterms']}}}modified"}
+
+# app.xml and custom.xml use a default namespace that ElementTree cannot
+# round-trip cleanly, so the few elements involved are removed textually.
+APP_IDENTIFYING = re.compile(
+    rb'<((?:\w+:)?(?:Template|Manager|Company|TotalTime|Application|AppVersion|HyperlinkBase))\b'
+    rb'(?:[^>]*/>|[^>]*>.*?</\1>)', re.S)
+CUSTOM_PROPERTY = re.compile(rb'<((?:\w+:)?property)\b([^>]*?)(?:/>|>.*?</\1>)', re.S)
+PROPERTY_NAME = re.compile(rb'\sname="([^"]*)"')
+
+CORE_PART = 'docProps/core.xml'
+APP_PART = 'docProps/app.xml'
+CUSTOM_PART = 'docProps/custom.xml'
+
+# Review data: comment authors and Word revision-session IDs.
+REVIEW_PARTS = re.compile(
+    r'^(word/(document|comments\w*|people|settings|styles\w*|numbering|footnotes|endnotes|header\d*|footer\d*)\.xml'
+    r'|ppt/commentAuthors\.xml|ppt/authors\.xml|ppt/comments/\w+\.xml|xl/comments\d*\.xml'
+    r'|xl/threadedComments/\w+\.xml|xl/persons/person\.xml)$'
+)
+RSID_ATTR = re.compile(rb'\s+w:rsid\w*="[^"]*"')
+RSIDS_ELEMENT = re.compile(rb'<w:rsids>.*?</w:rsids>|<w:rsids/>|<w:rsid\b[^>]*/>', re.S)
+WORD_AUTHOR_ATTR = re.compile(rb'(\sw(?:15)?:(?:author|initials))="[^"]*"')
+WORD_DATE_ATTR = re.compile(rb'\s+w:date="[^"]*"')
+PRESENCE_ELEMENT = re.compile(rb'<w15:presenceInfo\b[^>]*/>')
+AUTHOR_ATTR = re.compile(rb'(\s(?:name|initials|displayName|userId|providerId))="[^"]*"')
+AUTHOR_ELEMENT = re.compile(rb'<author>[^<]*</author>')
+
+
+def _serialize(root):
+    return ET.tostring(root, encoding='UTF-8', xml_declaration=True)
+
+
+def clean_core(data, keep_date=False):
+    root = ET.fromstring(data)
+    for child in list(root):
+        if keep_date and child.tag in CORE_DATES:
+            continue
+        root.remove(child)
+    return _serialize(root)
+
+
+def clean_app(data):
+    return APP_IDENTIFYING.sub(b'', data)
+
+
+def clean_custom(data, keep_copyright=False):
+    def drop(match):
+        name = PROPERTY_NAME.search(match.group(2))
+        if keep_copyright and name and b'copyright' in name.group(1).lower():
+            return match.group(0)
+        return b''
+    return CUSTOM_PROPERTY.sub(drop, data)
+
+
+def _blank(match):
+    return match.group(1) + b'=""'
+
+
+def clean_review(name, data, keep_date=False):
+    """Blank comment/revision authors and drop Word revision-session IDs in a review part."""
+    if name.startswith('word/'):
+        data = RSID_ATTR.sub(b'', data)
+        data = RSIDS_ELEMENT.sub(b'', data)
+        data = PRESENCE_ELEMENT.sub(b'', data)
+        if not keep_date:
+            data = WORD_DATE_ATTR.sub(b'', data)
+        return WORD_AUTHOR_ATTR.sub(_blank, data)
+    if name.startswith('xl/comments'):
+        return AUTHOR_ELEMENT.sub(b'<author></author>', data)
+    return AUTHOR_ATTR.sub(_blank, data)
+
+
+def strip_package(input_path, output_path, keep_copyright=False, keep_date=False, strip_review=False):
+    """Rewrite the property parts of an OOXML package and copy everything else raw."""
+    with open(input_path, 'rb') as src, zipfile.ZipFile(src) as zin, \
+            zipfile.ZipFile(output_path, 'w') as zout:
+        for info in zin.infolist():
+            name = info.filename
+            if name == CORE_PART:
+                clean = lambda data: clean_core(data, keep_date)
+            elif name == APP_PART:
+                clean = clean_app
+            elif name == CUSTOM_PART:
+                clean = lambda data: clean_custom(data, keep_copyright)
+            elif strip_review and REVIEW_PARTS.match(name):
+                clean = lambda data: clean_review(name, data, keep_date)
+            else:
+                with stage('write'):
+                    copy_raw(zin, src, info, zout)
+                continue
+            with stage('parse'):
+                data = zin.read(info)
+            with stage('rewrite'):
+                data = clean(data)
+            with stage('write'):
+                write_member(zout, info, data)
@@ -0,0 +1,177 @@
+"""Streaming metadata removal for OpenDocument packages (ODT, ODS, ODP, ODG).
+
+Like :mod:`.ooxml`, only the parts that carry metadata are rewritten:
+
+* ``meta.xml``, and that of every embedded object the manifest lists (e.g.
+  ``Object 1/meta.xml``), loses everything except document statistics (and,
+  when asked, the dates and a copyright field);
+* ``settings.xml`` has its printer and data-source items blanked;
+* ``content.xml`` has the authors of tracked changes blanked, and with
+  ``strip_review_data`` the authors of comments as well.
+
+``content.xml`` is inflated only if a chunked scan finds tracked changes or
+comments in it. Every other entry is copied into the output still
+compressed. ``mimetype`` is written first and stored, as the format requires.
+"""
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+
+from .handlers import copy_unchanged
+from .metrics import stage
+from .ziputil import COPY_BUFSIZE, clone_info, copy_raw, write_member
+
+ODF_NS = {
+    'office': 'urn:oasis:names:tc:opendocument:xmlns:office:1.0',
+    'meta': 'urn:oasis:names:tc:opendocument:xmlns:meta:1.0',
+    'dc': 'http://purl.org/dc/elements/1.1/',
+    'xlink': 'http://www.w3.org/1999/xlink',
+    'ooo': 'http://openoffice.org/2004/office',
+    'grddl': 'http://www.w3.org/2003/g/data-view#',
+    'manifest': 'urn:oasis:names:tc:opendocument:xmlns:manifest:1.0',
+}
+for _prefix, _uri in ODF_NS.items():
+    ET.register_namespace(_prefix, _uri)
+
+OFFICE_META = f"{{{ODF_NS['office']}}}meta"
+STATISTIC = f"{{{ODF_NS['meta']}}}document-statistic"
+USER_DEFINED = f"{{{ODF_NS['meta']}}}user-defined"
+USER_DEFINED_NAME = f"{{{ODF_NS['meta']}}}name"
+META_DATES = {f"{{{ODF_NS['meta']}}}creation-date", f"{{{ODF_NS['dc']}}}date"}
+FULL_PATH = f"{{{ODF_NS['manifest']}}}full-path"
+
+MIMETYPE = 'mimetype'
+META_PART = 'meta.xml'
+SETTINGS_PART = 'settings.xml'
+CONTENT_PART = 'content.xml'
+MANIFEST_PART = 'META-INF/manifest.xml'
+
+SETTINGS_ITEM = re.compile(
+    rb'(<config:config-item config:name="(?:PrinterName|PrinterSetup|CurrentDatabaseDataSource|'
+    rb'CurrentDatabaseCommand)"[^>]*>)[^<]*(</config:config-item>)')
+CHANGE_INFO = re.compile(rb'<office:change-info\b.*?</office:change-info>', re.S)
+ANNOTATION = re.compile(rb'<office:annotation\b.*?</office:annotation>', re.S)
+CREATOR = re.compile(rb'<(dc:creator|meta:creator-initials)>[^<]*</\1>')
+
+
+def _serialize(root):
+    return ET.tostring(root, encoding='UTF-8', xml_declaration=True)
+
+
+def clean_meta(data, keep_copyright=False, keep_date=False):
+    root = ET.fromstring(data)
+    for office_meta in root.iter(OFFICE_META):
+        for child in list(office_meta):
+            if child.tag == STATISTIC or keep_date and child.tag in META_DATES:
+                continue
+            if keep_copyright and child.tag == USER_DEFINED and \
+                    'copyright' in child.get(USER_DEFINED_NAME, '').lower():
+                continue
+            office_meta.remove(child)
+    return _serialize(root)
+
+
+def clean_settings(data):
+    return SETTINGS_ITEM.sub(rb'\1\2', data)
+
+
+def _blank_creators(match):
+    return CREATOR.sub(rb'<\1></\1>', match.group(0))
+
+
+def clean_content(data, strip_review=False):
+    data = CHANGE_INFO.sub(_blank_creators, data)
+    if strip_review:
+        data = ANNOTATION.sub(_blank_creators, data)
+    return data
+
+
+def _contains(zin, info, needles):
+    """True if the decompressed entry contains one of ``needles``; reads it in fixed-size chunks."""
+    overlap = max(len(needle) for needle in needles) - 1
+    tail = b''
+    with zin.open(info) as f:
+        while True:
+            chunk = f.read(COPY_BUFSIZE)
+            if not chunk:
+                return False
+            window = tail + chunk
+            if any(needle in window for needle in needles):
+                return True
+            tail = window[-overlap:]
+
+
+def is_encrypted(zin):
+    """ODF encryption is declared in the manifest; encrypted parts cannot be rewritten."""
+    try:
+        return b'encryption-data' in zin.read(MANIFEST_PART)
+    except KeyError:
+        return False
+
+
+def meta_parts(zin):
+    """Names of the package's ``meta.xml`` and those of the embedded objects listed in its manifest."""
+    parts = {META_PART}
+    try:
+        manifest = ET.fromstring(zin.read(MANIFEST_PART))
+    except (KeyError, ET.ParseError):
+        return parts
+    for entry in manifest:
+        path = entry.get(FULL_PATH, '')
+        if path.endswith('/' + META_PART):
+            parts.add(path)
+        elif path.endswith('/') and path != '/':  # an embedded object's folder
+            parts.add(path + META_PART)
+    return parts
+
+
+def strip_odf(input_path, output_path, keep_copyright=False, keep_date=False, strip_review=False):
+    """Rewrite the metadata parts of an ODF package and copy everything else raw."""
+    with open(input_path, 'rb') as src, zipfile.ZipFile(src) as zin, \
+            zipfile.ZipFile(output_path, 'w') as zout:
+        infos = zin.infolist()
+        mimetype = next((info for info in infos if info.filename == MIMETYPE), None)
+        if mimetype is not None:
+            info = clone_info(mimetype)
+            info.compress_type = zipfile.ZIP_STORED
+            info.extra = b''
+            zout.writestr(info, zin.read(mimetype))
+        needles = [b'<office:change-info'] + ([b'<office:annotation'] if strip_review else [])
+        metas = meta_parts(zin)
+        for info in infos:
+            name = info.filename
+            if name == MIMETYPE:
+                continue
+            if name in metas:
+                clean = lambda data: clean_meta(data, keep_copyright, keep_date)
+            elif name == SETTINGS_PART:
+                clean = clean_settings
+            elif name == CONTENT_PART and _contains(zin, info, needles):
+                clean = lambda data: clean_content(data, strip_review)
+            else:
+                with stage('write'):
+                    copy_raw(zin, src, info, zout)
+                continue
+            with stage('parse'):
+                data = zin.read(info)
+            with stage('rewrite'):
+                data = clean(data)
+            with stage('write'):
+                write_member(zout, info, data)
+
+
+def clean_odf(input_path, output_path, options, log):
+    try:
+        try:
+            with zipfile.ZipFile(input_path) as zin:
+                encrypted = is_encrypted(zin)
+        except zipfile.BadZipFile as e:
+            raise Exception(f"not a valid OpenDocument package ({e})")
+        if encrypted:
+            log(f"Encrypted OpenDocument file: {input_path}, copying without cleaning", level='warning')
+            copy_unchanged(input_path, output_path)
+            return
+        strip_odf(input_path, output_path, options.keep_copyright, options.keep_date,
+                  options.strip_review_data)
+    except Exception as e:
+        raise Exception(f"ODF cleaning failed: {str(e)}")
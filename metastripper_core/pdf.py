@@ -0,0 +1,333 @@
+"""Metadata removal for PDF files without rebuilding the document.
+
+The output is a minimal rewrite of the input: every object that carries no
+metadata is copied byte-for-byte at its new offset, in file order, so memory
+stays bounded by the largest object header rather than the document size.
+Only these objects change:
+
+* the trailer ``/Info`` dictionary is dropped (or reduced to its dates with
+  ``keep_date``);
+* every XMP stream (``/Type /Metadata``, at document, page or image level)
+  is replaced by an empty XMP packet under the same object number, so no
+  dictionary that references it has to be touched;
+* old cross-reference streams and linearization dictionaries are dropped,
+  since the new file gets a single fresh cross-reference section.
+
+Object streams are only unpacked when the ``/Info`` dictionary lives inside
+one; all others are copied still compressed. Anything this parser does not
+understand raises ``ValueError`` so the caller can fall back to a full rewrite.
+"""
+import io
+import os
+import re
+import zlib
+
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.errors import PdfReadError
+from PyPDF2.generic import DictionaryObject, IndirectObject, NameObject, NumberObject, ArrayObject
+
+from .handlers import copy_unchanged
+from .metrics import stage
+
+COPY_BUFSIZE = 1024 * 1024
+SCAN_CHUNK = 8192
+INFO_DATE_KEYS = ('/CreationDate', '/ModDate')
+EMPTY_XMP = (b'<?xpacket begin="" id="W5M0MpCehiHzreSzNTczkc9d"?>'
+             b'<x:xmpmeta xmlns:x="adobe:ns:meta/"/><?xpacket end="w"?>')
+
+OBJ_HEADER = re.compile(rb'\s*(\d+)\s+(\d+)\s+obj\b')
+# The end of an object header, or the start of a token that can hide one (string, comment).
+HEADER_TOKEN = re.compile(rb'[(<%]|(?<![A-Za-z])(endobj|stream)(?![A-Za-z])')
+STRING_TOKEN = re.compile(rb'[()\\]')
+EOL = re.compile(rb'[\r\n]')
+STREAM_EOL = re.compile(rb'stream(\r\n|\n|\r)?')
+LENGTH_REF = re.compile(rb'/Length\s+(\d+)\s+(\d+)\s+R')
+LENGTH_DIRECT = re.compile(rb'/Length\s+(\d+)(?![\d\s]*R)')
+XMP_TYPE = re.compile(rb'/Type\s*/Metadata\b')
+XREF_TYPE = re.compile(rb'/Type\s*/XRef\b')
+LINEARIZED = re.compile(rb'/Linearized\b')
+
+
+class EncryptedPdfError(ValueError):
+    pass
+
+
+def _serialize(num, obj):
+    buf = io.BytesIO()
+    buf.write(f"{num} 0 obj\n".encode())
+    obj.write_to_stream(buf, None)
+    buf.write(b"\nendobj\n")
+    return buf.getvalue()
+
+
+def _string_end(buf, pos):
+    """Position after the literal string whose body starts at ``pos``, or ``None`` if ``buf`` ends first."""
+    depth = 1
+    while True:
+        match = STRING_TOKEN.search(buf, pos)
+        if not match:
+            return None
+        pos = match.end()
+        token = match.group()
+        if token == b'\\':
+            pos += 1  # escaped character
+            if pos > len(buf):
+                return None
+        elif token == b'(':
+            depth += 1
+        else:
+            depth -= 1
+            if not depth:
+                return pos
+
+
+def _find_keyword(buf, pos):
+    """Find ``endobj`` or ``stream`` in an object header, skipping strings and comments.
+
+    Returns ``(match, resume)``: ``match`` is ``None`` if ``buf`` ends first,
+    and scanning can resume at ``resume`` once more data is appended.
+    """
+    while True:
+        match = HEADER_TOKEN.search(buf, pos)
+        if not match:
+            return None, max(pos, len(buf) - len(b'endobj'))
+        if match.group(1):
+            return match, match.start()
+        token, pos = match.group(), match.end()
+        if token == b'(':
+            end = _string_end(buf, pos)
+        elif token == b'%':
+            eol = EOL.search(buf, pos)
+            end = eol and eol.end()
+        elif buf[pos:pos + 1] == b'<':  # dictionary, not a hex string
+            end = pos + 1
+        else:
+            close = buf.find(b'>', pos)
+            end = close + 1 if close >= 0 else None
+        if end is None:
+            return None, match.start()
+        pos = end
+
+
+def _scan_object(src, offset, reader):
+    """Return ``(end_offset, header_bytes, is_stream)`` for the object starting at ``offset``."""
+    src.seek(offset)
+    buf, pos = b'', 0
+    while True:
+        # Read at least as much as is buffered, so a long string costs linear time to rescan.
+        chunk = src.read(max(SCAN_CHUNK, len(buf)))
+        if not chunk:
+            raise ValueError(f"unterminated object at offset {offset}")
+        buf += chunk
+        match, pos = _find_keyword(buf, pos)
+        if match and (match.group(1) == b'endobj' or STREAM_EOL.match(buf, match.start()).end() < len(buf)):
+            break
+    if not OBJ_HEADER.match(buf):
+        raise ValueError(f"no object header at offset {offset}")
+    header = buf[:match.start()]
+    if match.group(1) == b'endobj':
+        return offset + match.end(), header, False
+
+    data_start = offset + STREAM_EOL.match(buf, match.start()).end()
+    ref = LENGTH_REF.search(header)
+    if ref:
+        length = reader.get_object(IndirectObject(int(ref.group(1)), int(ref.group(2)), reader))
+    else:
+        direct = LENGTH_DIRECT.search(header)
+        length = direct and int(direct.group(1))
+    if isinstance(length, int):
+        src.seek(data_start + length)
+        tail = src.read(64)
+        end_stream = tail.find(b'endstream')
+        end_obj = tail.find(b'endobj', end_stream)
+        if 0 <= end_stream <= 2 and end_obj > 0:
+            return data_start + length + end_obj + len(b'endobj'), header, True
+    # Missing or wrong /Length: find endstream the slow way.
+    src.seek(data_start)
+    pos, carry = data_start, b''
+    while True:
+        chunk = src.read(COPY_BUFSIZE)
+        if not chunk:
+            raise ValueError(f"unterminated stream at offset {offset}")
+        window = carry + chunk
+        found = re.search(rb'endstream\s*endobj', window)
+        if found:
+            return pos - len(carry) + found.end(), header, True
+        carry = window[-32:]
+        pos += len(chunk)
+
+
+def _copy_range(src, dst, start, end):
+    src.seek(start)
+    remaining = end - start
+    while remaining > 0:
+        chunk = src.read(min(remaining, COPY_BUFSIZE))
+        if not chunk:
+            raise ValueError("unexpected end of file")
+        dst.write(chunk)
+        remaining -= len(chunk)
+
+
+def _write_xref_table(dst, offsets, trailer):
+    dst.write(b"xref\n0 1\n0000000000 65535 f \n")
+    nums = sorted(offsets)
+    i = 0
+    while i < len(nums):
+        j = i
+        while j + 1 < len(nums) and nums[j + 1] == nums[j] + 1:
+            j += 1
+        dst.write(f"{nums[i]} {j - i + 1}\n".encode())
+        for num in nums[i:j + 1]:
+            dst.write(f"{offsets[num]:010d} 00000 n \n".encode())
+        i = j + 1
+    dst.write(b"trailer\n")
+    trailer.write_to_stream(dst, None)
+    dst.write(b"\n")
+
+
+def _write_xref_stream(dst, offsets, compressed, trailer, xref_num):
+    """Write a cross-reference stream covering plain (type 1) and compressed (type 2) objects."""
+    xref_offset = dst.tell()
+    offsets = dict(offsets)
+    offsets[xref_num] = xref_offset
+    width = max(4, (max(list(offsets.values()) + [n for n, _ in compressed.values()]).bit_length() + 7) // 8)
+    rows = {0: (0, 0, 0xffff)}
+    rows.update((num, (1, off, 0)) for num, off in offsets.items())
+    rows.update((num, (2, stm, idx)) for num, (stm, idx) in compressed.items())
+    data = bytearray()
+    index = []
+    for num in sorted(rows):
+        if index and index[-2] + index[-1] == num:
+            index[-1] += 1
+        else:
+            index += [num, 1]
+        kind, field2, field3 = rows[num]
+        data += bytes([kind]) + field2.to_bytes(width, 'big') + field3.to_bytes(2, 'big')
+    body = zlib.compress(bytes(data))
+    trailer[NameObject('/Type')] = NameObject('/XRef')
+    trailer[NameObject('/W')] = ArrayObject([NumberObject(1), NumberObject(width), NumberObject(2)])
+    trailer[NameObject('/Index')] = ArrayObject([NumberObject(n) for n in index])
+    trailer[NameObject('/Filter')] = NameObject('/FlateDecode')
+    trailer[NameObject('/Length')] = NumberObject(len(body))
+    dst.write(f"{xref_num} 0 obj\n".encode())
+    trailer.write_to_stream(dst, None)
+    dst.write(b"\nstream\n" + body + b"\nendstream\nendobj\n")
+    return xref_offset
+
+
+def strip_pdf(input_path, output_path, keep_date=False):
+    with open(input_path, 'rb') as src:
+        with stage('parse'):
+            reader = PdfReader(src)
+            if reader.is_encrypted:
+                raise EncryptedPdfError("encrypted PDF")
+            trailer = reader.trailer
+            root_ref = trailer.raw_get('/Root')
+            info_ref = trailer.raw_get('/Info') if '/Info' in trailer else None
+            if not isinstance(root_ref, IndirectObject):
+                raise ValueError("catalog is not an indirect object")
+
+            plain = {}
+            for gen, entries in reader.xref.items():
+                for num, offset in entries.items():
+                    if not num or reader.xref_free_entry.get(gen, {}).get(num) or num in reader.xref_objStm:
+                        continue
+                    if gen:
+                        raise ValueError("objects with non-zero generation numbers")
+                    plain[num] = offset
+            compressed = dict(reader.xref_objStm)
+
+            # New versions of changed objects, written after the copied ones.
+            rewritten = {}
+            new_info = None
+            if info_ref is not None:
+                info = info_ref.get_object() or {}
+                kept = {k: info.raw_get(k) for k in INFO_DATE_KEYS if keep_date and k in info}
+                if kept:
+                    new_info = DictionaryObject({NameObject(k): v for k, v in kept.items()})
+                if isinstance(info_ref, IndirectObject):
+                    plain.pop(info_ref.idnum, None)
+                    location = compressed.pop(info_ref.idnum, None)
+                    if location:
+                        # Unpack the object stream holding /Info so the old values do not survive.
+                        stm = location[0]
+                        plain.pop(stm, None)
+                        for num, (owner, _) in list(compressed.items()):
+                            if owner == stm:
+                                del compressed[num]
+                                rewritten.setdefault(num, reader.get_object(num))
+            for num in rewritten:
+                plain.pop(num, None)
+                compressed.pop(num, None)
+
+            src.seek(0)
+            version = src.read(1024).split(b'\n', 1)[0].split(b'\r', 1)[0]
+            if not version.startswith(b'%PDF-'):
+                raise ValueError("missing PDF header")
+            next_num = max([0] + list(plain) + list(compressed) + list(rewritten)) + 1
+            if info_ref is not None and new_info is not None:
+                info_num = info_ref.idnum if isinstance(info_ref, IndirectObject) else next_num
+                next_num = max(next_num, info_num + 1)
+                rewritten[info_num] = new_info
+
+        with stage('write'), open(output_path, 'wb') as dst:
+            if compressed and version < b'%PDF-1.5':
+                version = b'%PDF-1.5'
+            dst.write(version + b'\n%\xe2\xe3\xcf\xd3\n')
+            offsets = {}
+            for num, offset in sorted(plain.items(), key=lambda item: item[1]):
+                end, header, is_stream = _scan_object(src, offset, reader)
+                if LINEARIZED.search(header) or (is_stream and XREF_TYPE.search(header)):
+                    continue
+                offsets[num] = dst.tell()
+                if is_stream and XMP_TYPE.search(header):
+                    dst.write(f"{num} 0 obj\n<< /Type /Metadata /Subtype /XML /Length {len(EMPTY_XMP)} >>\n".encode())
+                    dst.write(b"stream\n" + EMPTY_XMP + b"\nendstream\nendobj\n")
+                    continue
+                _copy_range(src, dst, offset, end)
+                dst.write(b'\n')
+            for num, obj in sorted(rewritten.items()):
+                offsets[num] = dst.tell()
+                dst.write(_serialize(num, obj))
+
+            new_trailer = DictionaryObject()
+            new_trailer[NameObject('/Root')] = IndirectObject(root_ref.idnum, 0, reader)
+            if new_info is not None:
+                new_trailer[NameObject('/Info')] = IndirectObject(info_num, 0, reader)
+            if compressed:
+                new_trailer[NameObject('/Size')] = NumberObject(next_num + 1)
+                xref_offset = _write_xref_stream(dst, offsets, compressed, new_trailer, next_num)
+            else:
+                new_trailer[NameObject('/Size')] = NumberObject(next_num)
+                xref_offset = dst.tell()
+                _write_xref_table(dst, offsets, new_trailer)
+            dst.write(f"startxref\n{xref_offset}\n%%EOF\n".encode())
+
+
+def clean_pdf(input_path, output_path, options, log):
+    try:
+        try:
+            strip_pdf(input_path, output_path, options.keep_date)
+            return
+        except EncryptedPdfError:
+            log(f"Encrypted PDF detected: {input_path}, copying without cleaning", level='warning')
+            copy_unchanged(input_path, output_path)
+            return
+        except (ValueError, PdfReadError) as e:
+            log(f"Minimal rewrite failed for {os.path.basename(input_path)} ({e}), rebuilding pages",
+                level='warning')
+        with open(input_path, 'rb') as infile:
+            reader = PdfReader(infile)
+            if reader.is_encrypted:
+                log(f"Encrypted PDF detected: {input_path}, copying without cleaning", level='warning')
+                copy_unchanged(input_path, output_path)
+                return
+            with stage('parse'):
+                writer = PdfWriter()
+                for page in reader.pages:
+                    writer.add_page(page)
+                writer.add_metadata({})
+            with stage('write'), open(output_path, "wb") as outfile:
+                writer.write(outfile)
+    except Exception as e:
+        raise Exception(f"PDF cleaning failed: {str(e)}")
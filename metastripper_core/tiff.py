@@ -0,0 +1,321 @@
+"""In-place metadata removal for TIFF and TIFF-based RAW files (CR2, NEF).
+
+The output starts as a copy of the input (a reflink where the filesystem
+supports it). After that, only IFD tables are rewritten:
+
+* metadata entries (descriptions, Make/Model, Software, dates, XMP, IPTC,
+  Photoshop resources, MakerNote, Windows XP tags) are dropped from their IFD;
+* the Exif, GPS and Interop sub-IFDs are unlinked;
+* the bytes of everything that was removed are overwritten with zeros.
+
+Strip and tile data are never read, and the strip and tile offset arrays are
+streamed in fixed-size chunks, so memory use does not depend on the pixel
+count. Both classic TIFF and BigTIFF are supported. Malformed input raises
+``ValueError``.
+"""
+import bisect
+import struct
+
+from .fileio import clone_file
+from .metrics import mark_copied, stage
+
+COPY_BUFSIZE = 1024 * 1024
+ARRAY_CHUNK = 64 * 1024  # offset/count array elements read at a time
+
+TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8, 13: 4,
+              16: 8, 17: 8, 18: 8}
+ARRAY_FORMATS = {3: 'H', 4: 'I', 13: 'I', 16: 'Q', 18: 'Q'}
+
+TAG_SUBIFDS = 0x014A
+TAG_EXIF_IFD = 0x8769
+TAG_GPS_IFD = 0x8825
+TAG_INTEROP_IFD = 0xA005
+TAG_COPYRIGHT = 0x8298
+TAG_DATETIME = 0x0132
+TAG_DATETIME_ORIGINAL = 0x9003
+TAG_DATETIME_DIGITIZED = 0x9004
+DEVICE_TAGS = {0x010F, 0x0110}  # Make, Model
+
+METADATA_TAGS = {
+    0x010D, 0x010E, 0x010F, 0x0110, 0x0131, 0x0132, 0x013B, 0x013C,  # DocumentName ... HostComputer
+    0x02BC, 0x83BB, 0x8649,  # XMP, IPTC, Photoshop image resources
+    TAG_COPYRIGHT, 0x9286, 0x927C, 0xA420,  # UserComment, MakerNote, ImageUniqueID
+    0x4746, 0x4749,  # Rating, RatingPercent
+    0x9C9B, 0x9C9C, 0x9C9D, 0x9C9E, 0x9C9F,  # XPTitle ... XPSubject
+    0xC4A5, 0xC62F, 0xC634,  # PrintIM, CameraSerialNumber, DNGPrivateData
+}
+SUB_IFD_TAGS = {TAG_EXIF_IFD, TAG_GPS_IFD, TAG_INTEROP_IFD}
+
+# (offsets tag, byte counts tag) of the image data an IFD points at.
+DATA_ARRAYS = ((0x0111, 0x0117), (0x0144, 0x0145), (0x0201, 0x0202))
+
+
+class _Entry:
+    __slots__ = ('tag', 'type', 'count', 'raw', 'value')
+
+    def __init__(self, tag, typ, count, raw, value):
+        self.tag, self.type, self.count, self.raw, self.value = tag, typ, count, raw, value
+
+
+class _Tiff:
+    """Reads IFDs from an open TIFF or BigTIFF file."""
+
+    def __init__(self, f, file_size):
+        self.f = f
+        self.file_size = file_size
+        head = self.read(0, 16 if file_size >= 16 else 8)
+        if head[:2] == b'II':
+            self.endian = '<'
+        elif head[:2] == b'MM':
+            self.endian = '>'
+        else:
+            raise ValueError("not a TIFF file")
+        (version,) = struct.unpack_from(self.endian + 'H', head, 2)
+        if version == 42:
+            self.count_format, self.offset_format, self.entry_size = 'H', 'I', 12
+            (self.first_ifd,) = struct.unpack_from(self.endian + 'I', head, 4)
+        elif version == 43 and len(head) == 16:
+            self.count_format, self.offset_format, self.entry_size = 'Q', 'Q', 20
+            (self.first_ifd,) = struct.unpack_from(self.endian + 'Q', head, 8)
+        else:
+            raise ValueError("not a TIFF file")
+        self.count_size = struct.calcsize(self.count_format)
+        self.offset_size = struct.calcsize(self.offset_format)
+
+    def read(self, offset, length):
+        if offset < 0 or offset + length > self.file_size:
+            raise ValueError("TIFF offset out of range")
+        self.f.seek(offset)
+        data = self.f.read(length)
+        if len(data) != length:
+            raise ValueError("unexpected end of file")
+        return data
+
+    def ifd(self, offset):
+        """Return ``(entries, table_length, next_offset)`` for the IFD at ``offset``."""
+        (count,) = struct.unpack(self.endian + self.count_format, self.read(offset, self.count_size))
+        table_length = self.count_size + count * self.entry_size + self.offset_size
+        table = self.read(offset, table_length)
+        entries = []
+        value_format = self.endian + self.offset_format
+        for i in range(count):
+            pos = self.count_size + i * self.entry_size
+            raw = table[pos:pos + self.entry_size]
+            if self.entry_size == 12:
+                tag, typ, n = struct.unpack_from(self.endian + 'HHI', raw)
+            else:
+                tag, typ, n = struct.unpack_from(self.endian + 'HHQ', raw)
+            entries.append(_Entry(tag, typ, n, raw, raw[-self.offset_size:]))
+        (next_offset,) = struct.unpack_from(value_format, table, table_length - self.offset_size)
+        return entries, table_length, next_offset
+
+    def value_range(self, entry):
+        """``(start, end)`` of an entry's out-of-line value, or ``None`` if it fits in the entry."""
+        length = TYPE_SIZES.get(entry.type, 0) * entry.count
+        if length <= self.offset_size:
+            return None
+        (start,) = struct.unpack(self.endian + self.offset_format, entry.value)
+        if start + length > self.file_size:
+            raise ValueError(f"value of tag {entry.tag:#06x} out of range")
+        return start, start + length
+
+    def array(self, entry):
+        """Yield the integers of an offset/count entry, reading at most ``ARRAY_CHUNK`` at a time."""
+        code = ARRAY_FORMATS.get(entry.type)
+        if code is None:
+            raise ValueError(f"unexpected type for tag {entry.tag:#06x}")
+        size = struct.calcsize(code)
+        span = self.value_range(entry)
+        if span is None:
+            yield from struct.unpack_from(f"{self.endian}{entry.count}{code}", entry.value)
+            return
+        start, end = span
+        for chunk_start in range(start, end, ARRAY_CHUNK * size):
+            n = min(ARRAY_CHUNK, (end - chunk_start) // size)
+            yield from struct.unpack(f"{self.endian}{n}{code}", self.read(chunk_start, n * size))
+
+    def pointers(self, entry):
+        if entry.type not in ARRAY_FORMATS:
+            raise ValueError(f"unexpected type for tag {entry.tag:#06x}")
+        return [offset for offset in self.array(entry) if offset]
+
+
+class _Ranges:
+    """Disjoint, sorted ``[start, end)`` ranges that support removing a sub-range."""
+
+    def __init__(self, ranges):
+        merged = []
+        for start, end in sorted(ranges):
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self.starts = [start for start, _ in merged]
+        self.items = merged
+
+    def subtract(self, start, end):
+        i = max(bisect.bisect_right(self.starts, start) - 1, 0)
+        while i < len(self.items) and self.items[i][0] < end:
+            a, b = self.items[i]
+            if b <= start:
+                i += 1
+                continue
+            pieces = [p for p in ([a, start], [end, b]) if p[0] < p[1]]
+            self.items[i:i + 1] = pieces
+            self.starts[i:i + 1] = [p[0] for p in pieces]
+            i += len(pieces)
+
+
+class _Plan:
+    """Which IFD tables to rewrite and which byte ranges to zero."""
+
+    def __init__(self, tiff, keep_copyright, keep_date, keep_device):
+        self.tiff = tiff
+        self.kept_tags = set()
+        if keep_copyright:
+            self.kept_tags.add(TAG_COPYRIGHT)
+        if keep_date:
+            self.kept_tags.add(TAG_DATETIME)
+        if keep_device:
+            self.kept_tags.update(DEVICE_TAGS)
+        self.exif_tags = {TAG_DATETIME_ORIGINAL, TAG_DATETIME_DIGITIZED} if keep_date else set()
+        self.tables = {}  # offset -> new table bytes
+        self.removed = []
+        self.kept = []
+        self.data_arrays = []
+        self.seen = set()
+
+    def _visit(self, offset):
+        if offset in self.seen:
+            raise ValueError("IFD loop")
+        self.seen.add(offset)
+        return self.tiff.ifd(offset)
+
+    def _rewrite(self, offset, table_length, entries, next_offset):
+        t = self.tiff
+        table = struct.pack(t.endian + t.count_format, len(entries)) + b''.join(e.raw for e in entries)
+        table += struct.pack(t.endian + t.offset_format, next_offset)
+        self.tables[offset] = table.ljust(table_length, b'\x00')
+        self.kept.append((offset, offset + table_length))
+
+    def _keep_value(self, entry):
+        span = self.tiff.value_range(entry)
+        if span:
+            self.kept.append(span)
+
+    def _remove_value(self, entry):
+        span = self.tiff.value_range(entry)
+        if span:
+            self.removed.append(span)
+
+    def image_chain(self, offset):
+        while offset:
+            offset = self.image_ifd(offset)
+
+    def image_ifd(self, offset):
+        entries, table_length, next_offset = self._visit(offset)
+        kept = []
+        by_tag = {e.tag: e for e in entries}
+        for e in entries:
+            if e.tag == TAG_SUBIFDS:
+                for pointer in self.tiff.pointers(e):
+                    self.image_chain(pointer)
+            elif e.tag == TAG_EXIF_IFD and self.exif_tags:
+                pointers = self.tiff.pointers(e)
+                if pointers and self.sub_ifd(pointers[0], self.exif_tags):
+                    kept.append(e)
+                continue
+            elif e.tag in SUB_IFD_TAGS:
+                for pointer in self.tiff.pointers(e):
+                    self.drop_ifd(pointer)
+                continue
+            elif e.tag in METADATA_TAGS and e.tag not in self.kept_tags:
+                self._remove_value(e)
+                continue
+            kept.append(e)
+            self._keep_value(e)
+        for offsets_tag, counts_tag in DATA_ARRAYS:
+            if offsets_tag in by_tag and counts_tag in by_tag:
+                self.data_arrays.append((by_tag[offsets_tag], by_tag[counts_tag]))
+        if len(kept) == len(entries):
+            self.kept.append((offset, offset + table_length))
+        else:
+            self._rewrite(offset, table_length, kept, next_offset)
+        return next_offset
+
+    def sub_ifd(self, offset, wanted):
+        """Keep only the ``wanted`` tags of an Exif-style sub-IFD; drop it and return False if none are left."""
+        entries, table_length, next_offset = self._visit(offset)
+        kept = [e for e in entries if e.tag in wanted]
+        if not kept:
+            self.seen.discard(offset)
+            self.drop_ifd(offset)
+            return False
+        for e in entries:
+            if e in kept:
+                self._keep_value(e)
+            elif e.tag in SUB_IFD_TAGS:
+                for pointer in self.tiff.pointers(e):
+                    self.drop_ifd(pointer)
+            else:
+                self._remove_value(e)
+        self._rewrite(offset, table_length, kept, 0)
+        return True
+
+    def drop_ifd(self, offset):
+        """Zero an unlinked sub-IFD, its values and any sub-IFDs it points to."""
+        entries, table_length, _ = self._visit(offset)
+        self.removed.append((offset, offset + table_length))
+        for e in entries:
+            if e.tag in SUB_IFD_TAGS:
+                for pointer in self.tiff.pointers(e):
+                    if pointer not in self.seen:
+                        self.drop_ifd(pointer)
+            self._remove_value(e)
+
+    def zero_ranges(self):
+        """The removed ranges, minus anything still referenced by a kept entry or image data."""
+        ranges = _Ranges(self.removed)
+        if not ranges.items:
+            return []
+        for start, end in self.kept:
+            ranges.subtract(start, end)
+        for offsets, counts in self.data_arrays:
+            for start, length in zip(self.tiff.array(offsets), self.tiff.array(counts)):
+                ranges.subtract(start, start + length)
+        return ranges.items
+
+
+def _zero(f, start, end):
+    f.seek(start)
+    block = bytes(min(end - start, COPY_BUFSIZE))
+    while start < end:
+        n = min(len(block), end - start)
+        f.write(block[:n])
+        start += n
+
+
+def strip_tiff(input_path, output_path, keep_copyright=False, keep_date=False, keep_device=False):
+    """Copy ``input_path`` and remove its metadata tags in place.
+
+    ``keep_device`` keeps Make and Model, which RAW converters need to
+    identify the camera.
+    """
+    with open(input_path, 'rb') as src:
+        src.seek(0, 2)
+        tiff = _Tiff(src, src.tell())
+        with stage('parse'):
+            plan = _Plan(tiff, keep_copyright, keep_date, keep_device)
+            plan.image_chain(tiff.first_ifd)
+            zeros = plan.zero_ranges()
+    with stage('write'):
+        clone_file(input_path, output_path)
+        if not plan.tables and not zeros:
+            mark_copied()
+            return
+        with open(output_path, 'r+b') as dst:
+            for offset, table in plan.tables.items():
+                dst.seek(offset)
+                dst.write(table)
+            for start, end in zeros:
+                _zero(dst, start, end)
@@ -0,0 +1,73 @@
+"""Video metadata removal.
+
+MP4 and MOV files are cleaned in-process by :mod:`metastripper_core.mp4`,
+without starting ffmpeg. Other containers, and MP4/MOV files that parser
+rejects, are remuxed by ffmpeg with stream copy, keeping every stream.
+ffmpeg runs are capped at ``FFMPEG_SLOTS`` at a time. Worker pools share one
+semaphore across their processes (see :func:`share_ffmpeg_slots`), so the
+cap holds for the whole batch, not per worker.
+"""
+import os
+import sys
+import shutil
+import functools
+import threading
+import subprocess
+
+from .handlers import copy_unchanged
+from .metrics import stage
+from .mp4 import strip_mp4
+
+NATIVE_EXTENSIONS = ('.mp4', '.mov')
+FFMPEG_SLOTS = os.cpu_count() or 1
+
+_ffmpeg_slots = threading.BoundedSemaphore(FFMPEG_SLOTS)
+
+
+def share_ffmpeg_slots(slots):
+    """Cap ffmpeg runs with ``slots``, a ``multiprocessing`` semaphore shared by every worker process."""
+    global _ffmpeg_slots
+    _ffmpeg_slots = slots
+
+
+@functools.lru_cache(maxsize=None)
+def ffmpeg_binary():
+    """Locate ffmpeg once per process: next to the frozen executable first, then on ``PATH``."""
+    if getattr(sys, 'frozen', False):  # Running as PyInstaller executable
+        base_path = os.path.dirname(sys.executable)
+        local_ffmpeg = os.path.join(base_path, 'ffmpeg.exe' if sys.platform == 'win32' else 'ffmpeg')
+        if os.path.exists(local_ffmpeg):
+            return local_ffmpeg
+    return shutil.which('ffmpeg')
+
+
+def remux(binary, input_path, output_path):
+    """Copy every stream of ``input_path`` into ``output_path`` without global, stream or chapter metadata."""
+    command = [binary, '-nostdin', '-hide_banner', '-loglevel', 'error', '-y', '-i', input_path,
+               '-map', '0', '-c', 'copy', '-map_metadata', '-1', '-map_chapters', '-1', output_path]
+    with _ffmpeg_slots:
+        proc = subprocess.run(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.PIPE)
+    if proc.returncode:
+        message = proc.stderr.decode(errors='replace').strip().splitlines()
+        raise RuntimeError(message[-1] if message else f"ffmpeg exited with status {proc.returncode}")
+
+
+def clean_video(input_path, output_path, options, log):
+    try:
+        if os.path.splitext(input_path)[1].lower() in NATIVE_EXTENSIONS:
+            try:
+                strip_mp4(input_path, output_path, options.keep_copyright, options.keep_date)
+                return
+            except ValueError as e:
+                log(f"Native MP4 cleaning failed for {os.path.basename(input_path)} ({e}), using ffmpeg",
+                    level='warning')
+        binary = ffmpeg_binary()
+        if binary is None:
+            log(f"ffmpeg not found, copying {input_path} without cleaning", level='warning')
+            copy_unchanged(input_path, output_path)
+            return
+        with stage('rewrite'):
+            remux(binary, input_path, output_path)
+    except Exception as e:
+        raise Exception(f"Video cleaning failed: {str(e)}")
@@ -0,0 +1,112 @@
+"""Streaming file discovery built on ``os.scandir``.
+
+:func:`iter_files` yields ``(path, stat_result)`` pairs as it walks, so the
+engine can start cleaning before the walk finishes and memory stays flat on
+huge trees. Size, extension and glob filters are applied during the walk
+using the ``DirEntry`` stat, which the engine then reuses instead of calling
+``stat`` again.
+"""
+import os
+import fnmatch
+
+SYMLINK_POLICIES = ('skip', 'files', 'follow')
+
+
+def _matches(patterns, name, rel):
+    return any(fnmatch.fnmatch(name, p) or fnmatch.fnmatch(rel, p) for p in patterns)
+
+
+def _too_big(path, st, size_limit, log):
+    if size_limit > 0:
+        size_mb = st.st_size / (1024 * 1024)
+        if size_mb > size_limit:
+            log(f"Skipping {path}: Size {size_mb:.2f} MB exceeds limit", level='warning')
+            return True
+    return False
+
+
+def _walk(root, include, exclude, symlinks, size_limit, extensions, skip_dirs, log):
+    follow_dirs = symlinks == 'follow'
+    seen = set()
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        if follow_dirs:
+            try:
+                st = os.stat(directory)
+            except OSError:
+                continue
+            if (st.st_dev, st.st_ino) in seen:  # symlink loop
+                continue
+            seen.add((st.st_dev, st.st_ino))
+        try:
+            # Snapshot each directory before yielding from it, so outputs written
+            # next to their inputs are never picked up by the same walk.
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError as e:
+            log(f"Cannot read folder {directory}: {e.strerror}", level='warning')
+            continue
+
+        subdirs = []
+        for entry in entries:
+            rel = os.path.relpath(entry.path, root).replace(os.sep, '/')
+            try:
+                is_link = entry.is_symlink()
+                if entry.is_dir(follow_symlinks=follow_dirs):
+                    if (is_link and not follow_dirs) or _matches(exclude, entry.name, rel):
+                        continue
+                    if os.path.abspath(entry.path) in skip_dirs:
+                        continue
+                    subdirs.append(entry.path)
+                    continue
+                if is_link and symlinks == 'skip':
+                    continue
+                if not entry.is_file():
+                    continue  # sockets, devices, broken links
+                if extensions is not None and os.path.splitext(entry.name)[1].lower() not in extensions:
+                    continue
+                if _matches(exclude, entry.name, rel) or (include and not _matches(include, entry.name, rel)):
+                    continue
+                st = entry.stat()
+            except OSError as e:
+                log(f"Cannot read {entry.path}: {e.strerror}", level='warning')
+                continue
+            if _too_big(entry.path, st, size_limit, log):
+                continue
+            yield entry.path, st
+        stack.extend(reversed(subdirs))
+
+
+def iter_files(paths, recursive=False, include=(), exclude=(), symlinks='files', size_limit=0,
+               extensions=None, skip_dirs=(), log=None):
+    """Yield ``(path, stat_result)`` for every file to clean under ``paths``.
+
+    Folders are only walked when ``recursive``; otherwise they are logged as
+    skipped. ``include``/``exclude`` are glob
+    patterns matched against the file name and the path relative to the walked
+    folder; excluded folders are pruned. ``symlinks`` is ``'skip'`` (ignore
+    links), ``'files'`` (follow links to files only) or ``'follow'`` (follow
+    everything, with loop protection). ``extensions`` limits walked files to
+    those suffixes. Explicitly listed files bypass the glob and extension
+    filters; missing ones are yielded with a ``None`` stat so the caller can
+    report them.
+    """
+    if symlinks not in SYMLINK_POLICIES:
+        raise ValueError(f"symlinks must be one of {', '.join(SYMLINK_POLICIES)}")
+    log = log or (lambda message, level='info': None)
+    skip_dirs = {os.path.abspath(d) for d in skip_dirs if d}
+    for path in paths:
+        if os.path.isdir(path):
+            if recursive:
+                yield from _walk(path, include, exclude, symlinks, size_limit, extensions, skip_dirs, log)
+            else:
+                log(f"Skipping folder {path}: enable recursive mode to clean folders", level='warning')
+            continue
+        try:
+            st = os.stat(path)
+        except OSError:
+            yield path, None
+            continue
+        if not _too_big(path, st, size_limit, log):
+            yield path, st
@@ -0,0 +1,120 @@
+"""Zip helpers shared by the package-based cleaners (OOXML, ODF, archives).
+
+:func:`copy_raw` moves an entry's already-compressed bytes from one archive to
+another without inflating and re-deflating them. The standard library has no
+public API for that, so it writes the local header itself and then registers
+the entry with the output ``ZipFile`` the same way ``ZipFile.write`` does.
+Should a Python version drop the ``ZipFile`` internals this relies on
+(``RAW_COPY_ATTRIBUTES``), entries are streamed through ``ZipFile.open``
+instead: slower, but still correct.
+"""
+import shutil
+import struct
+import zipfile
+
+COPY_BUFSIZE = 1024 * 1024
+ZIP64_EXTRA_ID = 0x0001
+DATA_DESCRIPTOR_FLAG = 0x08
+ENCRYPTED_FLAG = 0x01
+NORMALIZED_DATE = (1980, 1, 1, 0, 0, 0)
+RAW_COPY_ATTRIBUTES = ('_seekable', '_writecheck', '_didModify', 'start_dir')
+
+
+def strip_extra(extra, drop):
+    """Return ``extra`` without the fields whose header IDs are in ``drop``."""
+    out = bytearray()
+    pos = 0
+    while pos + 4 <= len(extra):
+        header_id, size = struct.unpack_from('<HH', extra, pos)
+        if header_id not in drop:
+            out += extra[pos:pos + 4 + size]
+        pos += 4 + size
+    return bytes(out)
+
+
+def clone_info(zinfo, normalize=False, keep_date=False):
+    """Return a new ``ZipInfo`` describing the same data as ``zinfo``.
+
+    With ``normalize`` the timestamp (unless ``keep_date``), permissions,
+    comment and extra fields are reset so that nothing about the original
+    packer's machine survives.
+    """
+    date_time = NORMALIZED_DATE if normalize and not keep_date else zinfo.date_time
+    info = zipfile.ZipInfo(zinfo.filename, date_time)
+    info.compress_type = zinfo.compress_type
+    info.CRC = zinfo.CRC
+    info.compress_size = zinfo.compress_size
+    info.file_size = zinfo.file_size
+    info.flag_bits = zinfo.flag_bits & ~DATA_DESCRIPTOR_FLAG
+    info.internal_attr = zinfo.internal_attr
+    if normalize:
+        info.external_attr = (0o40755 << 16 | 0x10) if zinfo.is_dir() else (0o644 << 16)
+        info.create_system = 3
+        info.extra = b''
+        info.comment = b''
+    else:
+        info.external_attr = zinfo.external_attr
+        info.create_system = zinfo.create_system
+        info.extra = strip_extra(zinfo.extra, (ZIP64_EXTRA_ID,))  # FileHeader re-adds it
+        info.comment = zinfo.comment
+    return info
+
+
+def copy_raw(zin, src, zin_info, zout, normalize=False, keep_date=False):
+    """Copy the compressed data of ``zin_info`` from the open binary file ``src`` into ``zout``.
+
+    ``src`` is a separate handle on the file behind ``zin``, which is only
+    read from when the raw copy is not available.
+    """
+    if zin_info.flag_bits & ENCRYPTED_FLAG:
+        raise ValueError(f"{zin_info.filename} is encrypted")
+    if not all(hasattr(zout, name) for name in RAW_COPY_ATTRIBUTES):
+        _recompress(zin, zin_info, zout, normalize, keep_date)
+        return
+    src.seek(zin_info.header_offset)
+    header = src.read(zipfile.sizeFileHeader)
+    if len(header) != zipfile.sizeFileHeader or header[:4] != zipfile.stringFileHeader:
+        raise zipfile.BadZipFile(f"bad local header for {zin_info.filename}")
+    name_len, extra_len = struct.unpack_from('<HH', header, 26)
+    src.seek(zin_info.header_offset + zipfile.sizeFileHeader + name_len + extra_len)
+
+    info = clone_info(zin_info, normalize, keep_date)
+    zip64 = info.file_size > zipfile.ZIP64_LIMIT or info.compress_size > zipfile.ZIP64_LIMIT
+    if zout._seekable:
+        zout.fp.seek(zout.start_dir)
+    info.header_offset = zout.fp.tell()
+    zout._writecheck(info)
+    zout._didModify = True
+    zout.fp.write(info.FileHeader(zip64))
+
+    remaining = info.compress_size
+    while remaining > 0:
+        chunk = src.read(min(remaining, COPY_BUFSIZE))
+        if not chunk:
+            raise zipfile.BadZipFile(f"truncated data for {zin_info.filename}")
+        zout.fp.write(chunk)
+        remaining -= len(chunk)
+
+    zout.start_dir = zout.fp.tell()
+    zout.filelist.append(info)
+    zout.NameToInfo[info.filename] = info
+
+
+def _output_info(zin_info, normalize=False, keep_date=False):
+    info = clone_info(zin_info, normalize, keep_date)
+    info.extra = b''
+    if info.compress_type not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+        info.compress_type = zipfile.ZIP_DEFLATED
+    return info
+
+
+def _recompress(zin, zin_info, zout, normalize, keep_date):
+    """Stream ``zin_info`` from ``zin`` into ``zout`` through the public API, inflating and deflating it."""
+    info = _output_info(zin_info, normalize, keep_date)
+    with zin.open(zin_info) as src, zout.open(info, 'w') as dst:
+        shutil.copyfileobj(src, dst, COPY_BUFSIZE)
+
+
+def write_member(zout, zin_info, data, normalize=False):
+    """Write ``data`` to ``zout`` under ``zin_info``'s name, re-compressed with its original method."""
+    zout.writestr(_output_info(zin_info, normalize), data)
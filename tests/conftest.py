@@ -0,0 +1,52 @@
+import struct
+
+import pytest
+
+from metastripper_core.engine import CleanOptions
+
+AUTHOR = 'Jane Example'
+CREATED = 3786825600  # 2024-01-01 in seconds since 1904, for MP4 timestamps
+COPYRIGHT = f'(c) {AUTHOR}'.encode()
+
+
+class Log:
+    """Collects the ``log(message, level)`` calls a handler makes."""
+
+    def __init__(self):
+        self.messages = []
+
+    def __call__(self, message, level='info'):
+        self.messages.append((level, message))
+
+    def warnings(self):
+        return [message for level, message in self.messages if level == 'warning']
+
+
+@pytest.fixture
+def log():
+    return Log()
+
+
+@pytest.fixture
+def options():
+    return CleanOptions()
+
+
+def box(kind, payload):
+    return struct.pack('>I', 8 + len(payload)) + kind + payload
+
+
+def mp4_file(mdat=b'\x01\x02\x03' * 1000):
+    """ftyp, mdat and a moov with timestamps, a track, udta tags, a location and an XMP uuid box."""
+    ilst = b''.join(box(key, box(b'data', struct.pack('>II', 1, 0) + value.encode()))
+                    for key, value in ((b'\xa9ART', AUTHOR), (b'cprt', COPYRIGHT.decode())))
+    hdlr = box(b'hdlr', b'\0' * 8 + b'mdirappl' + b'\0' * 9)
+    udta = box(b'udta', box(b'meta', b'\0' * 4 + hdlr + box(b'ilst', ilst))
+               + box(b'\xa9xyz', struct.pack('>HH', 18, 0) + b'+52.5200+013.4050/')
+               + box(b'\xa9cpy', struct.pack('>HH', len(COPYRIGHT), 0) + COPYRIGHT))
+    mvhd = box(b'mvhd', b'\0' * 4 + struct.pack('>IIII', CREATED, CREATED, 1000, 10000) + b'\0' * 80)
+    mdhd = box(b'mdhd', b'\0' * 4 + struct.pack('>IIII', CREATED, CREATED, 1000, 10000) + b'\0' * 4)
+    hdlr_soun = box(b'hdlr', b'\0' * 8 + b'soun' + b'\0' * 13)
+    trak = box(b'trak', box(b'mdia', mdhd + hdlr_soun) + box(b'udta', box(b'name', AUTHOR.encode())))
+    xmp = box(b'uuid', bytes.fromhex('BE7ACFCB97A942E89C71999491E3AFAC') + AUTHOR.encode())
+    return box(b'ftyp', b'isom\0\0\x02\0isom') + box(b'mdat', mdat) + box(b'moov', mvhd + trak + udta) + xmp
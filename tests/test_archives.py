@@ -0,0 +1,128 @@
+import io
+import struct
+import zipfile
+import zlib
+
+import py7zr
+from PIL import Image
+
+from metastripper_core.archives import clean_archive
+from metastripper_core.bench import generate_corpus
+from metastripper_core.engine import clean_file
+
+from conftest import AUTHOR
+
+
+def _jpeg():
+    exif = Image.Exif()
+    exif[0x013B] = AUTHOR  # Artist
+    buf = io.BytesIO()
+    Image.new('RGB', (16, 16), 'red').save(buf, 'JPEG', exif=exif)
+    return buf.getvalue()
+
+
+def _rar_block(kind, flags, body, data=b''):
+    header = struct.pack('<BHH', kind, flags, 7 + len(body)) + body
+    return struct.pack('<H', zlib.crc32(header) & 0xffff) + header + data
+
+
+def _rar(members):
+    """A RAR 4 archive with stored (uncompressed) members, which rarfile reads without unrar."""
+    out = b'Rar!\x1a\x07\x00' + _rar_block(0x73, 0, b'\0' * 6)
+    for name, data in members:
+        encoded = name.encode()
+        body = struct.pack('<IIBIIBBHI', len(data), len(data), 3, zlib.crc32(data), 0x50210000, 20, 0x30,
+                           len(encoded), 0o100644 << 16) + encoded
+        out += _rar_block(0x74, 0x8000, body, data)
+    return out + _rar_block(0x7b, 0x4000, b'')
+
+
+def test_zip_members_are_cleaned(tmp_path, options, log):
+    (src,) = generate_corpus(str(tmp_path / 'corpus'), count=1, size_kb=64, extensions=['.zip'])
+    dst = str(tmp_path / 'out.zip')
+    clean_archive(src, dst, options, log)
+    with zipfile.ZipFile(src) as before, zipfile.ZipFile(dst) as after:
+        assert after.testzip() is None
+        assert before.namelist() == after.namelist()
+        assert after.comment == b''
+        assert AUTHOR.encode() not in after.read('photo.jpg')
+        with zipfile.ZipFile(after.open('report.docx')) as docx:
+            assert AUTHOR.encode() not in docx.read('docProps/core.xml')
+        assert before.read('notes.txt') == after.read('notes.txt')
+        assert all(info.date_time == (1980, 1, 1, 0, 0, 0) for info in after.infolist())
+        Image.open(after.open('photo.jpg')).load()
+
+
+def test_7z_members_are_cleaned(tmp_path, options, log):
+    (src,) = generate_corpus(str(tmp_path / 'corpus'), count=1, size_kb=64, extensions=['.7z'])
+    dst = str(tmp_path / 'out.7z')
+    clean_archive(src, dst, options, log)
+    with py7zr.SevenZipFile(dst) as z:
+        z.extractall(tmp_path / 'extracted')
+    members = {p.name: p.read_bytes() for p in (tmp_path / 'extracted').iterdir()}
+    assert sorted(members) == ['notes.txt', 'photo.jpg', 'report.docx']
+    assert AUTHOR.encode() not in members['photo.jpg']
+    Image.open(io.BytesIO(members['photo.jpg'])).load()
+
+
+def test_nested_rar_is_renamed_to_zip(tmp_path, options, log):
+    src, dst = tmp_path / 'outer.zip', tmp_path / 'out.zip'
+    with zipfile.ZipFile(src, 'w') as z:
+        z.writestr('inner.rar', _rar([('photo.jpg', _jpeg())]))
+    clean_archive(str(src), str(dst), options, log)
+    with zipfile.ZipFile(dst) as outer:
+        assert outer.namelist() == ['inner.zip']
+        with zipfile.ZipFile(outer.open('inner.zip')) as inner:
+            photo = inner.read('photo.jpg')
+    assert AUTHOR.encode() not in photo
+    Image.open(io.BytesIO(photo)).load()
+
+
+def test_rar_is_repacked_as_zip(tmp_path, options, log):
+    src, dst = tmp_path / 'in.rar', tmp_path / 'out.zip'
+    src.write_bytes(_rar([('photo.jpg', _jpeg()), ('notes.txt', b'hello')]))
+    clean_archive(str(src), str(dst), options, log)
+    with zipfile.ZipFile(dst) as z:
+        assert z.read('notes.txt') == b'hello'
+        assert AUTHOR.encode() not in z.read('photo.jpg')
+
+
+def test_encrypted_zip_is_copied_with_a_warning(tmp_path, options, log):
+    src, dst = tmp_path / 'in.zip', tmp_path / 'out.zip'
+    with zipfile.ZipFile(src, 'w') as z:
+        z.writestr('secret.txt', b'data')
+    data = bytearray(src.read_bytes())
+    central = data.index(b'PK\x01\x02')
+    data[central + 8] |= 0x01  # general purpose flag: encrypted
+    src.write_bytes(data)
+    clean_archive(str(src), str(dst), options, log)
+    assert dst.read_bytes() == src.read_bytes()
+    assert any('Encrypted archive' in message for message in log.warnings())
+
+
+def test_7z_folders_are_kept(tmp_path, options, log):
+    src, dst = tmp_path / 'in.7z', tmp_path / 'out.7z'
+    (tmp_path / 'tree' / 'empty').mkdir(parents=True)
+    (tmp_path / 'tree' / 'photos').mkdir()
+    (tmp_path / 'tree' / 'photos' / 'photo.jpg').write_bytes(_jpeg())
+    with py7zr.SevenZipFile(src, 'w') as z:
+        z.write(tmp_path / 'tree' / 'empty', 'empty')
+        z.write(tmp_path / 'tree' / 'photos', 'photos')
+        z.write(tmp_path / 'tree' / 'photos' / 'photo.jpg', 'photos/photo.jpg')
+    clean_archive(str(src), str(dst), options, log)
+    with py7zr.SevenZipFile(dst) as z:
+        entries = {info.filename: info.is_directory for info in z.list()}
+        z.extractall(tmp_path / 'extracted')
+    assert entries == {'empty': True, 'photos': True, 'photos/photo.jpg': False}
+    assert (tmp_path / 'extracted' / 'empty').is_dir()
+    assert AUTHOR.encode() not in (tmp_path / 'extracted' / 'photos' / 'photo.jpg').read_bytes()
+
+
+def test_member_copied_unchanged_does_not_mark_the_archive_copied(tmp_path, options):
+    buf = io.BytesIO()
+    Image.new('RGB', (8, 8), 'red').save(buf, 'TIFF')  # nothing for the TIFF cleaner to remove
+    src = tmp_path / 'in.zip'
+    with zipfile.ZipFile(src, 'w') as z:
+        z.writestr('plain.tiff', buf.getvalue())
+        z.comment = AUTHOR.encode()
+    assert clean_file(str(src), options).status == 'cleaned'
@@ -0,0 +1,75 @@
+import struct
+from dataclasses import replace
+
+import mutagen
+import pytest
+from mutagen import id3
+from mutagen.mp4 import MP4
+
+from metastripper_core.audio import clean_audio
+from metastripper_core.bench import generate_corpus
+
+from conftest import AUTHOR, COPYRIGHT, mp4_file
+
+
+@pytest.mark.parametrize('ext', ['.mp3', '.flac', '.wav', '.opus', '.m4a'])
+def test_tags_are_removed_and_audio_still_loads(tmp_path, options, log, ext):
+    (src,) = generate_corpus(str(tmp_path / 'corpus'), count=1, size_kb=64, extensions=[ext])
+    dst = str(tmp_path / f'out{ext}')
+    clean_audio(src, dst, options, log)
+    assert not log.warnings()
+    with open(dst, 'rb') as f:
+        assert AUTHOR.encode() not in f.read()
+    audio = mutagen.File(dst)
+    assert type(audio) is type(mutagen.File(src))
+    assert not audio.tags
+
+
+def test_mp3_frames_are_copied_unchanged(tmp_path, options, log):
+    (src,) = generate_corpus(str(tmp_path / 'corpus'), count=1, size_kb=64, extensions=['.mp3'])
+    dst = str(tmp_path / 'out.mp3')
+    clean_audio(src, dst, options, log)
+    with open(src, 'rb') as f:
+        original = f.read()
+    with open(dst, 'rb') as f:
+        cleaned = f.read()
+    assert original.endswith(cleaned) and cleaned.startswith(b'\xff\xfb')
+
+
+def test_mp3_keeps_copyright_when_asked(tmp_path, options, log):
+    (src,) = generate_corpus(str(tmp_path / 'corpus'), count=1, size_kb=64, extensions=['.mp3'])
+    tags = id3.ID3(src)
+    tags.add(id3.TCOP(encoding=3, text=COPYRIGHT.decode()))
+    tags.save()
+    dst = str(tmp_path / 'out.mp3')
+    clean_audio(src, dst, replace(options, keep_copyright=True), log)
+    assert list(id3.ID3(dst).keys()) == ['TCOP']
+
+
+def test_m4a_keeps_copyright_when_asked(tmp_path, options, log):
+    src, dst = tmp_path / 'in.m4a', tmp_path / 'out.m4a'
+    src.write_bytes(mp4_file())
+    clean_audio(str(src), str(dst), replace(options, keep_copyright=True), log)
+    data = dst.read_bytes()
+    assert len(data) == src.stat().st_size
+    assert dict(MP4(dst).tags) == {'cprt': [COPYRIGHT.decode()]}
+    assert b'\xa9cpy' in data and b'\xa9xyz' not in data and b'\xa9ART' not in data
+    assert data.count(AUTHOR.encode()) == 2  # the two copyright entries only
+
+
+def test_m4a_drops_copyright_by_default(tmp_path, options, log):
+    src, dst = tmp_path / 'in.m4a', tmp_path / 'out.m4a'
+    src.write_bytes(mp4_file())
+    clean_audio(str(src), str(dst), options, log)
+    assert AUTHOR.encode() not in dst.read_bytes()
+    assert not MP4(dst).tags
+
+
+def test_unparseable_file_falls_back_to_mutagen(tmp_path, options, log):
+    (src,) = generate_corpus(str(tmp_path / 'corpus'), count=1, size_kb=64, extensions=['.mp3'])
+    with open(src, 'ab') as f:
+        f.write(b'APETAGEX' + struct.pack('<IIII', 2000, 1 << 30, 0, 0) + bytes(8))  # APE tag larger than the file
+    dst = str(tmp_path / 'out.mp3')
+    clean_audio(src, dst, options, log)
+    assert any('using mutagen' in message for message in log.warnings())
+    assert not mutagen.File(dst).tags
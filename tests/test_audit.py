@@ -0,0 +1,154 @@
+import io
+import os
+import struct
+import zipfile
+
+import pytest
+from PIL import Image
+
+from metastripper_core.audit import AuditIndex, scan_file, scan_paths
+from metastripper_core.bench import generate_corpus
+from metastripper_core.engine import clean_file
+
+from conftest import AUTHOR, box, mp4_file
+
+# Every format with both a dedicated scanner and a cleaner (RTF is scanned but copied unchanged).
+SCANNED = ['.jpg', '.png', '.webp', '.tiff', '.pdf', '.docx', '.pptx', '.xlsx', '.odt', '.ods', '.odp', '.odg',
+           '.mp3', '.flac', '.wav', '.opus', '.m4a', '.mp4', '.mov']
+
+
+def _fields(path):
+    result = scan_file(str(path))
+    assert not result.error
+    return result.fields
+
+
+def _cleaned(path, options):
+    result = clean_file(str(path), options)
+    assert result.status == 'cleaned', result.messages
+    return result.output_path
+
+
+@pytest.mark.parametrize('ext', SCANNED)
+def test_scan_finds_what_the_cleaner_removes(tmp_path, options, ext):
+    (path,) = generate_corpus(str(tmp_path), count=1, size_kb=16, extensions=[ext])
+    assert _fields(path)
+    assert _fields(_cleaned(path, options)) == []
+
+
+def _jpeg(segments, trailer=b''):
+    buf = io.BytesIO()
+    Image.new('RGB', (16, 16), 'green').save(buf, 'JPEG')
+    data = buf.getvalue()
+    return data[:2] + b''.join(struct.pack('>BBH', 0xFF, marker, len(body) + 2) + body
+                               for marker, body in segments) + data[2:] + trailer
+
+
+def test_jpeg_segments_without_known_fields_are_reported(tmp_path, options):
+    maker_note = Image.Exif()
+    maker_note.get_ifd(0x8769)[0x927C] = b'VENDOR\x00' + b'\x01' * 40
+    path = tmp_path / 'in.jpg'
+    path.write_bytes(_jpeg([(0xE1, maker_note.tobytes()), (0xE3, b'vendor block'),
+                            (0xEC, b'Ducky\x00'), (0xED, b'Photoshop 3.0\x00' + b'8BIM')], trailer=b'MOTION'))
+    keys = {key for _, key, _ in _fields(path)}
+    assert {'MakerNote', 'APP3', 'APP12', 'IPTC', 'trailer'} <= keys
+    assert _fields(_cleaned(path, options)) == []
+
+
+def test_webp_trailer_is_reported(tmp_path, options):
+    path = tmp_path / 'in.webp'
+    Image.new('RGB', (16, 16), 'red').save(path, 'WEBP', lossless=True)
+    with open(path, 'ab') as f:
+        f.write(b'appended')
+    assert _fields(path) == [('other', 'trailer', 'data after the RIFF chunk')]
+    assert _fields(_cleaned(path, options)) == []
+
+
+def test_jfif_icc_and_adobe_segments_are_not_metadata(tmp_path):
+    path = tmp_path / 'in.jpg'
+    path.write_bytes(_jpeg([(0xE2, b'ICC_PROFILE\x00\x01\x01' + b'\0' * 16), (0xEE, b'Adobe\x00' + b'\0' * 6)]))
+    assert _fields(path) == []
+
+
+def _ifd(entries, next_offset, at):
+    """A little-endian IFD at offset ``at`` with ASCII or LONG ``entries``, followed by their out-of-line values."""
+    head, values = struct.pack('<H', len(entries)), b''
+    data_at = at + 2 + 12 * len(entries) + 4
+    for tag, value in entries:
+        if isinstance(value, int):
+            head += struct.pack('<HHII', tag, 4, 1, value)
+        else:
+            head += struct.pack('<HHII', tag, 2, len(value) + 1, data_at + len(values))
+            values += value.encode() + b'\0'
+    return head + struct.pack('<I', next_offset) + values
+
+
+def test_tiff_metadata_in_subifds_and_chained_ifds_is_found(tmp_path):
+    sub_ifd = _ifd([(0x013B, AUTHOR)], 0, 100)
+    second = _ifd([(0x8298, 'Copyright holder')], 0, 200)
+    data = bytearray(b'II*\x00' + struct.pack('<I', 8) + _ifd([(0x014A, 100)], 200, 8))
+    data[len(data):100] = bytes(100 - len(data))
+    data += sub_ifd + bytes(200 - 100 - len(sub_ifd)) + second
+    path = tmp_path / 'in.tiff'
+    path.write_bytes(bytes(data))
+    assert set(_fields(path)) == {('author', 'Artist', AUTHOR), ('copyright', 'Copyright', 'Copyright holder')}
+
+
+def test_heic_items_are_found(tmp_path, options):
+    pillow_heif = pytest.importorskip('pillow_heif')
+    exif = Image.Exif()
+    exif[0x013B] = AUTHOR
+    path = tmp_path / 'in.heic'
+    pillow_heif.from_pillow(Image.new('RGB', (32, 32), 'red')).save(
+        path, exif=exif.tobytes(), xmp=f'<x:xmpmeta xmlns:x="adobe:ns:meta/">{AUTHOR}</x:xmpmeta>'.encode())
+    result = scan_file(str(path))
+    assert result.scanner == 'scan_heic'
+    assert ('author', 'Artist', AUTHOR) in result.fields
+    assert any(field == 'xmp' for field, _, _ in result.fields)
+    assert _fields(_cleaned(path, options)) == []
+
+
+def test_mp4_track_names_and_dates_are_found(tmp_path, options):
+    path = tmp_path / 'in.mp4'
+    path.write_bytes(mp4_file())
+    keys = {key for _, key, _ in _fields(path)}
+    assert {'name', 'mvhd', 'mdhd', '\xa9xyz', '\xa9ART'} <= keys
+    assert _fields(_cleaned(path, options)) == []
+
+
+def test_odf_embedded_objects_settings_and_changes_are_found(tmp_path):
+    path = tmp_path / 'in.odt'
+    office = 'xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"'
+    meta = (f'<office:document-meta {office} xmlns:dc="http://purl.org/dc/elements/1.1/"><office:meta>'
+            f'<dc:creator>{AUTHOR}</dc:creator></office:meta></office:document-meta>')
+    with zipfile.ZipFile(path, 'w') as z:
+        z.writestr('mimetype', 'application/vnd.oasis.opendocument.text')
+        z.writestr('Object 1/meta.xml', meta)
+        z.writestr('settings.xml', '<config:config-item config:name="PrinterName" config:type="string">'
+                                   'Office Laser</config:config-item>')
+        z.writestr('content.xml', f'<office:change-info><dc:creator>{AUTHOR}</dc:creator></office:change-info>')
+    assert set(_fields(path)) == {('author', 'Object 1/creator', AUTHOR), ('device', 'PrinterName', 'Office Laser'),
+                                  ('author', 'change-info', AUTHOR)}
+
+
+def test_index_queries_and_skip_policy(tmp_path):
+    paths = generate_corpus(str(tmp_path / 'corpus'), count=1, size_kb=16, extensions=['.jpg', '.txt', '.7z'])
+    index = AuditIndex(str(tmp_path / 'index.sqlite'))
+    for result in scan_paths(paths, workers=1):
+        index.add(result)
+    index.commit()
+    jpg, txt, archive = paths
+    assert index.files_with('gps') == [os.path.abspath(jpg)]
+    assert ('ExampleCam', 1) in index.values('device')
+    assert index.summary()['files']['metadata'] >= 1
+    assert not index.is_clean(jpg, os.stat(jpg))
+    assert index.is_clean(txt, os.stat(txt))
+    # The archive looks clean to hachoir, but its members carry metadata.
+    assert not index.is_clean(archive, os.stat(archive))
+    index.close()
+
+
+def test_quicktime_user_data_is_found(tmp_path):
+    path = tmp_path / 'in.mov'
+    path.write_bytes(box(b'ftyp', b'qt  \0\0\0\0') + box(b'moov', box(b'udta', box(b'\xa9nam', b'\0' * 4 + b'x'))))
+    assert _fields(path)
@@ -0,0 +1,76 @@
+import os
+import shutil
+import threading
+from dataclasses import replace
+
+from metastripper_core.bench import generate_corpus
+from metastripper_core.engine import clean_file, clean_paths
+
+
+def _cached_options(options, tmp_path):
+    return replace(options, cache_dir=str(tmp_path / 'cache'), output_dir=str(tmp_path / 'out'))
+
+
+def test_identical_content_is_served_from_the_cache(tmp_path, options):
+    options = _cached_options(options, tmp_path)
+    (first,) = generate_corpus(str(tmp_path / 'corpus'), count=1, size_kb=16, extensions=['.jpg'])
+    second = str(tmp_path / 'copy.jpg')
+    shutil.copyfile(first, second)
+
+    a = clean_file(first, options)
+    b = clean_file(second, options)
+    assert (a.status, b.status) == ('cleaned', 'cleaned')
+    assert any('Reused cached result' in message for _, message in b.messages)
+    with open(a.output_path, 'rb') as fa, open(b.output_path, 'rb') as fb:
+        assert fa.read() == fb.read()
+
+
+def test_editing_an_output_does_not_change_the_cache(tmp_path, options):
+    options = _cached_options(options, tmp_path)
+    (first,) = generate_corpus(str(tmp_path / 'corpus'), count=1, size_kb=16, extensions=['.jpg'])
+    a = clean_file(first, options)
+    with open(a.output_path, 'rb') as f:
+        cleaned = f.read()
+    with open(a.output_path, 'r+b') as f:  # edited in place, as an image editor might
+        f.write(b'edited')
+
+    second = str(tmp_path / 'copy.jpg')
+    shutil.copyfile(first, second)
+    b = clean_file(second, options)
+    assert any('Reused cached result' in message for _, message in b.messages)
+    with open(b.output_path, 'rb') as f:
+        assert f.read() == cleaned
+    assert os.stat(b.output_path).st_nlink == 1
+
+
+def test_unchanged_input_is_skipped(tmp_path, options):
+    options = _cached_options(options, tmp_path)
+    (path,) = generate_corpus(str(tmp_path / 'corpus'), count=1, size_kb=16, extensions=['.png'])
+    assert clean_file(path, options).status == 'cleaned'
+    assert clean_file(path, options).status == 'skipped'
+    assert clean_file(path, replace(options, keep_date=True)).status == 'cleaned'
+
+
+def test_cached_copy_keeps_the_copied_status(tmp_path, options):
+    options = _cached_options(options, tmp_path)
+    (first,) = generate_corpus(str(tmp_path / 'corpus'), count=1, size_kb=16, extensions=['.txt'])
+    second = str(tmp_path / 'copy.txt')
+    shutil.copyfile(first, second)
+    assert clean_file(first, options).status == 'copied'
+    b = clean_file(second, options)
+    assert b.status == 'copied' and any('Reused cached result' in message for _, message in b.messages)
+
+
+def test_batches_on_different_threads_share_the_cache(tmp_path, options):
+    options = _cached_options(options, tmp_path)
+    paths = generate_corpus(str(tmp_path / 'corpus'), count=2, size_kb=16, extensions=['.jpg'])
+    statuses = []
+
+    def batch():  # one new thread per batch, cleaning in-thread
+        statuses.append([(r.status, r.error) for r in clean_paths(paths, options, workers=1)])
+
+    for _ in range(2):
+        thread = threading.Thread(target=batch)
+        thread.start()
+        thread.join()
+    assert statuses == [[('cleaned', '')] * 2, [('skipped', '')] * 2]
@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+
+from metastripper_core.engine import clean_file
+from metastripper_core.handlers import LazyHandler, HANDLERS, get_handler
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_cli_import_loads_no_format_backend():
+    code = ("import sys, metastripper_core.cli; "
+            "print(sorted(m for m in ('PIL', 'PyPDF2', 'mutagen', 'py7zr', 'rarfile', 'odf', 'hachoir') "
+            "if m in sys.modules))")
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                         cwd=REPO).stdout
+    assert out.strip() == '[]'
+
+
+def test_dispatch_resolves_lazy_handlers():
+    assert isinstance(HANDLERS['.pdf'], LazyHandler)
+    handler = get_handler('report.PDF')
+    assert handler.__module__ == 'metastripper_core.pdf' and handler.__name__ == 'clean_pdf'
+    assert get_handler('unknown.xyz').__name__ == 'clean_generic'
+
+
+def test_unknown_types_are_copied_unchanged(tmp_path, options):
+    src = tmp_path / 'data.xyz'
+    src.write_bytes(b'\x00unknown format\xff')
+    result = clean_file(str(src), options)
+    assert result.status == 'copied'
+    with open(result.output_path, 'rb') as f:
+        assert f.read() == src.read_bytes()
@@ -0,0 +1,55 @@
+from dataclasses import replace
+
+import pillow_heif
+import pytest
+from PIL import Image
+
+from metastripper_core.images import clean_image
+
+from conftest import AUTHOR, COPYRIGHT
+
+XMP = f'<x:xmpmeta xmlns:x="adobe:ns:meta/"><dc:creator>{AUTHOR}</dc:creator></x:xmpmeta>'.encode()
+
+
+@pytest.fixture
+def heic(tmp_path):
+    exif = Image.Exif()
+    exif[0x013B] = AUTHOR  # Artist
+    exif[0x8298] = COPYRIGHT.decode()
+    exif[0x0132] = '2020:01:02 03:04:05'  # DateTime
+    path = tmp_path / 'in.heic'
+    pillow_heif.from_pillow(Image.effect_noise((64, 48), 40).convert('RGB')).save(
+        path, exif=exif.tobytes(), xmp=XMP)
+    return path
+
+
+def _decoded(path):
+    return pillow_heif.open_heif(path)
+
+
+def test_exif_and_xmp_items_are_removed(tmp_path, options, log, heic):
+    dst = tmp_path / 'out.heic'
+    clean_image(str(heic), str(dst), options, log)
+    assert not log.warnings()
+    data = dst.read_bytes()
+    assert AUTHOR.encode() not in data and len(data) == heic.stat().st_size
+    after = _decoded(dst)
+    assert not after.info.get('exif') and not after.info.get('xmp')
+    assert after.data == _decoded(heic).data
+
+
+def test_keep_date_filters_the_exif_item(tmp_path, options, log, heic):
+    dst = tmp_path / 'out.heic'
+    clean_image(str(heic), str(dst), replace(options, keep_date=True), log)
+    exif = Image.Exif()
+    exif.load(_decoded(dst).info['exif'])
+    assert dict(exif) == {0x0132: '2020:01:02 03:04:05'}
+    assert AUTHOR.encode() not in dst.read_bytes()
+
+
+def test_malformed_heic_falls_back_to_imageio(tmp_path, options, log):
+    src, dst = tmp_path / 'in.heic', tmp_path / 'out.heic'
+    Image.new('RGB', (16, 16), 'red').save(src, 'PNG')  # PNG data behind a .heic name
+    clean_image(str(src), str(dst), options, log)
+    assert any('re-encoding' in message for message in log.warnings())
+    assert dst.stat().st_size > 0
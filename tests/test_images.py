@@ -0,0 +1,120 @@
+import struct
+
+from PIL import Image, PngImagePlugin
+
+from metastripper_core.images import clean_image, strip_jpeg
+
+from conftest import AUTHOR
+
+
+def _exif():
+    exif = Image.Exif()
+    exif[0x013B] = AUTHOR  # Artist
+    exif[0x8298] = f'(c) {AUTHOR}'  # Copyright
+    exif.get_ifd(0x8825).update({1: 'N', 2: (52.0, 31.0, 12.0)})
+    return exif
+
+
+def _mpf_jpeg(path):
+    """A two-frame MPF file; the secondary frame carries its own EXIF with GPS."""
+    primary = Image.new('RGB', (64, 48), 'red')
+    secondary = Image.new('RGB', (32, 24), 'blue')
+    primary.save(path, 'MPO', save_all=True, append_images=[secondary], exif=_exif())
+
+
+def test_jpeg_drops_exif_and_comment(tmp_path, options, log):
+    src, dst = tmp_path / 'in.jpg', tmp_path / 'out.jpg'
+    Image.new('RGB', (64, 48), 'green').save(src, 'JPEG', exif=_exif(), comment=AUTHOR.encode())
+    clean_image(str(src), str(dst), options, log)
+    data = dst.read_bytes()
+    assert AUTHOR.encode() not in data and b'Exif' not in data
+    with Image.open(dst) as img:
+        assert img.size == (64, 48)
+        assert img.getpixel((10, 10)) == Image.open(src).getpixel((10, 10))
+    assert not log.warnings()
+
+
+def test_jpeg_keeps_copyright_when_asked(tmp_path):
+    src, dst = tmp_path / 'in.jpg', tmp_path / 'out.jpg'
+    Image.new('RGB', (16, 16)).save(src, 'JPEG', exif=_exif())
+    strip_jpeg(str(src), str(dst), keep_copyright=True)
+    with Image.open(dst) as img:
+        exif = img.getexif()
+    assert exif[0x8298] == f'(c) {AUTHOR}'
+    assert 0x013B not in exif and 0x8825 not in exif
+
+
+def test_jpeg_drops_mpf_secondary_images(tmp_path):
+    src, dst = tmp_path / 'in.jpg', tmp_path / 'out.jpg'
+    _mpf_jpeg(src)
+    original = src.read_bytes()
+    assert AUTHOR.encode() in original[original.index(b'\xff\xd8', 2):]  # secondary frame's EXIF
+    strip_jpeg(str(src), str(dst))
+    data = dst.read_bytes()
+    assert AUTHOR.encode() not in data
+    assert data.count(b'\xff\xd8') == 1 and data.endswith(b'\xff\xd9')
+    with Image.open(dst) as img:
+        assert img.format == 'JPEG' and img.size == (64, 48)
+        img.load()
+
+
+def test_jpeg_drops_appended_video(tmp_path):
+    src, dst = tmp_path / 'in.jpg', tmp_path / 'out.jpg'
+    Image.new('RGB', (64, 48), 'green').save(src, 'JPEG', progressive=True)
+    with open(src, 'ab') as f:
+        f.write(b'\x00\x00\x00\x18ftypmp42' + b'\xff\xd8' + AUTHOR.encode() * 8)
+    strip_jpeg(str(src), str(dst))
+    data = dst.read_bytes()
+    assert b'ftyp' not in data and AUTHOR.encode() not in data
+    with Image.open(dst) as img:
+        img.load()
+
+
+def test_truncated_jpeg_is_copied_up_to_its_end(tmp_path):
+    src, dst = tmp_path / 'in.jpg', tmp_path / 'out.jpg'
+    Image.new('RGB', (64, 48), 'green').save(src, 'JPEG')
+    src.write_bytes(src.read_bytes()[:-2])  # no EOI
+    strip_jpeg(str(src), str(dst))
+    assert dst.read_bytes() == src.read_bytes()
+
+
+def test_png_drops_text_and_exif(tmp_path, options, log):
+    info = PngImagePlugin.PngInfo()
+    info.add_text('Author', AUTHOR)
+    src, dst = tmp_path / 'in.png', tmp_path / 'out.png'
+    Image.new('RGB', (16, 16), 'red').save(src, 'PNG', pnginfo=info, exif=_exif())
+    clean_image(str(src), str(dst), options, log)
+    assert AUTHOR.encode() not in dst.read_bytes()
+    with Image.open(dst) as img:
+        assert img.getpixel((0, 0)) == (255, 0, 0)
+
+
+def test_webp_drops_exif(tmp_path, options, log):
+    src, dst = tmp_path / 'in.webp', tmp_path / 'out.webp'
+    Image.new('RGB', (16, 16), 'red').save(src, 'WEBP', lossless=True, exif=_exif())
+    clean_image(str(src), str(dst), options, log)
+    assert AUTHOR.encode() not in dst.read_bytes()
+    with Image.open(dst) as img:
+        assert img.getpixel((0, 0)) == (255, 0, 0)
+
+
+def test_webp_drops_data_after_the_riff_chunk(tmp_path, options, log):
+    src, dst = tmp_path / 'in.webp', tmp_path / 'out.webp'
+    Image.new('RGB', (16, 16), 'red').save(src, 'WEBP', lossless=True, exif=_exif())
+    with open(src, 'ab') as f:
+        f.write(b'TRAILER ' + AUTHOR.encode())  # not a chunk: would be read as one with a bogus size
+    clean_image(str(src), str(dst), options, log)
+    assert not log.warnings()
+    data = dst.read_bytes()
+    assert AUTHOR.encode() not in data and len(data) == 8 + struct.unpack_from('<I', data, 4)[0]
+    with Image.open(dst) as img:
+        assert img.getpixel((0, 0)) == (255, 0, 0)
+
+
+def test_malformed_jpeg_falls_back_to_reencoding(tmp_path, options, log):
+    src, dst = tmp_path / 'in.jpg', tmp_path / 'out.jpg'
+    Image.new('RGB', (16, 16), 'red').save(src, 'PNG')  # PNG data behind a .jpg name
+    clean_image(str(src), str(dst), options, log)
+    assert any('re-encoding' in message for message in log.warnings())
+    with Image.open(dst) as img:
+        assert img.format == 'JPEG' and img.size == (16, 16)
@@ -0,0 +1,85 @@
+import os
+import time
+from dataclasses import replace
+
+import pytest
+
+from metastripper_core import engine
+from metastripper_core.bench import generate_corpus
+from metastripper_core.engine import clean_and_checksum, clean_paths
+from metastripper_core.journal import JobJournal
+
+
+def _entries(paths):
+    return [(path, os.stat(path)) for path in paths]
+
+
+def _run(tmp_path, paths, options, workers=1):
+    journal = JobJournal(str(tmp_path / 'jobs'), 'job', options)
+    try:
+        return list(clean_paths(_entries(paths), options, workers=workers, journal=journal))
+    finally:
+        journal.close()
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    return generate_corpus(str(tmp_path / 'corpus'), count=3, size_kb=16, extensions=['.jpg'])
+
+
+def test_resume_skips_files_already_done(tmp_path, options, corpus):
+    assert {r.status for r in _run(tmp_path, corpus, options)} == {'cleaned'}
+    results = _run(tmp_path, corpus, options)
+    assert [r.status for r in results] == ['skipped'] * 3
+    assert all(r.from_journal and 'Already done' in r.messages[0][1] for r in results)
+
+
+def test_damaged_output_is_cleaned_again(tmp_path, options, corpus):
+    first = _run(tmp_path, corpus, options)
+    damaged = first[0].output_path
+    with open(damaged, 'r+b') as f:  # same size, different content
+        f.seek(100)
+        f.write(b'\0' * 16)
+    results = {r.input_path: r.status for r in _run(tmp_path, corpus, options)}
+    assert results == {corpus[0]: 'cleaned', corpus[1]: 'skipped', corpus[2]: 'skipped'}
+    # The file cleaned again is journaled as done, so the next run skips all three.
+    assert all(r.from_journal for r in _run(tmp_path, corpus, options))
+
+
+def _held(filepath, options, st=None):
+    """:func:`clean_and_checksum`, held back until the test creates ``<input>.release``."""
+    release = filepath + '.release'
+    deadline = time.monotonic() + 5
+    while not os.path.exists(release) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    result = clean_and_checksum(filepath, options, st)
+    result.messages.append(('info', 'released' if os.path.exists(release) else 'timed out'))
+    return result
+
+
+def test_skipped_files_are_reported_while_workers_are_busy(tmp_path, options, corpus, monkeypatch):
+    _run(tmp_path, corpus[1:], options)
+    monkeypatch.setattr(engine, 'clean_and_checksum', _held)  # forked workers inherit the patch
+    journal = JobJournal(str(tmp_path / 'jobs'), 'job', options)
+    results = clean_paths(_entries(corpus), options, workers=2, journal=journal)
+    assert [next(results).status, next(results).status] == ['skipped', 'skipped']
+    open(corpus[0] + '.release', 'w').close()
+    last = next(results)
+    assert last.status == 'cleaned' and last.messages[-1] == ('info', 'released')
+    assert not list(results)
+    journal.close()
+
+
+def test_torn_last_record_is_cut_off(tmp_path, options, corpus):
+    _run(tmp_path, corpus, options)
+    path = tmp_path / 'jobs' / 'job.journal'
+    with open(path, 'ab') as f:
+        f.write(b'{"path":"/half')
+    assert [r.status for r in _run(tmp_path, corpus, options)] == ['skipped'] * 3
+    assert path.read_bytes().endswith(b'}\n')
+
+
+def test_resuming_with_other_options_is_refused(tmp_path, options, corpus):
+    _run(tmp_path, corpus, options)
+    with pytest.raises(ValueError, match='different options'):
+        JobJournal(str(tmp_path / 'jobs'), 'job', replace(options, keep_date=True))
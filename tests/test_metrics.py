@@ -0,0 +1,88 @@
+import json
+import os
+import re
+import time
+from dataclasses import replace
+
+from metastripper_core.bench import generate_corpus
+from metastripper_core.engine import CleanResult, clean_file
+from metastripper_core.metrics import EventLog, MetricsExporter, StageRecorder, mark_copied, stage
+
+SAMPLE = re.compile(r'^[a-z_]+(\{[a-z]+="[^"]*"(,[a-z]+="[^"]*")*\})? [0-9.e+-]+$')
+
+
+def _result(handler='strip_jpeg', status='cleaned', elapsed=0.02, **stages):
+    return CleanResult('/in.jpg', '/in_cleaned.jpg', status=status, elapsed=elapsed, handler=handler,
+                       stages=stages, bytes_read=100, bytes_written=60)
+
+
+def test_recorder_adds_up_repeated_stages_and_books_the_rest_as_rewrite():
+    recorder = StageRecorder()
+
+    def handler():
+        with stage('parse'):
+            time.sleep(0.01)
+        with stage('parse'):
+            time.sleep(0.01)
+        time.sleep(0.02)
+        mark_copied()
+
+    with recorder.active():
+        recorder.run_handler(handler)
+    assert recorder.copied
+    assert 0.02 <= recorder.stages['parse'] < 0.04
+    assert recorder.stages['rewrite'] >= 0.02
+    with stage('parse'):  # no recorder active: nothing to book
+        pass
+    mark_copied()
+    assert set(recorder.stages) == {'parse', 'rewrite'}
+
+
+def test_cache_work_is_booked_under_cache(tmp_path, options):
+    (path,) = generate_corpus(str(tmp_path / 'corpus'), count=1, size_kb=16, extensions=['.jpg'])
+    options = replace(options, cache_dir=str(tmp_path / 'cache'), output_dir=str(tmp_path / 'out'))
+    first = clean_file(path, options)
+    os.remove(first.output_path)
+    second = clean_file(path, options)  # the output is gone, so it comes from the object store
+    assert 'Reused cached result' in second.messages[-1][1]
+    assert 'move' not in second.stages and second.stages['cache'] > 0
+
+
+def test_event_log_writes_one_json_object_per_file(tmp_path):
+    path = tmp_path / 'events.jsonl'
+    events = EventLog(str(path))
+    events.observe(_result(parse=0.001, rewrite=0.002))
+    events.observe(_result(status='failed'))
+    events.close()
+    lines = path.read_text().splitlines()
+    assert len(lines) == 2
+    event = json.loads(lines[0])
+    assert set(event) == {'time', 'path', 'output', 'handler', 'status', 'error', 'elapsed', 'stages',
+                          'bytes_read', 'bytes_written'}
+    assert event['stages'] == {'parse': 0.001, 'rewrite': 0.002}
+    assert json.loads(lines[1])['status'] == 'failed'
+
+
+def test_exporter_writes_prometheus_text(tmp_path):
+    path = tmp_path / 'metrics.prom'
+    exporter = MetricsExporter(str(path))
+    exporter.observe(_result(elapsed=0.002, parse=0.5))
+    exporter.observe(_result(elapsed=2.0, parse=0.25))
+    exporter.observe(_result(handler='', status='skipped'))
+    exporter.close()
+    text = path.read_text()
+    lines = text.splitlines()
+    assert '# EOF' not in text
+    for line in lines:
+        assert line.startswith(('# HELP ', '# TYPE ')) or SAMPLE.match(line), line
+    typed = {line.split()[2] for line in lines if line.startswith('# TYPE')}
+    samples = {re.split(r'[{ ]', line)[0] for line in lines if not line.startswith('#')}
+    assert samples - typed == {'metastripper_file_seconds_bucket', 'metastripper_file_seconds_sum',
+                               'metastripper_file_seconds_count'}
+    assert 'metastripper_files_total{handler="strip_jpeg",status="cleaned"} 2' in lines
+    assert 'metastripper_files_total{handler="none",status="skipped"} 1' in lines
+    assert 'metastripper_stage_seconds_total{handler="strip_jpeg",stage="parse"} 0.750000' in lines
+    assert 'metastripper_bytes_total{handler="strip_jpeg",direction="written"} 120' in lines
+    assert 'metastripper_file_seconds_bucket{handler="strip_jpeg",le="0.005"} 1' in lines
+    assert 'metastripper_file_seconds_bucket{handler="strip_jpeg",le="+Inf"} 2' in lines
+    assert 'metastripper_file_seconds_count{handler="strip_jpeg"} 2' in lines
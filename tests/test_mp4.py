@@ -0,0 +1,43 @@
+import struct
+
+from metastripper_core import video
+from metastripper_core.mp4 import strip_mp4
+from metastripper_core.video import clean_video
+
+from conftest import AUTHOR, CREATED, mp4_file
+
+
+def _times(data, kind):
+    pos = data.index(kind) + 8  # past type, version and flags
+    return struct.unpack_from('>II', data, pos)
+
+
+def test_metadata_boxes_are_blanked_in_place(tmp_path, options, log):
+    src, dst = tmp_path / 'in.mp4', tmp_path / 'out.mp4'
+    src.write_bytes(mp4_file())
+    clean_video(str(src), str(dst), options, log)
+    before, after = src.read_bytes(), dst.read_bytes()
+    assert len(after) == len(before)
+    assert AUTHOR.encode() not in after and b'\xa9xyz' not in after
+    mdat = before.index(b'mdat')
+    assert after[mdat - 4:mdat + 3004] == before[mdat - 4:mdat + 3004]
+    assert _times(after, b'mvhd') == (0, 0) and _times(after, b'mdhd') == (0, 0)
+    assert not log.warnings()
+
+
+def test_keep_date_keeps_timestamps(tmp_path):
+    src, dst = tmp_path / 'in.mov', tmp_path / 'out.mov'
+    src.write_bytes(mp4_file())
+    strip_mp4(str(src), str(dst), keep_date=True)
+    assert _times(dst.read_bytes(), b'mvhd') == (CREATED, CREATED)
+
+
+def test_malformed_file_falls_back_to_ffmpeg_or_copy(tmp_path, options, log, monkeypatch):
+    monkeypatch.setattr(video, 'ffmpeg_binary', lambda: None)
+    src, dst = tmp_path / 'in.mp4', tmp_path / 'out.mp4'
+    src.write_bytes(b'\0\0\0\x10junkjunkjunkjunk')
+    clean_video(str(src), str(dst), options, log)
+    assert dst.read_bytes() == src.read_bytes()
+    warnings = log.warnings()
+    assert any('using ffmpeg' in message for message in warnings)
+    assert any('ffmpeg not found' in message for message in warnings)
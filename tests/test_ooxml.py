@@ -0,0 +1,53 @@
+import zipfile
+from dataclasses import replace
+
+from metastripper_core.bench import generate_corpus
+from metastripper_core.handlers import clean_docx, clean_excel
+
+from conftest import AUTHOR
+
+
+def _sample(tmp_path, ext):
+    (path,) = generate_corpus(str(tmp_path / 'corpus'), count=1, size_kb=32, extensions=[ext])
+    return path
+
+
+def test_docx_rewrites_only_property_parts(tmp_path, options, log):
+    src, dst = _sample(tmp_path, '.docx'), str(tmp_path / 'out.docx')
+    clean_docx(src, dst, options, log)
+    with zipfile.ZipFile(src) as before, zipfile.ZipFile(dst) as after:
+        assert after.testzip() is None
+        assert before.namelist() == after.namelist()
+        core, app = after.read('docProps/core.xml'), after.read('docProps/app.xml')
+        assert AUTHOR.encode() not in core and b'created' not in core
+        assert b'Example Corp' not in app and AUTHOR.encode() not in app
+        for name in ('word/document.xml', 'word/media/payload.bin'):
+            assert before.read(name) == after.read(name)
+            assert before.getinfo(name).compress_size == after.getinfo(name).compress_size
+
+
+def test_docx_keeps_dates_when_asked(tmp_path, options, log):
+    src, dst = _sample(tmp_path, '.docx'), str(tmp_path / 'out.docx')
+    clean_docx(src, dst, replace(options, keep_date=True), log)
+    with zipfile.ZipFile(dst) as z:
+        core = z.read('docProps/core.xml')
+    assert b'2020-01-02T03:04:05Z' in core and AUTHOR.encode() not in core
+
+
+def test_docx_review_data_is_stripped_only_when_asked(tmp_path, options, log):
+    src = _sample(tmp_path, '.docx')
+    kept, stripped = str(tmp_path / 'kept.docx'), str(tmp_path / 'stripped.docx')
+    clean_docx(src, kept, options, log)
+    clean_docx(src, stripped, replace(options, strip_review_data=True), log)
+    with zipfile.ZipFile(kept) as z:
+        assert b'w:rsidR=' in z.read('word/document.xml')
+    with zipfile.ZipFile(stripped) as z:
+        assert b'w:rsid' not in z.read('word/document.xml')
+
+
+def test_corrupt_xlsx_is_copied_with_a_warning(tmp_path, options, log):
+    src, dst = tmp_path / 'broken.xlsx', tmp_path / 'out.xlsx'
+    src.write_bytes(b'PK\x03\x04 not really a zip')
+    clean_excel(str(src), str(dst), options, log)
+    assert dst.read_bytes() == src.read_bytes()
+    assert log.warnings()
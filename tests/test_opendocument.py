@@ -0,0 +1,117 @@
+import os
+import subprocess
+import sys
+import zipfile
+from dataclasses import replace
+
+import pytest
+
+from metastripper_core.bench import generate_corpus
+from metastripper_core.opendocument import clean_odf
+
+from conftest import AUTHOR
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHANGE = (f'<text:changed-region text:id="c1"><text:insertion><office:change-info><dc:creator>{AUTHOR}'
+          '</dc:creator><dc:date>2020-01-02T03:04:05</dc:date></office:change-info></text:insertion>'
+          '</text:changed-region>')
+NOTE = (f'<office:annotation><dc:creator>{AUTHOR}</dc:creator><meta:creator-initials>JE</meta:creator-initials>'
+        '<text:p>check this</text:p></office:annotation>')
+SETTINGS = ('<office:document-settings><config:config-item config:name="PrinterName" config:type="string">'
+            f'{AUTHOR} office printer</config:config-item></office:document-settings>')
+
+
+def _sample(tmp_path, ext, corpus='corpus'):
+    (path,) = generate_corpus(str(tmp_path / corpus), count=1, size_kb=16, extensions=[ext])
+    return path
+
+
+def _with_review_data(src, dst):
+    """Copy of the package at ``src`` with a tracked change, a comment and printer settings added."""
+    with zipfile.ZipFile(src) as zin, zipfile.ZipFile(dst, 'w') as zout:
+        for info in zin.infolist():
+            data = zin.read(info)
+            if info.filename == 'content.xml':
+                data = data.replace(b'<office:text>', b'<office:text>' + (CHANGE + NOTE).encode())
+            zout.writestr(info, data)
+        zout.writestr('settings.xml', SETTINGS)
+
+
+@pytest.mark.parametrize('ext', ['.odt', '.ods', '.odp', '.odg'])
+def test_meta_is_cleaned_and_other_parts_are_copied(tmp_path, options, log, ext):
+    src, dst = _sample(tmp_path, ext), str(tmp_path / f'out{ext}')
+    clean_odf(src, dst, options, log)
+    assert not log.warnings()
+    with zipfile.ZipFile(src) as before, zipfile.ZipFile(dst) as after:
+        assert after.testzip() is None
+        first = after.infolist()[0]
+        assert first.filename == 'mimetype' and first.compress_type == zipfile.ZIP_STORED
+        meta = after.read('meta.xml')
+        assert AUTHOR.encode() not in meta and b'Quarterly report' not in meta
+        for name in ('content.xml', 'styles.xml', 'META-INF/manifest.xml'):
+            assert before.read(name) == after.read(name)
+
+
+def test_keep_date_keeps_only_the_dates(tmp_path, options, log):
+    src, dst = _sample(tmp_path, '.odt'), str(tmp_path / 'out.odt')
+    clean_odf(src, dst, replace(options, keep_date=True), log)
+    with zipfile.ZipFile(dst) as z:
+        meta = z.read('meta.xml')
+    assert b'2020-01-02T03:04:05' in meta and b'2020-01-03T03:04:05' in meta and AUTHOR.encode() not in meta
+
+
+def test_change_authors_and_settings_are_blanked(tmp_path, options, log):
+    src, dst = str(tmp_path / 'review.odt'), str(tmp_path / 'out.odt')
+    _with_review_data(_sample(tmp_path, '.odt'), src)
+    clean_odf(src, dst, options, log)
+    with zipfile.ZipFile(dst) as z:
+        content, settings = z.read('content.xml'), z.read('settings.xml')
+    assert b'<office:change-info><dc:creator></dc:creator>' in content
+    assert content.count(AUTHOR.encode()) == 1  # the comment author, kept without strip_review_data
+    assert AUTHOR.encode() not in settings and b'config:name="PrinterName"' in settings
+    clean_odf(src, dst, replace(options, strip_review_data=True), log)
+    with zipfile.ZipFile(dst) as z:
+        content = z.read('content.xml')
+    assert AUTHOR.encode() not in content and b'<meta:creator-initials></meta:creator-initials>' in content
+
+
+def test_embedded_objects_meta_is_cleaned(tmp_path, options, log):
+    src, dst = str(tmp_path / 'embedded.odt'), str(tmp_path / 'out.odt')
+    entry = '<manifest:file-entry manifest:full-path="Object 1/" manifest:media-type="{}"/></manifest:manifest>'
+    with zipfile.ZipFile(_sample(tmp_path, '.odt')) as zin, zipfile.ZipFile(src, 'w') as zout:
+        for info in zin.infolist():
+            data = zin.read(info)
+            if info.filename == 'META-INF/manifest.xml':
+                data = data.replace(b'</manifest:manifest>', entry.format(
+                    'application/vnd.oasis.opendocument.formula').encode())
+            zout.writestr(info, data)
+        zout.writestr('Object 1/meta.xml', zin.read('meta.xml'))
+        zout.writestr('Object 1/content.xml', '<math/>')
+    clean_odf(src, dst, options, log)
+    with zipfile.ZipFile(dst) as z:
+        assert AUTHOR.encode() not in z.read('Object 1/meta.xml')
+        assert z.read('Object 1/content.xml') == b'<math/>'
+
+
+def test_encrypted_package_is_copied_with_a_warning(tmp_path, options, log):
+    src, dst = tmp_path / 'secret.odt', tmp_path / 'out.odt'
+    with zipfile.ZipFile(src, 'w') as z:
+        z.writestr('mimetype', 'application/vnd.oasis.opendocument.text')
+        z.writestr('META-INF/manifest.xml', '<manifest:encryption-data/>')
+        z.writestr('meta.xml', f'<office:document-meta>{AUTHOR}</office:document-meta>')
+    clean_odf(str(src), str(dst), options, log)
+    assert any('Encrypted OpenDocument' in message for message in log.warnings())
+    assert dst.read_bytes() == src.read_bytes()
+
+
+def test_generated_packages_do_not_depend_on_earlier_ones(tmp_path):
+    exts = ['.odt', '.ods', '.odp', '.odg']
+    generate_corpus(str(tmp_path / 'warm-up'), count=1, size_kb=16, extensions=exts)
+    here = generate_corpus(str(tmp_path / 'here'), count=1, size_kb=16, extensions=exts[::-1])
+    code = ("from metastripper_core.bench import generate_corpus; "
+            f"generate_corpus({str(tmp_path / 'fresh')!r}, 1, 16, extensions={exts!r})")
+    subprocess.run([sys.executable, '-c', code], check=True, cwd=REPO)
+    for path in here:
+        with open(path, 'rb') as f, open(tmp_path / 'fresh' / os.path.basename(path), 'rb') as fresh:
+            assert f.read() == fresh.read(), path
@@ -0,0 +1,91 @@
+from PyPDF2 import PdfReader
+
+from metastripper_core.bench import generate_corpus
+from metastripper_core.pdf import clean_pdf, strip_pdf
+
+from conftest import AUTHOR
+
+CONTENT = b'BT /F1 12 Tf 72 720 Td (Hello) Tj ET'
+XMP = f'<x:xmpmeta xmlns:x="adobe:ns:meta/"><dc:creator>{AUTHOR}</dc:creator></x:xmpmeta>'.encode()
+
+
+def _pdf(page_extra=b'', prefix=b''):
+    """A small hand-written PDF with an /Info dictionary, an XMP stream and ``page_extra`` in the page."""
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R /Metadata 6 0 R >>',
+        b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R' + page_extra + b' >>',
+        b'<< /Length %d >>\nstream\n%s\nendstream' % (len(CONTENT), CONTENT),
+        b'<< /Author (' + AUTHOR.encode() + b') /CreationDate (D:20200102030405Z) >>',
+        b'<< /Type /Metadata /Subtype /XML /Length %d >>\nstream\n%s\nendstream' % (len(XMP), XMP),
+    ]
+    out = bytearray(prefix + b'%PDF-1.4\n')
+    offsets = []
+    for num, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n%s\nendobj\n' % (num, body)
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += b'trailer\n<< /Size %d /Root 1 0 R /Info 5 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def _check_clean(path):
+    reader = PdfReader(path)
+    assert AUTHOR.encode() not in open(path, 'rb').read()
+    assert not reader.metadata or '/Author' not in reader.metadata
+    assert reader.pages[0].get_contents().get_data() == CONTENT
+    return reader
+
+
+def test_info_and_xmp_are_removed(tmp_path):
+    src, dst = tmp_path / 'in.pdf', tmp_path / 'out.pdf'
+    src.write_bytes(_pdf())
+    strip_pdf(str(src), str(dst))
+    reader = _check_clean(str(dst))
+    assert reader.trailer['/Root']['/Metadata'].get_object().get_data().startswith(b'<?xpacket')
+
+
+def test_keep_date_keeps_only_the_dates(tmp_path):
+    src, dst = tmp_path / 'in.pdf', tmp_path / 'out.pdf'
+    src.write_bytes(_pdf())
+    strip_pdf(str(src), str(dst), keep_date=True)
+    assert dict(_check_clean(str(dst)).metadata) == {'/CreationDate': 'D:20200102030405Z'}
+
+
+def test_keywords_inside_strings_and_comments_are_not_object_ends(tmp_path):
+    src, dst = tmp_path / 'in.pdf', tmp_path / 'out.pdf'
+    page_extra = (b' /Note (a stream\nof words, then endobj \\) and (nested endobj)) /Hex <656e646f626a>'
+                  b' % endobj stream in a comment\n /Next (stream)')
+    src.write_bytes(_pdf(page_extra))
+    strip_pdf(str(src), str(dst))  # no fallback: the minimal rewrite itself must succeed
+    assert dst.read_bytes().count(b'4 0 obj') == 1  # the page object was not cut short and overrun
+    page = _check_clean(str(dst)).pages[0]
+    assert page['/Note'] == 'a stream\nof words, then endobj ) and (nested endobj)'
+    assert page['/Hex'] == 'endobj' and page['/Next'] == 'stream'
+
+
+def test_long_string_spanning_many_reads(tmp_path):
+    src, dst = tmp_path / 'in.pdf', tmp_path / 'out.pdf'
+    src.write_bytes(_pdf(b' /Note (' + b'endobj ' * 20000 + b')'))
+    strip_pdf(str(src), str(dst))
+    assert _check_clean(str(dst)).pages[0]['/Note'].startswith('endobj endobj')
+
+
+def test_rejected_file_falls_back_to_rebuilding_pages(tmp_path, options, log):
+    src, dst = tmp_path / 'in.pdf', tmp_path / 'out.pdf'
+    src.write_bytes(_pdf(prefix=b'junk before the header\n'))
+    clean_pdf(str(src), str(dst), options, log)
+    assert any('rebuilding pages' in message for message in log.warnings())
+    _check_clean(str(dst))
+
+
+def test_generated_pdf_is_cleaned_without_fallback(tmp_path, options, log):
+    (src,) = generate_corpus(str(tmp_path / 'corpus'), count=1, size_kb=64, extensions=['.pdf'])
+    dst = str(tmp_path / 'out.pdf')
+    clean_pdf(src, dst, options, log)
+    assert not log.warnings()
+    reader = PdfReader(dst)
+    assert AUTHOR.encode() not in open(dst, 'rb').read()
+    assert len(reader.pages) == len(PdfReader(src).pages)
@@ -0,0 +1,38 @@
+from dataclasses import replace
+
+from PIL import Image
+
+from metastripper_core.bench import generate_corpus
+from metastripper_core.images import clean_image
+
+from conftest import AUTHOR, COPYRIGHT
+
+
+def test_metadata_is_removed_and_pixels_are_unchanged(tmp_path, options, log):
+    (src,) = generate_corpus(str(tmp_path / 'corpus'), count=1, size_kb=64, extensions=['.tiff'])
+    dst = str(tmp_path / 'out.tiff')
+    clean_image(src, dst, options, log)
+    assert not log.warnings()
+    assert AUTHOR.encode() not in open(dst, 'rb').read()
+    with Image.open(src) as before, Image.open(dst) as after:
+        exif = after.getexif()
+        assert not {0x010F, 0x0110, 0x013B, 0x8298, 0x0132, 0x8825} & set(exif)  # Make ... GPS
+        assert after.tobytes() == before.tobytes()
+
+
+def test_keep_copyright_keeps_only_the_copyright(tmp_path, options, log):
+    (src,) = generate_corpus(str(tmp_path / 'corpus'), count=1, size_kb=64, extensions=['.tiff'])
+    dst = str(tmp_path / 'out.tiff')
+    clean_image(src, dst, replace(options, keep_copyright=True), log)
+    with Image.open(dst) as img:
+        exif = img.getexif()
+        assert exif[0x8298] == COPYRIGHT.decode() and 0x013B not in exif and not exif.get_ifd(0x8825)
+
+
+def test_malformed_tiff_falls_back_to_reencoding(tmp_path, options, log):
+    src, dst = tmp_path / 'in.tif', tmp_path / 'out.tif'
+    Image.new('RGB', (16, 16), 'red').save(src, 'PNG')  # PNG data behind a .tif name
+    clean_image(str(src), str(dst), options, log)
+    assert any('re-encoding' in message for message in log.warnings())
+    with Image.open(dst) as img:
+        assert img.format == 'TIFF' and img.size == (16, 16)
@@ -0,0 +1,36 @@
+import json
+import multiprocessing.synchronize
+import shutil
+import subprocess
+
+import pytest
+
+from metastripper_core import video
+from metastripper_core.engine import run_parallel
+from metastripper_core.video import clean_video
+
+FFMPEG = shutil.which('ffmpeg')
+FFPROBE = shutil.which('ffprobe')
+
+
+def _slots_kind(path, st=None):
+    return isinstance(video._ffmpeg_slots, multiprocessing.synchronize.BoundedSemaphore)
+
+
+def test_worker_processes_share_the_ffmpeg_slots():
+    assert list(run_parallel(_slots_kind, ['a', 'b', 'c'], workers=2)) == [True] * 3
+
+
+@pytest.mark.skipif(not (FFMPEG and FFPROBE), reason='ffmpeg not installed')
+def test_remux_keeps_every_stream(tmp_path, options, log):
+    src, dst = tmp_path / 'in.mkv', tmp_path / 'out.mkv'
+    subprocess.run([FFMPEG, '-v', 'error', '-f', 'lavfi', '-i', 'testsrc=duration=1:size=64x48',
+                    '-f', 'lavfi', '-i', 'sine=duration=1', '-f', 'lavfi', '-i', 'sine=duration=1:frequency=880',
+                    '-map', '0', '-map', '1', '-map', '2', '-c:v', 'mpeg4', '-c:a', 'pcm_s16le',
+                    '-metadata', 'artist=Jane Example', str(src)], check=True)
+    clean_video(str(src), str(dst), options, log)
+    probe = subprocess.run([FFPROBE, '-v', 'error', '-show_streams', '-show_format', '-of', 'json', str(dst)],
+                           capture_output=True, check=True)
+    info = json.loads(probe.stdout)
+    assert [s['codec_type'] for s in info['streams']] == ['video', 'audio', 'audio']
+    assert 'artist' not in {k.lower() for k in info['format'].get('tags', {})}
@@ -0,0 +1,95 @@
+import os
+
+import pytest
+
+from metastripper_core.walker import iter_files
+
+
+def _touch(path, data=b'x'):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return path
+
+
+def _walk(root, log=None, **kwargs):
+    return sorted(os.path.relpath(path, root) for path, _ in iter_files([str(root)], recursive=True, log=log,
+                                                                       **kwargs))
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / 'tree'
+    for name in ('a.jpg', 'b.pdf', 'docs/c.docx', 'docs/drafts/d.jpg', 'cache/e.jpg'):
+        _touch(root / name)
+    return root
+
+
+def test_walk_yields_files_with_their_stat(tree):
+    files = dict(iter_files([str(tree)], recursive=True))
+    assert sorted(os.path.relpath(p, tree) for p in files) == [
+        'a.jpg', 'b.pdf', 'cache/e.jpg', 'docs/c.docx', 'docs/drafts/d.jpg']
+    assert all(st.st_size == 1 for st in files.values())
+
+
+def test_include_and_exclude_match_names_and_relative_paths(tree):
+    assert _walk(tree, include=['*.jpg']) == ['a.jpg', 'cache/e.jpg', 'docs/drafts/d.jpg']
+    assert _walk(tree, include=['docs/*']) == ['docs/c.docx', 'docs/drafts/d.jpg']
+    assert _walk(tree, exclude=['*.jpg']) == ['b.pdf', 'docs/c.docx']
+    # Excluded folders are pruned, so nothing below them is walked.
+    assert _walk(tree, exclude=['drafts', 'cache']) == ['a.jpg', 'b.pdf', 'docs/c.docx']
+
+
+def test_extensions_and_size_limit_filter_walked_files(tree, log):
+    _touch(tree / 'big.jpg', b'\0' * (2 * 1024 * 1024))
+    assert _walk(tree, extensions={'.pdf', '.docx'}) == ['b.pdf', 'docs/c.docx']
+    assert 'big.jpg' not in _walk(tree, size_limit=1, log=log)
+    assert any('big.jpg' in message for message in log.warnings())
+
+
+def test_output_dir_is_not_walked(tree):
+    assert _walk(tree, skip_dirs=[str(tree / 'cache')]) == ['a.jpg', 'b.pdf', 'docs/c.docx', 'docs/drafts/d.jpg']
+
+
+@pytest.fixture
+def linked(tmp_path, tree):
+    outside = tmp_path / 'outside'
+    _touch(outside / 'f.jpg')
+    try:
+        os.symlink(outside / 'f.jpg', tree / 'link.jpg')
+        os.symlink(outside, tree / 'linkdir', target_is_directory=True)
+        os.symlink(tree, tree / 'docs' / 'loop', target_is_directory=True)
+    except OSError:
+        pytest.skip("symlinks are not available")
+    return tree
+
+
+def test_symlinks_skip(linked):
+    assert _walk(linked, symlinks='skip') == ['a.jpg', 'b.pdf', 'cache/e.jpg', 'docs/c.docx', 'docs/drafts/d.jpg']
+
+
+def test_symlinks_files_follows_links_to_files_only(linked):
+    assert _walk(linked, symlinks='files') == [
+        'a.jpg', 'b.pdf', 'cache/e.jpg', 'docs/c.docx', 'docs/drafts/d.jpg', 'link.jpg']
+
+
+def test_symlinks_follow_walks_linked_folders_once(linked):
+    assert _walk(linked, symlinks='follow') == [
+        'a.jpg', 'b.pdf', 'cache/e.jpg', 'docs/c.docx', 'docs/drafts/d.jpg', 'link.jpg', 'linkdir/f.jpg']
+
+
+def test_unknown_symlink_policy_is_refused(tree):
+    with pytest.raises(ValueError):
+        list(iter_files([str(tree)], symlinks='always'))
+
+
+def test_listed_files_bypass_filters_and_missing_ones_are_reported(tree):
+    listed = [str(tree / 'b.pdf'), str(tree / 'gone.jpg')]
+    files = list(iter_files(listed, include=['*.jpg'], extensions={'.jpg'}))
+    assert [path for path, _ in files] == listed
+    assert files[0][1] is not None and files[1][1] is None
+
+
+def test_folder_without_recursive_is_logged(tree, log):
+    files = list(iter_files([str(tree), str(tree / 'a.jpg')], log=log))
+    assert [path for path, _ in files] == [str(tree / 'a.jpg')]
+    assert log.warnings() == [f"Skipping folder {tree}: enable recursive mode to clean folders"]
@@ -0,0 +1,49 @@
+import zipfile
+
+import pytest
+
+from metastripper_core import ziputil
+from metastripper_core.ziputil import NORMALIZED_DATE, copy_raw
+
+MEMBERS = {'docs/': b'', 'docs/stored.txt': b'plain text ' * 50, 'deflated.xml': b'<a>' + b'x' * 5000 + b'</a>',
+           'empty.bin': b''}
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'in.zip'
+    with zipfile.ZipFile(path, 'w') as z:
+        for name, data in MEMBERS.items():
+            info = zipfile.ZipInfo(name, (2021, 5, 6, 7, 8, 10))
+            info.compress_type = zipfile.ZIP_STORED if 'stored' in name else zipfile.ZIP_DEFLATED
+            info.extra = b'\x55\x54\x05\x00\x01\x00\x00\x00\x00'  # extended timestamp
+            z.writestr(info, data)
+    return path
+
+
+def _copy(source, dst, **kwargs):
+    with zipfile.ZipFile(source) as zin, open(source, 'rb') as src, zipfile.ZipFile(dst, 'w') as zout:
+        for info in zin.infolist():
+            copy_raw(zin, src, info, zout, **kwargs)
+
+
+@pytest.mark.parametrize('raw', [True, False], ids=['raw', 'fallback'])
+def test_copied_archive_passes_testzip(tmp_path, source, monkeypatch, raw):
+    if not raw:
+        monkeypatch.setattr(ziputil, 'RAW_COPY_ATTRIBUTES', ziputil.RAW_COPY_ATTRIBUTES + ('_removed',))
+    dst = tmp_path / 'out.zip'
+    _copy(source, dst, normalize=True)
+    with zipfile.ZipFile(dst) as z:
+        assert z.testzip() is None
+        assert {info.filename: z.read(info) for info in z.infolist()} == MEMBERS
+        assert all(info.date_time == NORMALIZED_DATE and info.extra == b'' for info in z.infolist())
+        assert z.getinfo('docs/').is_dir()
+
+
+def test_raw_copy_keeps_the_compressed_bytes(tmp_path, source):
+    dst = tmp_path / 'out.zip'
+    _copy(source, dst, normalize=True, keep_date=True)
+    with zipfile.ZipFile(source) as before, zipfile.ZipFile(dst) as after:
+        for old, new in zip(before.infolist(), after.infolist()):
+            assert (new.compress_type, new.compress_size, new.CRC) == (old.compress_type, old.compress_size, old.CRC)
+            assert new.date_time == old.date_time